@@ -1,10 +1,12 @@
+from defender.admin import AccessAttemptAdmin
+from defender.models import AccessAttempt
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import UserCreationForm
 
 from oidc_provider.models import UserConsent
 
-from authentication_service import models
+from authentication_service import models, rate_limit
 
 
 class ExtendedCreationForm(UserCreationForm):
@@ -56,6 +58,36 @@ class UserConsentAdmin(admin.ModelAdmin):
     list_filter = ['client__name', 'client__client_type', 'date_given', 'expires_at']
 
 
+class UserDeletionJobAdmin(admin.ModelAdmin):
+    list_display = [
+        "id", "status", "total", "processed", "deleted", "created_at",
+        "completed_at"
+    ]
+    list_filter = ["status"]
+    exclude = ["user_ids"]
+    readonly_fields = [
+        "deleter_id", "reason", "status", "total", "processed", "deleted",
+        "error", "created_at", "updated_at", "completed_at"
+    ]
+
+    def has_add_permission(self, request):
+        # Jobs are created through the API, which also starts them.
+        return False
+
+
+class RateLimitedAccessAttemptAdmin(AccessAttemptAdmin):
+    actions = ["unblock"]
+
+    def unblock(self, request, queryset):
+        for username, ip_address in queryset.values_list(
+                "username", "ip_address").distinct():
+            rate_limit.LIMITER.reset(username=username, ip=ip_address)
+        self.message_user(
+            request, "Unblocked the usernames and IP addresses of the attempts."
+        )
+    unblock.short_description = "Unblock the usernames and IP addresses"
+
+
 admin.site.register(models.Country, admin.ModelAdmin)
 admin.site.register(models.UserSecurityQuestion, admin.ModelAdmin)
 admin.site.register(models.SecurityQuestion, SecurityQuestionForm)
@@ -63,3 +95,7 @@ admin.site.register(models.QuestionLanguageText, admin.ModelAdmin)
 admin.site.register(models.Organisation, admin.ModelAdmin)
 admin.site.register(models.UserSite, UserSiteAdmin)
 admin.site.register(UserConsent, UserConsentAdmin)
+admin.site.register(models.UserDeletionJob, UserDeletionJobAdmin)
+# Replaces the admin of django-defender, of which the lockouts are not used.
+admin.site.unregister(AccessAttempt)
+admin.site.register(AccessAttempt, RateLimitedAccessAttemptAdmin)
@@ -0,0 +1,57 @@
+"""
+Hashing of security question answers.
+
+Answers are hashed with their own policy: SECURITY_ANSWER_HASHER names one of
+the PASSWORD_HASHERS algorithms and SECURITY_ANSWER_ITERATIONS, if set,
+overrides the work factor of iterated hashers. Answers are short, normalised
+and only checked on password resets, so they do not need to cost as much as a
+password does.
+
+A hash made under another policy is still accepted and is replaced by a hash
+under the current policy the next time its answer is checked successfully.
+"""
+import copy
+import functools
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def normalise(answer: str) -> str:
+    return answer.strip().lower()
+
+
+@functools.lru_cache(maxsize=None)
+def get_hasher():
+    """
+    :return: The hasher of the answer policy
+    """
+    hasher = copy.copy(hashers.get_hasher(settings.SECURITY_ANSWER_HASHER))
+    if settings.SECURITY_ANSWER_ITERATIONS and hasattr(hasher, "iterations"):
+        hasher.iterations = settings.SECURITY_ANSWER_ITERATIONS
+    return hasher
+
+
+def make_answer(answer: str) -> str:
+    """
+    :param answer: The answer as it was given
+    :return: The hash of the normalised answer
+    """
+    return hashers.make_password(normalise(answer), hasher=get_hasher())
+
+
+def check_answer(answer: str, encoded: str, setter=None) -> bool:
+    """
+    :param answer: The answer as it was given
+    :param encoded: The hash to check the answer against
+    :param setter: Called with a hash under the current policy when the answer
+        is correct, but encoded was made under another policy
+    :return: True if the answer matches
+    """
+    def rehash(raw_answer):
+        setter(hashers.make_password(raw_answer, hasher=get_hasher()))
+
+    return hashers.check_password(
+        normalise(answer), encoded, setter=rehash if setter else None,
+        preferred=get_hasher()
+    )
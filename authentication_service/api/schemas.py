@@ -281,6 +281,495 @@ user = json.loads("""
 }
 """)
 
+user_bulk_read = json.loads("""
+{
+    "properties": {
+        "user_ids": {
+            "items": {
+                "format": "uuid",
+                "type": "string"
+            },
+            "maxItems": 100,
+            "minItems": 1,
+            "type": "array",
+            "uniqueItems": true
+        }
+    },
+    "required": [
+        "user_ids"
+    ],
+    "type": "object"
+}
+""")
+
+user_bulk_read_result = json.loads("""
+{
+    "properties": {
+        "missing_ids": {
+            "description": "The requested ids for which no user exists",
+            "items": {
+                "format": "uuid",
+                "type": "string"
+            },
+            "type": "array"
+        },
+        "users": {
+            "additionalProperties": {
+                "properties": {
+                    "avatar": {
+                        "format": "uri",
+                        "type": "string"
+                    },
+                    "birth_date": {
+                        "format": "date",
+                        "type": "string"
+                    },
+                    "country_code": {
+                        "maxLength": 2,
+                        "minLength": 2,
+                        "type": "string"
+                    },
+                    "created_at": {
+                        "format": "date-time",
+                        "readOnly": true,
+                        "type": "string"
+                    },
+                    "date_joined": {
+                        "description": "",
+                        "format": "date-time",
+                        "readOnly": true,
+                        "type": "string"
+                    },
+                    "email": {
+                        "description": "",
+                        "format": "email",
+                        "type": "string"
+                    },
+                    "email_verified": {
+                        "type": "boolean"
+                    },
+                    "first_name": {
+                        "description": "",
+                        "type": "string"
+                    },
+                    "gender": {
+                        "type": "string"
+                    },
+                    "id": {
+                        "description": "A UUID identifying the user",
+                        "format": "uuid",
+                        "readOnly": true,
+                        "type": "string"
+                    },
+                    "is_active": {
+                        "description": "Designates whether this user should be treated as active. Deselect this instead of deleting accounts.",
+                        "type": "boolean"
+                    },
+                    "last_login": {
+                        "description": "",
+                        "format": "date-time",
+                        "readOnly": true,
+                        "type": "string"
+                    },
+                    "last_name": {
+                        "description": "",
+                        "type": "string"
+                    },
+                    "msisdn": {
+                        "maxLength": 15,
+                        "type": "string"
+                    },
+                    "msisdn_verified": {
+                        "type": "boolean"
+                    },
+                    "organisation_id": {
+                        "readOnly": true,
+                        "type": "integer"
+                    },
+                    "updated_at": {
+                        "format": "date-time",
+                        "readOnly": true,
+                        "type": "string"
+                    },
+                    "username": {
+                        "description": "Required. 150 characters or fewer. Letters, digits and @/./+/-/_ only.",
+                        "readOnly": true,
+                        "type": "string"
+                    }
+                },
+                "required": [
+                    "id",
+                    "username",
+                    "is_active",
+                    "date_joined",
+                    "created_at",
+                    "updated_at"
+                ],
+                "type": "object",
+                "x-scope": [
+                    ""
+                ]
+            },
+            "description": "The users that were found, keyed by id",
+            "type": "object"
+        }
+    },
+    "required": [
+        "users",
+        "missing_ids"
+    ],
+    "type": "object"
+}
+""")
+
+user_deletion_filter = json.loads("""
+{
+    "additionalProperties": false,
+    "description": "The user_list filters selecting the users to delete",
+    "minProperties": 1,
+    "properties": {
+        "birth_date": {
+            "description": "A birth_date range filter",
+            "type": "string"
+        },
+        "country": {
+            "description": "A country filter",
+            "maxLength": 2,
+            "minLength": 2,
+            "type": "string"
+        },
+        "date_joined": {
+            "description": "A date joined range filter",
+            "type": "string"
+        },
+        "email": {
+            "description": "A case insensitive email inner match filter",
+            "minLength": 3,
+            "type": "string"
+        },
+        "email_verified": {
+            "description": "An email verified filter",
+            "type": "boolean"
+        },
+        "first_name": {
+            "description": "A case insensitive first name inner match filter",
+            "minLength": 3,
+            "type": "string"
+        },
+        "gender": {
+            "description": "A gender filter",
+            "type": "string"
+        },
+        "has_organisation": {
+            "description": "A filter based on whether a user belongs to an organisation or not",
+            "type": "boolean"
+        },
+        "is_active": {
+            "description": "An is_active filter",
+            "type": "boolean"
+        },
+        "last_login": {
+            "description": "A last login range filter",
+            "type": "string"
+        },
+        "last_name": {
+            "description": "A case insensitive last name inner match filter",
+            "minLength": 3,
+            "type": "string"
+        },
+        "msisdn": {
+            "description": "A case insensitive MSISDN inner match filter",
+            "minLength": 3,
+            "type": "string"
+        },
+        "msisdn_verified": {
+            "description": "An MSISDN verified filter",
+            "type": "boolean"
+        },
+        "nickname": {
+            "description": "A case insensitive nickname inner match filter",
+            "minLength": 3,
+            "type": "string"
+        },
+        "organisation_id": {
+            "description": "A filter on the organisation id",
+            "type": "integer"
+        },
+        "q": {
+            "description": "A filter across all searchable text fields, matched according to search_mode",
+            "minLength": 3,
+            "type": "string"
+        },
+        "search_mode": {
+            "description": "How q is matched, see user_list",
+            "enum": [
+                "inner",
+                "token",
+                "prefix"
+            ],
+            "type": "string"
+        },
+        "site_ids": {
+            "description": "A list of site ids",
+            "items": {
+                "type": "integer"
+            },
+            "minItems": 1,
+            "type": "array",
+            "uniqueItems": true
+        },
+        "tfa_enabled": {
+            "description": "A filter based on whether a user has 2FA enabled or not",
+            "type": "boolean"
+        },
+        "updated_at": {
+            "description": "An updated_at range filter",
+            "type": "string"
+        },
+        "user_ids": {
+            "description": "A list of user ids",
+            "items": {
+                "format": "uuid",
+                "type": "string"
+            },
+            "minItems": 1,
+            "type": "array",
+            "uniqueItems": true
+        },
+        "username": {
+            "description": "A case insensitive username inner match filter",
+            "minLength": 3,
+            "type": "string"
+        }
+    },
+    "type": "object"
+}
+""")
+
+user_deletion_job = json.loads("""
+{
+    "properties": {
+        "completed_at": {
+            "format": "date-time",
+            "readOnly": true,
+            "type": "string"
+        },
+        "created_at": {
+            "format": "date-time",
+            "readOnly": true,
+            "type": "string"
+        },
+        "deleted": {
+            "description": "The number of users deleted so far. Users that no longer existed are not counted.",
+            "type": "integer"
+        },
+        "deleter_id": {
+            "format": "uuid",
+            "type": "string"
+        },
+        "error": {
+            "description": "The error that made the job fail",
+            "type": "string"
+        },
+        "id": {
+            "format": "uuid",
+            "type": "string"
+        },
+        "processed": {
+            "description": "The number of selected users handled so far",
+            "type": "integer"
+        },
+        "reason": {
+            "type": "string"
+        },
+        "status": {
+            "enum": [
+                "pending",
+                "running",
+                "completed",
+                "failed"
+            ],
+            "type": "string"
+        },
+        "total": {
+            "description": "The number of users selected for deletion",
+            "type": "integer"
+        },
+        "updated_at": {
+            "format": "date-time",
+            "readOnly": true,
+            "type": "string"
+        }
+    },
+    "required": [
+        "id",
+        "deleter_id",
+        "reason",
+        "status",
+        "total",
+        "processed",
+        "deleted",
+        "created_at",
+        "updated_at"
+    ],
+    "type": "object"
+}
+""")
+
+user_deletion_job_create = json.loads("""
+{
+    "description": "Either user_ids or filter selects the users to delete.",
+    "properties": {
+        "deleter_id": {
+            "format": "uuid",
+            "type": "string"
+        },
+        "filter": {
+            "additionalProperties": false,
+            "description": "The user_list filters selecting the users to delete",
+            "minProperties": 1,
+            "properties": {
+                "birth_date": {
+                    "description": "A birth_date range filter",
+                    "type": "string"
+                },
+                "country": {
+                    "description": "A country filter",
+                    "maxLength": 2,
+                    "minLength": 2,
+                    "type": "string"
+                },
+                "date_joined": {
+                    "description": "A date joined range filter",
+                    "type": "string"
+                },
+                "email": {
+                    "description": "A case insensitive email inner match filter",
+                    "minLength": 3,
+                    "type": "string"
+                },
+                "email_verified": {
+                    "description": "An email verified filter",
+                    "type": "boolean"
+                },
+                "first_name": {
+                    "description": "A case insensitive first name inner match filter",
+                    "minLength": 3,
+                    "type": "string"
+                },
+                "gender": {
+                    "description": "A gender filter",
+                    "type": "string"
+                },
+                "has_organisation": {
+                    "description": "A filter based on whether a user belongs to an organisation or not",
+                    "type": "boolean"
+                },
+                "is_active": {
+                    "description": "An is_active filter",
+                    "type": "boolean"
+                },
+                "last_login": {
+                    "description": "A last login range filter",
+                    "type": "string"
+                },
+                "last_name": {
+                    "description": "A case insensitive last name inner match filter",
+                    "minLength": 3,
+                    "type": "string"
+                },
+                "msisdn": {
+                    "description": "A case insensitive MSISDN inner match filter",
+                    "minLength": 3,
+                    "type": "string"
+                },
+                "msisdn_verified": {
+                    "description": "An MSISDN verified filter",
+                    "type": "boolean"
+                },
+                "nickname": {
+                    "description": "A case insensitive nickname inner match filter",
+                    "minLength": 3,
+                    "type": "string"
+                },
+                "organisation_id": {
+                    "description": "A filter on the organisation id",
+                    "type": "integer"
+                },
+                "q": {
+                    "description": "A filter across all searchable text fields, matched according to search_mode",
+                    "minLength": 3,
+                    "type": "string"
+                },
+                "search_mode": {
+                    "description": "How q is matched, see user_list",
+                    "enum": [
+                        "inner",
+                        "token",
+                        "prefix"
+                    ],
+                    "type": "string"
+                },
+                "site_ids": {
+                    "description": "A list of site ids",
+                    "items": {
+                        "type": "integer"
+                    },
+                    "minItems": 1,
+                    "type": "array",
+                    "uniqueItems": true
+                },
+                "tfa_enabled": {
+                    "description": "A filter based on whether a user has 2FA enabled or not",
+                    "type": "boolean"
+                },
+                "updated_at": {
+                    "description": "An updated_at range filter",
+                    "type": "string"
+                },
+                "user_ids": {
+                    "description": "A list of user ids",
+                    "items": {
+                        "format": "uuid",
+                        "type": "string"
+                    },
+                    "minItems": 1,
+                    "type": "array",
+                    "uniqueItems": true
+                },
+                "username": {
+                    "description": "A case insensitive username inner match filter",
+                    "minLength": 3,
+                    "type": "string"
+                }
+            },
+            "type": "object",
+            "x-scope": [
+                ""
+            ]
+        },
+        "reason": {
+            "type": "string"
+        },
+        "user_ids": {
+            "items": {
+                "format": "uuid",
+                "type": "string"
+            },
+            "maxItems": 10000,
+            "minItems": 1,
+            "type": "array",
+            "uniqueItems": true
+        }
+    },
+    "required": [
+        "deleter_id",
+        "reason"
+    ],
+    "type": "object"
+}
+""")
+
 user_site = json.loads("""
 {
     "properties": {
@@ -14,7 +14,7 @@ class AbstractStubClass(object):
 
     # client_list -- Synchronisation point for meld
     @staticmethod
-    def client_list(request, offset=None, limit=None, client_ids=None, client_token_id=None, *args, **kwargs):
+    def client_list(request, offset=None, limit=None, client_ids=None, client_token_id=None, count=None, *args, **kwargs):
         """
         :param request: An HttpRequest
         :param offset: (optional) An optional query parameter specifying the offset in the result set to start from.
@@ -25,6 +25,8 @@ class AbstractStubClass(object):
         :type client_ids: array
         :param client_token_id: (optional) An optional client id to filter on. This is not the primary key.
         :type client_token_id: string
+        :param count: (optional) An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+        :type count: string
         """
         raise NotImplementedError()
 
@@ -40,7 +42,7 @@ class AbstractStubClass(object):
 
     # country_list -- Synchronisation point for meld
     @staticmethod
-    def country_list(request, offset=None, limit=None, country_codes=None, *args, **kwargs):
+    def country_list(request, offset=None, limit=None, country_codes=None, count=None, *args, **kwargs):
         """
         :param request: An HttpRequest
         :param offset: (optional) An optional query parameter specifying the offset in the result set to start from.
@@ -49,6 +51,8 @@ class AbstractStubClass(object):
         :type limit: integer
         :param country_codes: (optional) An optional list of country codes
         :type country_codes: array
+        :param count: (optional) An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+        :type count: string
         """
         raise NotImplementedError()
 
@@ -86,7 +90,7 @@ class AbstractStubClass(object):
 
     # organisation_list -- Synchronisation point for meld
     @staticmethod
-    def organisation_list(request, offset=None, limit=None, organisation_ids=None, *args, **kwargs):
+    def organisation_list(request, offset=None, limit=None, organisation_ids=None, count=None, *args, **kwargs):
         """
         :param request: An HttpRequest
         :param offset: (optional) An optional query parameter specifying the offset in the result set to start from.
@@ -95,6 +99,8 @@ class AbstractStubClass(object):
         :type limit: integer
         :param organisation_ids: (optional) An optional list of organisation ids
         :type organisation_ids: array
+        :param count: (optional) An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+        :type count: string
         """
         raise NotImplementedError()
 
@@ -150,9 +156,39 @@ class AbstractStubClass(object):
         """
         raise NotImplementedError()
 
+    # user_bulk_read -- Synchronisation point for meld
+    @staticmethod
+    def user_bulk_read(request, body, *args, **kwargs):
+        """
+        :param request: An HttpRequest
+        :param body: A dictionary containing the parsed and validated body
+        :type body: dict
+        """
+        raise NotImplementedError()
+
+    # user_deletion_job_create -- Synchronisation point for meld
+    @staticmethod
+    def user_deletion_job_create(request, body, *args, **kwargs):
+        """
+        :param request: An HttpRequest
+        :param body: A dictionary containing the parsed and validated body
+        :type body: dict
+        """
+        raise NotImplementedError()
+
+    # user_deletion_job_read -- Synchronisation point for meld
+    @staticmethod
+    def user_deletion_job_read(request, job_id, *args, **kwargs):
+        """
+        :param request: An HttpRequest
+        :param job_id: A UUID value identifying the user deletion job.
+        :type job_id: string
+        """
+        raise NotImplementedError()
+
     # user_list -- Synchronisation point for meld
     @staticmethod
-    def user_list(request, offset=None, limit=None, birth_date=None, country=None, date_joined=None, email=None, email_verified=None, first_name=None, gender=None, is_active=None, last_login=None, last_name=None, msisdn=None, msisdn_verified=None, nickname=None, organisation_id=None, updated_at=None, username=None, q=None, tfa_enabled=None, has_organisation=None, order_by=None, user_ids=None, site_ids=None, *args, **kwargs):
+    def user_list(request, offset=None, limit=None, birth_date=None, country=None, date_joined=None, email=None, email_verified=None, first_name=None, gender=None, is_active=None, last_login=None, last_name=None, msisdn=None, msisdn_verified=None, nickname=None, organisation_id=None, updated_at=None, username=None, q=None, tfa_enabled=None, has_organisation=None, order_by=None, user_ids=None, site_ids=None, cursor=None, count=None, search_mode=None, *args, **kwargs):
         """
         :param request: An HttpRequest
         :param offset: (optional) An optional query parameter specifying the offset in the result set to start from.
@@ -203,6 +239,12 @@ class AbstractStubClass(object):
         :type user_ids: array
         :param site_ids: (optional) An optional list of site ids
         :type site_ids: array
+        :param cursor: (optional) An optional opaque cursor for keyset pagination. Pass an empty value to request the first page and the X-Next-Cursor header value of a response for the page that follows it. Cannot be combined with offset.
+        :type cursor: string
+        :param count: (optional) An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+        :type count: string
+        :param search_mode: (optional) An optional query parameter specifying how q is matched. "inner" (the default) matches any part of the text. "token" and "prefix" use full text search to match whole words or the start of words respectively, and order the results by relevance unless order_by is specified.
+        :type search_mode: string
         """
         raise NotImplementedError()
 
@@ -246,7 +288,7 @@ class MockedStubClass(AbstractStubClass):
     GENERATOR = DataGenerator()
 
     @staticmethod
-    def client_list(request, offset=None, limit=None, client_ids=None, client_token_id=None, *args, **kwargs):
+    def client_list(request, offset=None, limit=None, client_ids=None, client_token_id=None, count=None, *args, **kwargs):
         """
         :param request: An HttpRequest
         :param offset: (optional) An optional query parameter specifying the offset in the result set to start from.
@@ -257,6 +299,8 @@ class MockedStubClass(AbstractStubClass):
         :type client_ids: array
         :param client_token_id: (optional) An optional client id to filter on. This is not the primary key.
         :type client_token_id: string
+        :param count: (optional) An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+        :type count: string
         """
         response_schema = json.loads("""{
     "items": {
@@ -348,7 +392,7 @@ class MockedStubClass(AbstractStubClass):
         return MockedStubClass.GENERATOR.random_value(response_schema)
 
     @staticmethod
-    def country_list(request, offset=None, limit=None, country_codes=None, *args, **kwargs):
+    def country_list(request, offset=None, limit=None, country_codes=None, count=None, *args, **kwargs):
         """
         :param request: An HttpRequest
         :param offset: (optional) An optional query parameter specifying the offset in the result set to start from.
@@ -357,6 +401,8 @@ class MockedStubClass(AbstractStubClass):
         :type limit: integer
         :param country_codes: (optional) An optional list of country codes
         :type country_codes: array
+        :param count: (optional) An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+        :type count: string
         """
         response_schema = json.loads("""{
     "items": {
@@ -441,7 +487,7 @@ class MockedStubClass(AbstractStubClass):
         return MockedStubClass.GENERATOR.random_value(response_schema)
 
     @staticmethod
-    def organisation_list(request, offset=None, limit=None, organisation_ids=None, *args, **kwargs):
+    def organisation_list(request, offset=None, limit=None, organisation_ids=None, count=None, *args, **kwargs):
         """
         :param request: An HttpRequest
         :param offset: (optional) An optional query parameter specifying the offset in the result set to start from.
@@ -450,6 +496,8 @@ class MockedStubClass(AbstractStubClass):
         :type limit: integer
         :param organisation_ids: (optional) An optional list of organisation ids
         :type organisation_ids: array
+        :param count: (optional) An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+        :type count: string
         """
         response_schema = json.loads("""{
     "items": {
@@ -579,7 +627,55 @@ class MockedStubClass(AbstractStubClass):
         return MockedStubClass.GENERATOR.random_value(response_schema)
 
     @staticmethod
-    def user_list(request, offset=None, limit=None, birth_date=None, country=None, date_joined=None, email=None, email_verified=None, first_name=None, gender=None, is_active=None, last_login=None, last_name=None, msisdn=None, msisdn_verified=None, nickname=None, organisation_id=None, updated_at=None, username=None, q=None, tfa_enabled=None, has_organisation=None, order_by=None, user_ids=None, site_ids=None, *args, **kwargs):
+    def user_bulk_read(request, body, *args, **kwargs):
+        """
+        :param request: An HttpRequest
+        :param body: A dictionary containing the parsed and validated body
+        :type body: dict
+        """
+        response_schema = schemas.user_bulk_read_result
+        if "type" not in response_schema:
+            response_schema["type"] = "object"
+
+        if response_schema["type"] == "array" and "type" not in response_schema["items"]:
+            response_schema["items"]["type"] = "object"
+
+        return MockedStubClass.GENERATOR.random_value(response_schema)
+
+    @staticmethod
+    def user_deletion_job_create(request, body, *args, **kwargs):
+        """
+        :param request: An HttpRequest
+        :param body: A dictionary containing the parsed and validated body
+        :type body: dict
+        """
+        response_schema = schemas.user_deletion_job
+        if "type" not in response_schema:
+            response_schema["type"] = "object"
+
+        if response_schema["type"] == "array" and "type" not in response_schema["items"]:
+            response_schema["items"]["type"] = "object"
+
+        return MockedStubClass.GENERATOR.random_value(response_schema)
+
+    @staticmethod
+    def user_deletion_job_read(request, job_id, *args, **kwargs):
+        """
+        :param request: An HttpRequest
+        :param job_id: A UUID value identifying the user deletion job.
+        :type job_id: string
+        """
+        response_schema = schemas.user_deletion_job
+        if "type" not in response_schema:
+            response_schema["type"] = "object"
+
+        if response_schema["type"] == "array" and "type" not in response_schema["items"]:
+            response_schema["items"]["type"] = "object"
+
+        return MockedStubClass.GENERATOR.random_value(response_schema)
+
+    @staticmethod
+    def user_list(request, offset=None, limit=None, birth_date=None, country=None, date_joined=None, email=None, email_verified=None, first_name=None, gender=None, is_active=None, last_login=None, last_name=None, msisdn=None, msisdn_verified=None, nickname=None, organisation_id=None, updated_at=None, username=None, q=None, tfa_enabled=None, has_organisation=None, order_by=None, user_ids=None, site_ids=None, cursor=None, count=None, search_mode=None, *args, **kwargs):
         """
         :param request: An HttpRequest
         :param offset: (optional) An optional query parameter specifying the offset in the result set to start from.
@@ -630,6 +726,12 @@ class MockedStubClass(AbstractStubClass):
         :type user_ids: array
         :param site_ids: (optional) An optional list of site ids
         :type site_ids: array
+        :param cursor: (optional) An optional opaque cursor for keyset pagination. Pass an empty value to request the first page and the X-Next-Cursor header value of a response for the page that follows it. Cannot be combined with offset.
+        :type cursor: string
+        :param count: (optional) An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+        :type count: string
+        :param search_mode: (optional) An optional query parameter specifying how q is matched. "inner" (the default) matches any part of the text. "token" and "prefix" use full text search to match whole words or the start of words respectively, and order the results by relevance unless order_by is specified.
+        :type search_mode: string
         """
         response_schema = json.loads("""{
     "items": {
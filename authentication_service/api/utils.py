@@ -10,6 +10,7 @@ import json
 import jsonschema
 import logging
 import os
+import random
 import sys
 import uuid
 
@@ -80,6 +81,53 @@ _LOGGER.info("The following formats will be validated: {}".format(
              ", ".join(_FORMAT_CHECKER.checkers.keys())))
 
 
+# Compiled validators, keyed on the content of their schema. The views build a
+# new schema dictionary for every parameter they validate, so the identity of
+# a schema cannot be used as the key. The number of distinct schemas is
+# bounded by the specification.
+_VALIDATORS = {}
+
+
+def get_validator(schema):
+    """
+    :param schema: A JSONSchema
+    :return: A validator for the schema, which is checked and compiled only
+        the first time it is requested.
+    """
+    key = json.dumps(schema, sort_keys=True)
+    validator = _VALIDATORS.get(key)
+    if validator is None:
+        cls = jsonschema.validators.validator_for(schema)
+        cls.check_schema(schema)
+        validator = cls(schema, format_checker=_FORMAT_CHECKER)
+        _VALIDATORS[key] = validator
+    return validator
+
+
 def validate(instance, schema):
-    jsonschema.validate(instance, schema=schema,
-                        format_checker=_FORMAT_CHECKER)
+    get_validator(schema).validate(instance)
+
+
+def maybe_validate_result(result_string, schema):
+    """
+    Replaces the maybe_validate_result of the generated views, see
+    sample_response_validation. Only a sample of the responses is parsed and
+    validated.
+    """
+    if random.random() < settings.SWAGGER_API_VALIDATE_RESPONSES_SAMPLE_RATE:
+        try:
+            validate(json.loads(result_string, encoding="utf8"), schema)
+        except jsonschema.ValidationError as e:
+            _LOGGER.error(e.message)
+
+
+def sample_response_validation():
+    """
+    The generated views validate every response when
+    SWAGGER_API_VALIDATE_RESPONSES is on. Their maybe_validate_result is
+    replaced once the apps are ready, rather than edited, so that the views can
+    be regenerated.
+    """
+    from authentication_service.api import views
+    if views.VALIDATE_RESPONSES:
+        views.maybe_validate_result = maybe_validate_result
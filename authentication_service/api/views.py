@@ -151,7 +151,12 @@ class Clients(View):
             if client_token_id is not None:
                 schema = {'type': 'string'}
                 utils.validate(client_token_id, schema)
-            result = Stubs.client_list(request, offset, limit, client_ids, client_token_id, )
+            # count (optional): string An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+            count = request.GET.get("count", None)
+            if count is not None:
+                schema = {'type': 'string', 'enum': ['exact', 'estimate', 'none'], 'default': 'exact'}
+                utils.validate(count, schema)
+            result = Stubs.client_list(request, offset, limit, client_ids, client_token_id, count, )
 
             if type(result) is tuple:
                 result, headers = result
@@ -268,7 +273,12 @@ class Countries(View):
             if country_codes is not None:
                 schema = {'type': 'array', 'items': {'type': 'string', 'minLength': 2, 'maxLength': 2}, 'minItems': 1, 'uniqueItems': True}
                 utils.validate(country_codes, schema)
-            result = Stubs.country_list(request, offset, limit, country_codes, )
+            # count (optional): string An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+            count = request.GET.get("count", None)
+            if count is not None:
+                schema = {'type': 'string', 'enum': ['exact', 'estimate', 'none'], 'default': 'exact'}
+                utils.validate(count, schema)
+            result = Stubs.country_list(request, offset, limit, country_codes, count, )
 
             if type(result) is tuple:
                 result, headers = result
@@ -488,7 +498,12 @@ class Organisations(View):
             if organisation_ids is not None:
                 schema = {'type': 'array', 'items': {'type': 'integer'}, 'minItems': 1, 'uniqueItems': True}
                 utils.validate(organisation_ids, schema)
-            result = Stubs.organisation_list(request, offset, limit, organisation_ids, )
+            # count (optional): string An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+            count = request.GET.get("count", None)
+            if count is not None:
+                schema = {'type': 'string', 'enum': ['exact', 'estimate', 'none'], 'default': 'exact'}
+                utils.validate(count, schema)
+            result = Stubs.organisation_list(request, offset, limit, organisation_ids, count, )
 
             if type(result) is tuple:
                 result, headers = result
@@ -697,6 +712,128 @@ class RequestUserDeletion(View):
             return HttpResponseBadRequest("Parameter validation failed: {}".format(ve))
 
 
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(utils.login_required_no_redirect, name="post")
+class UserBulkRead(View):
+
+    POST_RESPONSE_SCHEMA = schemas.user_bulk_read_result
+    POST_BODY_SCHEMA = schemas.user_bulk_read
+
+    def post(self, request, *args, **kwargs):
+        """
+        :param self: A UserBulkRead instance
+        :param request: An HttpRequest
+        """
+        body = utils.body_to_dict(request.body, self.POST_BODY_SCHEMA)
+        if not body:
+            return HttpResponseBadRequest("Body required")
+
+        try:
+
+            result = Stubs.user_bulk_read(request, body, )
+
+            if type(result) is tuple:
+                result, headers = result
+            else:
+                headers = {}
+
+            # The result may contain fields with date or datetime values that will not
+            # pass JSON validation. We first create the response, and then maybe validate
+            # the response content against the schema.
+            response = JsonResponse(result, safe=False)
+
+            maybe_validate_result(response.content, self.POST_RESPONSE_SCHEMA)
+
+            for key, val in headers.items():
+                response[key] = val
+
+            return response
+        except ValidationError as ve:
+            return HttpResponseBadRequest("Parameter validation failed: {}".format(ve.message))
+        except ValueError as ve:
+            return HttpResponseBadRequest("Parameter validation failed: {}".format(ve))
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(utils.login_required_no_redirect, name="post")
+class UserDeletionJobs(View):
+
+    POST_RESPONSE_SCHEMA = schemas.user_deletion_job
+    POST_BODY_SCHEMA = schemas.user_deletion_job_create
+
+    def post(self, request, *args, **kwargs):
+        """
+        :param self: A UserDeletionJobs instance
+        :param request: An HttpRequest
+        """
+        body = utils.body_to_dict(request.body, self.POST_BODY_SCHEMA)
+        if not body:
+            return HttpResponseBadRequest("Body required")
+
+        try:
+
+            result = Stubs.user_deletion_job_create(request, body, )
+
+            if type(result) is tuple:
+                result, headers = result
+            else:
+                headers = {}
+
+            # The result may contain fields with date or datetime values that will not
+            # pass JSON validation. We first create the response, and then maybe validate
+            # the response content against the schema.
+            response = JsonResponse(result, safe=False)
+
+            maybe_validate_result(response.content, self.POST_RESPONSE_SCHEMA)
+
+            for key, val in headers.items():
+                response[key] = val
+
+            return response
+        except ValidationError as ve:
+            return HttpResponseBadRequest("Parameter validation failed: {}".format(ve.message))
+        except ValueError as ve:
+            return HttpResponseBadRequest("Parameter validation failed: {}".format(ve))
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(utils.login_required_no_redirect, name="get")
+class UserDeletionJobsJobId(View):
+
+    GET_RESPONSE_SCHEMA = schemas.user_deletion_job
+
+    def get(self, request, job_id, *args, **kwargs):
+        """
+        :param self: A UserDeletionJobsJobId instance
+        :param request: An HttpRequest
+        :param job_id: string A UUID value identifying the user deletion job.
+        """
+        try:
+
+            result = Stubs.user_deletion_job_read(request, job_id, )
+
+            if type(result) is tuple:
+                result, headers = result
+            else:
+                headers = {}
+
+            # The result may contain fields with date or datetime values that will not
+            # pass JSON validation. We first create the response, and then maybe validate
+            # the response content against the schema.
+            response = JsonResponse(result, safe=False)
+
+            maybe_validate_result(response.content, self.GET_RESPONSE_SCHEMA)
+
+            for key, val in headers.items():
+                response[key] = val
+
+            return response
+        except ValidationError as ve:
+            return HttpResponseBadRequest("Parameter validation failed: {}".format(ve.message))
+        except ValueError as ve:
+            return HttpResponseBadRequest("Parameter validation failed: {}".format(ve))
+
+
 @method_decorator(csrf_exempt, name="dispatch")
 @method_decorator(utils.login_required_no_redirect, name="get")
 class Users(View):
@@ -944,7 +1081,22 @@ class Users(View):
             if site_ids is not None:
                 schema = {'type': 'array', 'items': {'type': 'integer'}, 'minItems': 1, 'uniqueItems': True}
                 utils.validate(site_ids, schema)
-            result = Stubs.user_list(request, offset, limit, birth_date, country, date_joined, email, email_verified, first_name, gender, is_active, last_login, last_name, msisdn, msisdn_verified, nickname, organisation_id, updated_at, username, q, tfa_enabled, has_organisation, order_by, user_ids, site_ids, )
+            # cursor (optional): string An optional opaque cursor for keyset pagination. Pass an empty value to request the first page and the X-Next-Cursor header value of a response for the page that follows it. Cannot be combined with offset.
+            cursor = request.GET.get("cursor", None)
+            if cursor is not None:
+                schema = {'type': 'string'}
+                utils.validate(cursor, schema)
+            # count (optional): string An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+            count = request.GET.get("count", None)
+            if count is not None:
+                schema = {'type': 'string', 'enum': ['exact', 'estimate', 'none'], 'default': 'exact'}
+                utils.validate(count, schema)
+            # search_mode (optional): string An optional query parameter specifying how q is matched. "inner" (the default) matches any part of the text. "token" and "prefix" use full text search to match whole words or the start of words respectively, and order the results by relevance unless order_by is specified.
+            search_mode = request.GET.get("search_mode", None)
+            if search_mode is not None:
+                schema = {'type': 'string', 'enum': ['inner', 'token', 'prefix'], 'default': 'inner'}
+                utils.validate(search_mode, schema)
+            result = Stubs.user_list(request, offset, limit, birth_date, country, date_joined, email, email_verified, first_name, gender, is_active, last_login, last_name, msisdn, msisdn_verified, nickname, organisation_id, updated_at, username, q, tfa_enabled, has_organisation, order_by, user_ids, site_ids, cursor, count, search_mode, )
 
             if type(result) is tuple:
                 result, headers = result
@@ -1331,6 +1483,266 @@ class __SWAGGER_SPEC__(View):
             ],
             "type": "object"
         },
+        "user_bulk_read": {
+            "properties": {
+                "user_ids": {
+                    "items": {
+                        "format": "uuid",
+                        "type": "string"
+                    },
+                    "maxItems": 100,
+                    "minItems": 1,
+                    "type": "array",
+                    "uniqueItems": true
+                }
+            },
+            "required": [
+                "user_ids"
+            ],
+            "type": "object"
+        },
+        "user_bulk_read_result": {
+            "properties": {
+                "missing_ids": {
+                    "description": "The requested ids for which no user exists",
+                    "items": {
+                        "format": "uuid",
+                        "type": "string"
+                    },
+                    "type": "array"
+                },
+                "users": {
+                    "additionalProperties": {
+                        "$ref": "#/definitions/user"
+                    },
+                    "description": "The users that were found, keyed by id",
+                    "type": "object"
+                }
+            },
+            "required": [
+                "users",
+                "missing_ids"
+            ],
+            "type": "object"
+        },
+        "user_deletion_filter": {
+            "additionalProperties": false,
+            "description": "The user_list filters selecting the users to delete",
+            "minProperties": 1,
+            "properties": {
+                "birth_date": {
+                    "description": "A birth_date range filter",
+                    "type": "string"
+                },
+                "country": {
+                    "description": "A country filter",
+                    "maxLength": 2,
+                    "minLength": 2,
+                    "type": "string"
+                },
+                "date_joined": {
+                    "description": "A date joined range filter",
+                    "type": "string"
+                },
+                "email": {
+                    "description": "A case insensitive email inner match filter",
+                    "minLength": 3,
+                    "type": "string"
+                },
+                "email_verified": {
+                    "description": "An email verified filter",
+                    "type": "boolean"
+                },
+                "first_name": {
+                    "description": "A case insensitive first name inner match filter",
+                    "minLength": 3,
+                    "type": "string"
+                },
+                "gender": {
+                    "description": "A gender filter",
+                    "type": "string"
+                },
+                "has_organisation": {
+                    "description": "A filter based on whether a user belongs to an organisation or not",
+                    "type": "boolean"
+                },
+                "is_active": {
+                    "description": "An is_active filter",
+                    "type": "boolean"
+                },
+                "last_login": {
+                    "description": "A last login range filter",
+                    "type": "string"
+                },
+                "last_name": {
+                    "description": "A case insensitive last name inner match filter",
+                    "minLength": 3,
+                    "type": "string"
+                },
+                "msisdn": {
+                    "description": "A case insensitive MSISDN inner match filter",
+                    "minLength": 3,
+                    "type": "string"
+                },
+                "msisdn_verified": {
+                    "description": "An MSISDN verified filter",
+                    "type": "boolean"
+                },
+                "nickname": {
+                    "description": "A case insensitive nickname inner match filter",
+                    "minLength": 3,
+                    "type": "string"
+                },
+                "organisation_id": {
+                    "description": "A filter on the organisation id",
+                    "type": "integer"
+                },
+                "q": {
+                    "description": "A filter across all searchable text fields, matched according to search_mode",
+                    "minLength": 3,
+                    "type": "string"
+                },
+                "search_mode": {
+                    "description": "How q is matched, see user_list",
+                    "enum": [
+                        "inner",
+                        "token",
+                        "prefix"
+                    ],
+                    "type": "string"
+                },
+                "site_ids": {
+                    "description": "A list of site ids",
+                    "items": {
+                        "type": "integer"
+                    },
+                    "minItems": 1,
+                    "type": "array",
+                    "uniqueItems": true
+                },
+                "tfa_enabled": {
+                    "description": "A filter based on whether a user has 2FA enabled or not",
+                    "type": "boolean"
+                },
+                "updated_at": {
+                    "description": "An updated_at range filter",
+                    "type": "string"
+                },
+                "user_ids": {
+                    "description": "A list of user ids",
+                    "items": {
+                        "format": "uuid",
+                        "type": "string"
+                    },
+                    "minItems": 1,
+                    "type": "array",
+                    "uniqueItems": true
+                },
+                "username": {
+                    "description": "A case insensitive username inner match filter",
+                    "minLength": 3,
+                    "type": "string"
+                }
+            },
+            "type": "object"
+        },
+        "user_deletion_job": {
+            "properties": {
+                "completed_at": {
+                    "format": "date-time",
+                    "readOnly": true,
+                    "type": "string"
+                },
+                "created_at": {
+                    "format": "date-time",
+                    "readOnly": true,
+                    "type": "string"
+                },
+                "deleted": {
+                    "description": "The number of users deleted so far. Users that no longer existed are not counted.",
+                    "type": "integer"
+                },
+                "deleter_id": {
+                    "format": "uuid",
+                    "type": "string"
+                },
+                "error": {
+                    "description": "The error that made the job fail",
+                    "type": "string"
+                },
+                "id": {
+                    "format": "uuid",
+                    "type": "string"
+                },
+                "processed": {
+                    "description": "The number of selected users handled so far",
+                    "type": "integer"
+                },
+                "reason": {
+                    "type": "string"
+                },
+                "status": {
+                    "enum": [
+                        "pending",
+                        "running",
+                        "completed",
+                        "failed"
+                    ],
+                    "type": "string"
+                },
+                "total": {
+                    "description": "The number of users selected for deletion",
+                    "type": "integer"
+                },
+                "updated_at": {
+                    "format": "date-time",
+                    "readOnly": true,
+                    "type": "string"
+                }
+            },
+            "required": [
+                "id",
+                "deleter_id",
+                "reason",
+                "status",
+                "total",
+                "processed",
+                "deleted",
+                "created_at",
+                "updated_at"
+            ],
+            "type": "object"
+        },
+        "user_deletion_job_create": {
+            "description": "Either user_ids or filter selects the users to delete.",
+            "properties": {
+                "deleter_id": {
+                    "format": "uuid",
+                    "type": "string"
+                },
+                "filter": {
+                    "$ref": "#/definitions/user_deletion_filter"
+                },
+                "reason": {
+                    "type": "string"
+                },
+                "user_ids": {
+                    "items": {
+                        "format": "uuid",
+                        "type": "string"
+                    },
+                    "maxItems": 10000,
+                    "minItems": 1,
+                    "type": "array",
+                    "uniqueItems": true
+                }
+            },
+            "required": [
+                "deleter_id",
+                "reason"
+            ],
+            "type": "object"
+        },
         "user_site": {
             "properties": {
                 "consented_at": {
@@ -1445,6 +1857,27 @@ class __SWAGGER_SPEC__(View):
             "required": true,
             "type": "string"
         },
+        "job_id": {
+            "description": "A UUID value identifying the user deletion job.",
+            "format": "uuid",
+            "in": "path",
+            "name": "job_id",
+            "required": true,
+            "type": "string"
+        },
+        "optional_count": {
+            "default": "exact",
+            "description": "An optional query parameter specifying how X-Total-Count is determined. \\"exact\\" counts all matching results, \\"estimate\\" uses the database statistics instead and \\"none\\" leaves the header out.",
+            "enum": [
+                "exact",
+                "estimate",
+                "none"
+            ],
+            "in": "query",
+            "name": "count",
+            "required": false,
+            "type": "string"
+        },
         "optional_cutoff_date": {
             "description": "An optional cutoff date to purge invites before this date",
             "format": "date",
@@ -1524,6 +1957,12 @@ class __SWAGGER_SPEC__(View):
                         "name": "client_token_id",
                         "required": false,
                         "type": "string"
+                    },
+                    {
+                        "$ref": "#/parameters/optional_count",
+                        "x-scope": [
+                            ""
+                        ]
                     }
                 ],
                 "produces": [
@@ -1614,6 +2053,12 @@ class __SWAGGER_SPEC__(View):
                         "required": false,
                         "type": "array",
                         "uniqueItems": true
+                    },
+                    {
+                        "$ref": "#/parameters/optional_count",
+                        "x-scope": [
+                            ""
+                        ]
                     }
                 ],
                 "produces": [
@@ -1758,6 +2203,12 @@ class __SWAGGER_SPEC__(View):
                         "required": false,
                         "type": "array",
                         "uniqueItems": true
+                    },
+                    {
+                        "$ref": "#/parameters/optional_count",
+                        "x-scope": [
+                            ""
+                        ]
                     }
                 ],
                 "produces": [
@@ -1931,6 +2382,112 @@ class __SWAGGER_SPEC__(View):
                 ]
             }
         },
+        "/user_bulk_read": {
+            "post": {
+                "consumes": [
+                    "application/json"
+                ],
+                "operationId": "user_bulk_read",
+                "parameters": [
+                    {
+                        "in": "body",
+                        "name": "data",
+                        "required": true,
+                        "schema": {
+                            "$ref": "#/definitions/user_bulk_read",
+                            "x-scope": [
+                                ""
+                            ]
+                        }
+                    }
+                ],
+                "produces": [
+                    "application/json"
+                ],
+                "responses": {
+                    "200": {
+                        "description": "",
+                        "schema": {
+                            "$ref": "#/definitions/user_bulk_read_result",
+                            "x-scope": [
+                                ""
+                            ]
+                        }
+                    }
+                },
+                "tags": [
+                    "authentication"
+                ]
+            }
+        },
+        "/user_deletion_jobs": {
+            "post": {
+                "consumes": [
+                    "application/json"
+                ],
+                "operationId": "user_deletion_job_create",
+                "parameters": [
+                    {
+                        "in": "body",
+                        "name": "data",
+                        "required": true,
+                        "schema": {
+                            "$ref": "#/definitions/user_deletion_job_create",
+                            "x-scope": [
+                                ""
+                            ]
+                        }
+                    }
+                ],
+                "produces": [
+                    "application/json"
+                ],
+                "responses": {
+                    "201": {
+                        "description": "",
+                        "schema": {
+                            "$ref": "#/definitions/user_deletion_job",
+                            "x-scope": [
+                                ""
+                            ]
+                        }
+                    }
+                },
+                "tags": [
+                    "authentication"
+                ]
+            }
+        },
+        "/user_deletion_jobs/{job_id}": {
+            "get": {
+                "operationId": "user_deletion_job_read",
+                "produces": [
+                    "application/json"
+                ],
+                "responses": {
+                    "200": {
+                        "description": "",
+                        "schema": {
+                            "$ref": "#/definitions/user_deletion_job",
+                            "x-scope": [
+                                ""
+                            ]
+                        }
+                    }
+                },
+                "tags": [
+                    "authentication"
+                ]
+            },
+            "parameters": [
+                {
+                    "$ref": "#/parameters/job_id",
+                    "x-scope": [
+                        ""
+                    ]
+                }
+            ]
+        },
         "/users": {
             "get": {
                 "operationId": "user_list",
@@ -2127,6 +2684,32 @@ class __SWAGGER_SPEC__(View):
                         "required": false,
                         "type": "array",
                         "uniqueItems": true
+                    },
+                    {
+                        "description": "An optional opaque cursor for keyset pagination. Pass an empty value to request the first page and the X-Next-Cursor header value of a response for the page that follows it. Cannot be combined with offset.",
+                        "in": "query",
+                        "name": "cursor",
+                        "required": false,
+                        "type": "string"
+                    },
+                    {
+                        "$ref": "#/parameters/optional_count",
+                        "x-scope": [
+                            ""
+                        ]
+                    },
+                    {
+                        "default": "inner",
+                        "description": "An optional query parameter specifying how q is matched. \\"inner\\" (the default) matches any part of the text. \\"token\\" and \\"prefix\\" use full text search to match whole words or the start of words respectively, and order the results by relevance unless order_by is specified.",
+                        "enum": [
+                            "inner",
+                            "token",
+                            "prefix"
+                        ],
+                        "in": "query",
+                        "name": "search_mode",
+                        "required": false,
+                        "type": "string"
                     }
                 ],
                 "produces": [
@@ -2136,6 +2719,10 @@ class __SWAGGER_SPEC__(View):
                     "200": {
                         "description": "",
                         "headers": {
+                            "X-Next-Cursor": {
+                                "description": "The cursor of the next page, only returned when paginating with a cursor and more results may follow",
+                                "type": "string"
+                            },
                             "X-Total-Count": {
                                 "description": "The total number of results matching the query",
                                 "type": "integer"
@@ -0,0 +1,370 @@
+"""
+Construction of the Access Control and User Data Store API clients.
+
+The generated clients pool at most 4 connections per host and make requests
+without a timeout or retries. The clients built here replace the pool manager
+of the generated client with one that is sized from the settings, applies
+connect and read timeouts to every request that does not set its own, retries
+failed connections and idempotent requests with jittered backoff and counts
+how often its pools are saturated.
+
+Every generated ApiClient also starts a ThreadPool with a thread per CPU, which
+is only used for async requests. Once the app is ready, install() makes every
+generated ApiClient in the process create it on their first async request
+instead.
+
+Requests are made through a circuit breaker per endpoint, which fails them
+fast once the endpoint keeps failing and lets a single probe through after a
+while to find out if it recovered.
+
+This module is imported by the settings, so it must not use them itself.
+"""
+import functools
+import logging
+import random
+import socket
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+import urllib3
+from django.utils.functional import SimpleLazyObject
+from prometheus_client import Counter, Gauge
+from urllib3.connection import HTTPConnection
+
+LOGGER = logging.getLogger(__name__)
+
+IN_FLIGHT = Gauge(
+    "authentication_service_api_requests_in_flight",
+    "API requests waiting for a response", ["service"]
+)
+SATURATED = Counter(
+    "authentication_service_api_pool_saturated_total",
+    "API requests made while every pooled connection was in use", ["service"]
+)
+POOL_SIZE = Gauge(
+    "authentication_service_api_pool_size",
+    "Connections kept per API host", ["service"]
+)
+CIRCUIT_STATE = Gauge(
+    "authentication_service_api_circuit_state",
+    "State of the circuit breaker of an API endpoint, 0 closed, 1 half-open "
+    "and 2 open", ["service", "endpoint"]
+)
+CIRCUIT_OPENED = Counter(
+    "authentication_service_api_circuit_opened_total",
+    "Times the circuit breaker of an API endpoint opened", ["service", "endpoint"]
+)
+CIRCUIT_REJECTED = Counter(
+    "authentication_service_api_circuit_rejected_total",
+    "API requests failed fast by an open circuit breaker", ["service", "endpoint"]
+)
+
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+# Responses worth another attempt, as the API or its load balancer may just
+# be restarting.
+RETRY_STATUSES = (502, 503, 504)
+
+
+class JitterRetry(urllib3.Retry):
+    """
+    Retry with full jitter: the backoff before a retry is a random time up to
+    the exponential backoff, so that clients do not retry in lockstep.
+    """
+
+    def get_backoff_time(self):
+        return random.uniform(0, super(JitterRetry, self).get_backoff_time())
+
+
+class LazyThreadPool(object):
+    """
+    Stands in for the ThreadPool of a generated ApiClient and only starts it
+    when a request is made asynchronously.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def apply_async(self, *args, **kwargs):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPool(self.processes)
+        return self._pool.apply_async(*args, **kwargs)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+
+    def join(self):
+        if self._pool is not None:
+            self._pool.join()
+
+
+def is_failure(exception: Exception) -> bool:
+    """
+    :return: True if the exception means the API is unavailable, rather than
+        that it rejected the request
+    """
+    if isinstance(exception, urllib3.exceptions.HTTPError):
+        return True
+    # The generated clients raise their ApiException for error responses,
+    # with a status of 0 for SSL errors.
+    status = getattr(exception, "status", None)
+    return isinstance(status, int) and (status == 0 or status >= 500)
+
+
+class Circuit(object):
+    """
+    The circuit breaker of a single endpoint. It opens after failure_threshold
+    consecutive failures and lets a single probe request through once it has
+    been open for reset_timeout seconds. The circuit closes if the probe
+    succeeds and opens again if it fails.
+    """
+
+    def __init__(self, service: str, endpoint: str, failure_threshold: int,
+                 reset_timeout: float):
+        self.service = service
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+        self._set_state(CLOSED)
+
+    def _set_state(self, state: int):
+        self.state = state
+        CIRCUIT_STATE.labels(service=self.service, endpoint=self.endpoint).set(state)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and \
+                    time.monotonic() - self.opened_at >= self.reset_timeout:
+                # This request is the probe, the others keep failing fast.
+                self._set_state(HALF_OPEN)
+                return True
+            return self.state == CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                LOGGER.info(
+                    "Closing the circuit of %s %s", self.service, self.endpoint
+                )
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or \
+                    self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    LOGGER.warning(
+                        "Opening the circuit of %s %s after %s failures",
+                        self.service, self.endpoint, self.failures
+                    )
+                    CIRCUIT_OPENED.labels(
+                        service=self.service, endpoint=self.endpoint
+                    ).inc()
+                self.opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+
+class CircuitBreaker(object):
+    """
+    Keeps a Circuit per endpoint of an API, identified by the method and the
+    path template, e.g. "GET /sites".
+    """
+
+    def __init__(self, module, failure_threshold: int, reset_timeout: float,
+                 endpoints: dict):
+        """
+        :param module: The generated client package, access_control or
+            user_data_store
+        :param failure_threshold: Consecutive failures that open a circuit. 0
+            disables the breaker.
+        :param reset_timeout: Seconds a circuit stays open before a probe
+        :param endpoints: failure_threshold and reset_timeout overrides by
+            endpoint
+        """
+        self.module = module
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.endpoints = endpoints
+        self.circuits = {}
+        self._lock = threading.Lock()
+
+    def circuit(self, endpoint: str) -> Circuit:
+        with self._lock:
+            if endpoint not in self.circuits:
+                options = {
+                    "failure_threshold": self.failure_threshold,
+                    "reset_timeout": self.reset_timeout,
+                }
+                options.update(self.endpoints.get(endpoint, {}))
+                self.circuits[endpoint] = Circuit(
+                    self.module.__name__, endpoint, **options
+                )
+            return self.circuits[endpoint]
+
+    def wrap(self, call_api):
+        @functools.wraps(call_api)
+        def wrapper(resource_path, method, *args, **kwargs):
+            if not self.failure_threshold:
+                return call_api(resource_path, method, *args, **kwargs)
+
+            circuit = self.circuit(f"{method} {resource_path}")
+            if not circuit.allow():
+                CIRCUIT_REJECTED.labels(
+                    service=circuit.service, endpoint=circuit.endpoint
+                ).inc()
+                raise self.module.rest.ApiException(
+                    status=503, reason=f"Circuit open: {circuit.endpoint}"
+                )
+            try:
+                result = call_api(resource_path, method, *args, **kwargs)
+            except Exception as e:
+                if is_failure(e):
+                    circuit.record_failure()
+                else:
+                    circuit.record_success()
+                raise
+            circuit.record_success()
+            return result
+        return wrapper
+
+
+def install():
+    """
+    Replaces the ThreadPool of the generated ApiClients with a LazyThreadPool.
+    This applies to every ApiClient constructed afterwards, also those not
+    built by build(). Called once the app is ready.
+    """
+    import access_control
+    import user_data_store
+    for module in (access_control, user_data_store):
+        module.api_client.ThreadPool = LazyThreadPool
+
+
+def lazy(factory) -> SimpleLazyObject:
+    """
+    :param factory: Builds a client, or an API using one
+    :return: A proxy calling factory on first use. Unlike a plain
+        SimpleLazyObject, the factory is called only once when several
+        threads first use the proxy at the same time, so that they share the
+        client, its pool and circuit breakers.
+    """
+    lock = threading.Lock()
+    built = []
+
+    def build_once():
+        with lock:
+            if not built:
+                built.append(factory())
+        return built[0]
+
+    return SimpleLazyObject(build_once)
+
+
+class PoolManager(urllib3.PoolManager):
+
+    def __init__(self, service: str, default_timeout: urllib3.Timeout, **kwargs):
+        super(PoolManager, self).__init__(**kwargs)
+        self.service = service
+        self.default_timeout = default_timeout
+        self.maxsize = kwargs.get("maxsize", 1)
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        POOL_SIZE.labels(service=service).set(self.maxsize)
+
+    def urlopen(self, method, url, redirect=True, **kw):
+        # The generated clients pass a timeout of None unless the caller set
+        # one, which would otherwise override the pool default.
+        if kw.get("timeout") is None:
+            kw["timeout"] = self.default_timeout
+        elif "retries" not in kw:
+            # Callers setting their own timeout work to a deadline, which
+            # retries would overrun.
+            kw["retries"] = self.connection_pool_kw["retries"].new(total=0)
+        with self._lock:
+            if self.in_flight >= self.maxsize:
+                # Connections opened beyond the pool size are discarded once
+                # the response is read, rather than kept alive.
+                SATURATED.labels(service=self.service).inc()
+            self.in_flight += 1
+        IN_FLIGHT.labels(service=self.service).inc()
+        try:
+            return super(PoolManager, self).urlopen(method, url, redirect=redirect, **kw)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            IN_FLIGHT.labels(service=self.service).dec()
+
+
+def build(module, host: str, api_key: str, pool_size: int, connect_timeout: float,
+          read_timeout: float, retries: int, retry_backoff: float,
+          keep_alive: bool, breaker_threshold: int, breaker_reset_timeout: float,
+          breaker_endpoints: dict):
+    """
+    :param module: The generated client package, access_control or
+        user_data_store
+    :param host: The base URL of the API
+    :param api_key: The key sent in the X-API-KEY header
+    :param pool_size: Connections kept alive per host
+    :param connect_timeout: Seconds allowed to connect
+    :param read_timeout: Seconds allowed between bytes of the response
+    :param retries: Retries of failed connections and of idempotent requests
+        answered with a 502, 503 or 504. Read timeouts and requests with
+        their own timeout are not retried.
+    :param retry_backoff: Backoff factor of the retries, in seconds
+    :param keep_alive: Enable TCP keep-alive on the pooled connections
+    :param breaker_threshold: Consecutive failures of an endpoint that open its
+        circuit, 0 disables the circuit breaker
+    :param breaker_reset_timeout: Seconds a circuit stays open before a probe
+    :param breaker_endpoints: Threshold and reset timeout overrides, by
+        endpoint
+    :return: An ApiClient for all the APIs of the package
+    """
+    configuration = module.configuration.Configuration()
+    configuration.host = host
+    configuration.connection_pool_maxsize = pool_size
+    api_client = module.ApiClient(
+        header_name="X-API-KEY",
+        header_value=api_key,
+        configuration=configuration
+    )
+
+    # Keep the SSL settings of the pool manager the generated client made.
+    pool_kwargs = dict(api_client.rest_client.pool_manager.connection_pool_kw)
+    pool_kwargs["maxsize"] = pool_size
+    if keep_alive:
+        pool_kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        ]
+    api_client.rest_client.pool_manager = PoolManager(
+        module.__name__,
+        urllib3.Timeout(connect=connect_timeout, read=read_timeout),
+        # Read timeouts are not retried, as they would hold the calling thread
+        # for several times the read timeout.
+        retries=JitterRetry(
+            total=retries, read=0, backoff_factor=retry_backoff,
+            status_forcelist=RETRY_STATUSES, raise_on_status=False,
+            respect_retry_after_header=False
+        ),
+        **pool_kwargs
+    )
+
+    # Both sync and async requests are made by the name mangled private
+    # __call_api, which still has the path template of the endpoint.
+    api_client.breaker = CircuitBreaker(
+        module, breaker_threshold, breaker_reset_timeout, breaker_endpoints
+    )
+    api_client._ApiClient__call_api = api_client.breaker.wrap(
+        api_client._ApiClient__call_api
+    )
+    return api_client
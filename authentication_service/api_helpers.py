@@ -1,19 +1,101 @@
 import logging
+from collections import namedtuple
 
 from django.conf import settings
 from django.core import exceptions
 
 from access_control.rest import ApiException as AccessControlApiException
+from authentication_service import api_clients, cache
 from user_data_store.rest import ApiException as UserDataStoreApiException
 
 
 LOGGER = logging.getLogger(__name__)
 
+SiteInfo = namedtuple("SiteInfo", ["site_id", "is_active"])
 
-def create_user_site_data(user_id, site_id):
+# Process wide cache of client id -> SiteInfo lookups.
+SITE_CACHE = cache.TTLCache("site", settings.SITE_CACHE_SIZE)
+# The last SiteInfo found per client id, served when Access Control fails.
+SITE_FALLBACK_CACHE = cache.TTLCache("site_fallback", settings.SITE_CACHE_SIZE)
+
+
+def _request_timeout(timeout):
+    # The generated clients only accept whole seconds, or a (connect, read)
+    # pair of timeouts.
+    return (timeout, timeout) if timeout else None
+
+
+def create_user_site_data(user_id, site_id, timeout=None):
     return settings.USER_DATA_STORE_API.usersitedata_create(data={
         "user_id": user_id, "site_id": site_id, "data": {}
-    })
+    }, _request_timeout=_request_timeout(timeout))
+
+
+def _get_site_info(client_id, timeout=None):
+    """
+    Return the (site_id, is_active) pair of the Site linked to the Client
+    identified by client_id, or None if no Site is linked to it. The site_id
+    is None if several Sites are linked to it.
+
+    The mapping almost never changes, so lookups are cached for
+    SITE_CACHE_TTL seconds. Clients without a Site are cached as well, for
+    SITE_CACHE_NEGATIVE_TTL seconds. Access Control errors are never cached.
+
+    When Access Control is unavailable, or its circuit is open, the last
+    SiteInfo found in the past SITE_FALLBACK_TTL seconds is returned instead.
+    :param client_id: The Client ID
+    :param timeout: Seconds allowed to connect and to read the response
+    :return: A SiteInfo or None
+    """
+    site_info = SITE_CACHE.get(client_id)
+    if site_info is not cache.MISSING:
+        return site_info
+
+    try:
+        sites = settings.ACCESS_CONTROL_API.site_list(
+            client_id=client_id, _request_timeout=_request_timeout(timeout)
+        )
+    except Exception as e:
+        if not api_clients.is_failure(e):
+            raise
+        site_info = SITE_FALLBACK_CACHE.get(client_id)
+        if site_info is cache.MISSING:
+            raise
+        LOGGER.warning(
+            "Using the last known Site of client.id (%s): %s", client_id, e
+        )
+        return site_info
+
+    if len(sites) == 1:
+        site_info = SiteInfo(sites[0].id, sites[0].is_active)
+        SITE_CACHE.set(client_id, site_info, settings.SITE_CACHE_TTL)
+        SITE_FALLBACK_CACHE.set(client_id, site_info, settings.SITE_FALLBACK_TTL)
+    elif sites:
+        # A misconfiguration. The Site is ambiguous, but whether it is active
+        # is still checked against the first one.
+        LOGGER.warning(
+            "%s Sites are linked to client.id (%s).", len(sites), client_id
+        )
+        site_info = SiteInfo(None, sites[0].is_active)
+        SITE_CACHE.set(client_id, site_info, settings.SITE_CACHE_NEGATIVE_TTL)
+    else:
+        site_info = None
+        SITE_CACHE.set(client_id, site_info, settings.SITE_CACHE_NEGATIVE_TTL)
+    return site_info
+
+
+def invalidate_site_cache(client_id=None):
+    """
+    Drop cached Site information. Should be called whenever a Site or the
+    Client linked to it changes.
+    :param client_id: The Client ID to invalidate, all entries if omitted
+    """
+    if client_id is None:
+        SITE_CACHE.clear()
+        SITE_FALLBACK_CACHE.clear()
+    else:
+        SITE_CACHE.delete(client_id)
+        SITE_FALLBACK_CACHE.delete(client_id)
 
 
 def is_site_active(client):
@@ -22,65 +104,74 @@ def is_site_active(client):
     :return: boolean
     """
     try:
-        sites = settings.ACCESS_CONTROL_API.site_list(client_id=client.id)
-    except AccessControlApiException as e:
+        site_info = _get_site_info(client.id)
+    except Exception as e:
+        # Includes timeouts and unreachable hosts, which the generated
+        # clients raise as urllib3 errors.
+        if not (isinstance(e, AccessControlApiException) or api_clients.is_failure(e)):
+            raise
         LOGGER.error(str(e))
         return False
 
-    if sites:
-        return sites[0].is_active
+    if site_info:
+        return site_info.is_active
 
     raise exceptions.ImproperlyConfigured(
         f"Site for client.id ({client.id}) not found"
     )
 
 
-def get_site_for_client(client_id):
+def get_site_for_client(client_id, timeout=None):
     """
     Return the id of the Site linked to the Client identified by client_id.
     :param client_id: The Client ID
+    :param timeout: Seconds allowed to connect and to read the response
     :return:  The Site ID
     """
-    try:
-        sites = settings.ACCESS_CONTROL_API.site_list(client_id=client_id)
-        if len(sites) == 1:  # It is not necessary to check if the site is active.
-            return sites[0].id
+    site_info = _get_site_info(client_id, timeout)
+    # It is not necessary to check if the site is active.
+    if site_info and site_info.site_id is not None:
+        return site_info.site_id
 
-        raise exceptions.ImproperlyConfigured(
-            f"Site for client.id ({client_id}) not found."
-        )
-    except AccessControlApiException as e:
-        raise e
+    raise exceptions.ImproperlyConfigured(
+        f"Site for client.id ({client_id}) not found."
+    )
 
 
-def get_user_site_data(user_id, site_id):
+def get_user_site_data(user_id, site_id, timeout=None):
+    """
+    :param timeout: Seconds allowed to connect and to read each response
+    """
     # API clients require uuid as a string.
     user_id = str(user_id)
 
     try:
-        site_data = settings.USER_DATA_STORE_API.usersitedata_read(str(user_id), site_id)
+        site_data = settings.USER_DATA_STORE_API.usersitedata_read(
+            str(user_id), site_id, _request_timeout=_request_timeout(timeout)
+        )
     except UserDataStoreApiException as e:
         if e.status == 404:
-            site_data = create_user_site_data(user_id, site_id)
+            site_data = create_user_site_data(user_id, site_id, timeout)
         else:
             raise e
     return site_data
 
 
-def get_user_site_role_labels_aggregated(user_id, client_id):
-    # Returns a list of sites.
-    sites = settings.ACCESS_CONTROL_API.site_list(client_id=client_id)
+def get_user_site_roles(user_id, site_id, timeout=None):
+    """
+    :param timeout: Seconds allowed to connect and to read the response
+    :return: The role labels of the user on the Site
+    """
+    return settings.AC_OPERATIONAL_API.get_user_site_role_labels_aggregated(
+        str(user_id), site_id, _request_timeout=_request_timeout(timeout)
+    ).roles
 
-    # Get the id of the site
-    if len(sites) == 1:  # It is not necessary to check if the site is active
-        site_id = sites[0].id
 
-        # Return the roles
-        return settings.AC_OPERATIONAL_API.get_user_site_role_labels_aggregated(
-            str(user_id), site_id).roles
-    raise exceptions.ImproperlyConfigured(
-        f"Site for client.id ({client_id}) not found."
-    )
+def get_user_site_role_labels_aggregated(user_id, client_id):
+    site_id = get_site_for_client(client_id)
+
+    # Return the roles
+    return get_user_site_roles(user_id, site_id)
 
 
 def get_invitation_data(invitation_id):
@@ -11,5 +11,11 @@ class AuthAppConfig(AppConfig):
         # We have to import signals only when the app is ready.
         from authentication_service import signals
         Field.register_lookup(lookups.Ilike)
-        from authentication_service import integration, metrics
+        from authentication_service import (
+            api_clients, instrumentation, integration, metrics
+        )
         metrics.add_prometheus_metrics_for_class(integration.Implementation)
+        instrumentation.install()
+        api_clients.install()
+        from authentication_service.api import utils as api_utils
+        api_utils.sample_response_validation()
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+
+from prometheus_client import Counter
+
+
+# Sentinel returned on a cache miss. Needed because None is a valid cached
+# value, e.g. when negatively caching lookups that found nothing.
+MISSING = object()
+
+LOOKUPS = Counter(
+    "authentication_service_cache_lookups_total", "In-process cache lookups",
+    ["cache", "result"]
+)
+
+
+class TTLCache(object):
+    """
+    A small, thread safe, in-process cache. Entries expire after the
+    time-to-live given when they are set and the least recently used entries
+    are evicted once the cache grows beyond maxsize.
+
+    Lookups are counted per cache name, as either a "hit" or a "miss".
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :param key: The key to look up
+        :return: The cached value, or MISSING if there is no live entry for key
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    LOOKUPS.labels(cache=self.name, result="hit").inc()
+                    return value
+                del self._data[key]
+        LOOKUPS.labels(cache=self.name, result="miss").inc()
+        return MISSING
+
+    def set(self, key, value, ttl: float):
+        """
+        :param key: The key to store the value under
+        :param value: The value to cache, may be None
+        :param ttl: Seconds the entry stays valid. Nothing is cached if the
+            ttl is not positive.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+            if ttl <= 0:
+                return
+            self._data[key] = (time.monotonic() + ttl, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
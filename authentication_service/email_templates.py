@@ -0,0 +1,97 @@
+"""
+Rendering of the templates used for emails.
+
+The templates are loaded once, through a cached loader, instead of being read
+and parsed for every email. The project's template loaders are not cached,
+so the emails get a template backend of their own, configured like the
+project's Django backend but with its loaders wrapped in a cached loader.
+
+Emails are rendered outside of requests, so the default templates are used.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+CACHED_LOADER = "django.template.loaders.cached.Loader"
+
+# The templates rendered by the email tasks, which are loaded when a worker
+# starts.
+EMAIL_TEMPLATES = [
+    "authentication_service/email/delete_account.html",
+    "authentication_service/email/deletion_confirmation.html",
+    "authentication_service/email/invitation.html",
+    "registration/password_reset_email.html",
+    "request_client/email/request_client.html",
+]
+
+_lock = threading.Lock()
+_backend = None
+
+
+def _build_backend():
+    for config in settings.TEMPLATES:
+        if config["BACKEND"] == "django.template.backends.django.DjangoTemplates":
+            break
+    else:
+        raise ImproperlyConfigured("No DjangoTemplates backend is configured")
+
+    options = dict(config.get("OPTIONS", {}))
+    loaders = options.get("loaders")
+    # Without explicit loaders, Django caches them unless debug is on.
+    if loaders and not any(
+            isinstance(loader, (list, tuple)) and loader[0] == CACHED_LOADER
+            for loader in loaders):
+        options["loaders"] = [(CACHED_LOADER, loaders)]
+    return DjangoTemplates({
+        "NAME": "email",
+        "DIRS": config.get("DIRS", []),
+        "APP_DIRS": config.get("APP_DIRS", False),
+        "OPTIONS": options,
+    })
+
+
+def get_backend() -> DjangoTemplates:
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = _build_backend()
+    return _backend
+
+
+def get_template(template_name: str):
+    """
+    :param template_name: The name of the template
+    :return: The template, which is shared by all languages
+    """
+    return get_backend().get_template(template_name)
+
+
+def render_to_string(template_name: str, context: dict = None) -> str:
+    """
+    Renders a template in the active language. Context processors are not
+    run, as is the case for loader.render_to_string without a request.
+    """
+    return get_template(template_name).render(context)
+
+
+def warm():
+    """
+    Loads the email templates.
+    """
+    for template_name in EMAIL_TEMPLATES:
+        try:
+            get_template(template_name)
+        except Exception:
+            logger.exception("Failed to load email template %s", template_name)
+
+
+def clear():
+    global _backend
+    with _lock:
+        _backend = None
@@ -0,0 +1,157 @@
+"""
+Buffered publishing of events.
+
+Events are put on an in-process, bounded queue and a background thread hands
+them to a sink in batches. A batch is flushed once it reaches the batch size,
+or once the flush interval has passed since its first event was queued.
+
+Putting an event never blocks for longer than the put timeout. Events that do
+not fit on the queue in time are dropped and counted, which keeps a slow or
+unavailable sink from slowing down requests.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from prometheus_client import Counter, Gauge
+
+from kinesis_conducer.producer_events import events
+
+logger = logging.getLogger(__name__)
+
+EVENTS = Counter(
+    "authentication_service_buffered_events_total", "Events put on the event buffer",
+    ["result"]
+)
+BATCHES = Counter(
+    "authentication_service_event_batches_total", "Event batches handed to the sink",
+    ["result"]
+)
+QUEUE_SIZE = Gauge(
+    "authentication_service_event_queue_size", "Events waiting to be flushed"
+)
+
+
+def kinesis_sink(batch):
+    """
+    Publishes a batch of events through the Kinesis producer, which in turn
+    aggregates records before putting them on the stream.
+    :param batch: A list of event keyword argument dictionaries
+    """
+    for event in batch:
+        events.put_event(**event)
+
+
+class EventBuffer(object):
+
+    def __init__(self, sink, maxsize: int, batch_size: int,
+                 flush_interval: float, put_timeout: float = 0):
+        """
+        :param sink: Callable receiving a list of events
+        :param maxsize: The maximum number of events waiting to be flushed
+        :param batch_size: The maximum number of events per batch
+        :param flush_interval: Seconds after which a partial batch is flushed
+        :param put_timeout: Seconds to wait for space on a full queue before
+            an event is dropped
+        """
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def put(self, **event):
+        """
+        Queues an event for publishing.
+        :return: False if the event was dropped
+        """
+        self._ensure_worker()
+        try:
+            if self.put_timeout > 0:
+                self._queue.put(event, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            EVENTS.labels(result="dropped").inc()
+            logger.warning("Event buffer full, dropped %s event.", event.get("event_type"))
+            return False
+        EVENTS.labels(result="queued").inc()
+        QUEUE_SIZE.inc()
+        return True
+
+    def flush(self, timeout: float = None):
+        """
+        Waits until all queued events have been handed to the sink.
+        :param timeout: Seconds to wait at most
+        :return: False if events were still waiting when the timeout expired
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _ensure_worker(self):
+        # Web servers fork their workers after the application is loaded and
+        # threads do not survive a fork, so the worker is started on first use
+        # in every process.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                threading.Thread(
+                    target=self._run, name="event-buffer", daemon=True
+                ).start()
+                self._pid = os.getpid()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            QUEUE_SIZE.dec(len(batch))
+            try:
+                self.sink(batch)
+                BATCHES.labels(result="flushed").inc()
+            except Exception:
+                BATCHES.labels(result="failed").inc()
+                EVENTS.labels(result="dropped").inc(len(batch))
+                logger.exception("Failed to publish %s events.", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+BUFFER = EventBuffer(
+    import_string(settings.EVENT_BUFFER_SINK),
+    maxsize=settings.EVENT_BUFFER_SIZE,
+    batch_size=settings.EVENT_BUFFER_BATCH_SIZE,
+    flush_interval=settings.EVENT_BUFFER_FLUSH_INTERVAL,
+    put_timeout=settings.EVENT_BUFFER_PUT_TIMEOUT,
+)
+
+
+@atexit.register
+def _flush_on_exit():
+    BUFFER.flush(timeout=settings.EVENT_BUFFER_FLUSH_INTERVAL * 2)
@@ -730,18 +730,14 @@ class ResetPasswordForm(PasswordResetForm):
                 context.update(extra_email_context)
             user = context.pop("user")
             extra = {"recipients": [user.email]}
-            user = {
-                "app_label": user._meta.app_label,
-                "model": user._meta.model_name,
-                "id": user.id,
-                "context_key": "user",
-            }
+            # The email template only needs the username, which is passed
+            # along so that the task does not have to fetch the user.
+            context["user"] = {"get_username": user.get_username()}
             context["uid"] = context["uid"].decode("utf-8")
             tasks.send_mail.apply_async(
                 kwargs={
                     "context": context,
                     "mail_type": "password_reset",
-                    "objects_to_fetch": [user],
                     "extra": extra
                 }
             )
@@ -0,0 +1,194 @@
+"""
+Per request instrumentation.
+
+The database queries, Access Control and User Data Store calls and the
+password and security answer hashing of a request are counted and timed, and
+exported per resolved URL name. Requests slower than SLOW_REQUEST_THRESHOLD
+are logged with this breakdown.
+
+Django 1.11 has no connection.execute_wrapper, so queries are measured by
+wrapping the execute methods of its CursorWrapper, which the debug cursor
+builds on as well. Unlike the query log, this neither formats nor logs the
+SQL. API calls and hashing are measured by wrapping the generated
+ApiClient.request methods and the hashers.
+"""
+import collections
+import contextlib
+import functools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from prometheus_client import Histogram
+
+LOGGER = logging.getLogger(__name__)
+
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, float("inf"))
+
+REQUEST_DURATION = Histogram(
+    "authentication_service_request_duration_seconds",
+    "Request duration (s)", ["view", "method"]
+)
+REQUEST_QUERIES = Histogram(
+    "authentication_service_request_queries", "Database queries per request",
+    ["view"], buckets=COUNT_BUCKETS
+)
+REQUEST_QUERY_DURATION = Histogram(
+    "authentication_service_request_query_duration_seconds",
+    "Database query duration per request (s)", ["view"]
+)
+REQUEST_API_CALLS = Histogram(
+    "authentication_service_request_api_calls", "API calls per request",
+    ["view"], buckets=COUNT_BUCKETS
+)
+REQUEST_API_DURATION = Histogram(
+    "authentication_service_request_api_duration_seconds",
+    "API call duration per request (s)", ["view"]
+)
+REQUEST_HASHING_DURATION = Histogram(
+    "authentication_service_request_hashing_duration_seconds",
+    "Password and answer hashing duration per request (s)", ["view"]
+)
+
+_local = threading.local()
+
+
+class Budget(object):
+    """
+    What a request spent on queries, API calls and hashing. API calls and
+    hashing can be recorded from other threads working for the request.
+    """
+
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.seconds = collections.Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def queries(self) -> int:
+        return self.calls["query"]
+
+    @property
+    def query_seconds(self) -> float:
+        return self.seconds["query"]
+
+    def add(self, kind: str, seconds: float):
+        with self._lock:
+            self.calls[kind] += 1
+            self.seconds[kind] += seconds
+
+
+def current():
+    """
+    :return: The Budget of the request measured by this thread, if any
+    """
+    return getattr(_local, "budget", None)
+
+
+@contextlib.contextmanager
+def activate(budget):
+    """
+    Records the API calls and hashing of the block on budget. Used to carry
+    the budget of a request over to threads working for it.
+    """
+    previous = current()
+    _local.budget = budget
+    try:
+        yield budget
+    finally:
+        _local.budget = previous
+
+
+@contextlib.contextmanager
+def measure():
+    """
+    Measures the queries, API calls and hashing of the block.
+    :return: The Budget of the block
+    """
+    with activate(Budget()) as budget:
+        yield budget
+
+
+def timed(kind: str):
+    """
+    Decorates a function to add its calls to the Budget of the current
+    request. Calls made while a call of the same kind is timed, like a hasher
+    verifying through its own encode, are not counted separately.
+    :param kind: The kind of work the function does
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            budget = current()
+            active = getattr(_local, "active", set())
+            if budget is None or kind in active:
+                return func(*args, **kwargs)
+            _local.active = active | {kind}
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _local.active = active
+                budget.add(kind, time.perf_counter() - start)
+
+        wrapper.instrumented = True
+        return wrapper
+    return decorator
+
+
+def instrument(klass, name: str, kind: str):
+    func = getattr(klass, name)
+    if not getattr(func, "instrumented", False):
+        setattr(klass, name, timed(kind)(func))
+
+
+def install():
+    """
+    Wraps the database cursors, the API clients and the configured hashers.
+    Called once the app is ready.
+    """
+    import access_control
+    import user_data_store
+    from django.db.backends.utils import CursorWrapper
+    instrument(CursorWrapper, "execute", "query")
+    instrument(CursorWrapper, "executemany", "query")
+    for api_client in (access_control.ApiClient, user_data_store.ApiClient):
+        instrument(api_client, "request", "api")
+    for path in settings.PASSWORD_HASHERS:
+        hasher = import_string(path)
+        instrument(hasher, "encode", "hashing")
+        instrument(hasher, "verify", "hashing")
+
+
+def view_name(request, response) -> str:
+    if response.status_code == 404:
+        return "not_found"
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return match.view_name or match._func_path
+
+
+def observe(request, response, budget: Budget, seconds: float):
+    """
+    Exports the measurements of a request and logs it if it was slow.
+    """
+    view = view_name(request, response)
+    REQUEST_DURATION.labels(view=view, method=request.method).observe(seconds)
+    REQUEST_QUERIES.labels(view=view).observe(budget.queries)
+    REQUEST_QUERY_DURATION.labels(view=view).observe(budget.query_seconds)
+    REQUEST_API_CALLS.labels(view=view).observe(budget.calls["api"])
+    REQUEST_API_DURATION.labels(view=view).observe(budget.seconds["api"])
+    REQUEST_HASHING_DURATION.labels(view=view).observe(budget.seconds["hashing"])
+
+    threshold = settings.SLOW_REQUEST_THRESHOLD
+    if threshold and seconds >= threshold:
+        LOGGER.warning(
+            "Slow request %s %s (%s): %.3fs, %d queries in %.3fs, "
+            "%d API calls in %.3fs, hashing %.3fs.",
+            request.method, request.path, view, seconds, budget.queries,
+            budget.query_seconds, budget.calls["api"], budget.seconds["api"],
+            budget.seconds["hashing"]
+        )
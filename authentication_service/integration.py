@@ -1,5 +1,6 @@
 import datetime
 import logging
+import uuid
 
 from django.core.exceptions import SuspiciousOperation
 from django.urls import reverse
@@ -8,15 +9,16 @@ from oidc_provider.models import Client
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models.expressions import RawSQL
 from django.shortcuts import get_object_or_404
 
-from authentication_service import tasks
+from authentication_service import search, tasks
 from authentication_service.api.stubs import AbstractStubClass
 from authentication_service.exceptions import BadRequestException
-from authentication_service.models import CoreUser, Country, Organisation, UserSite
+from authentication_service.models import CoreUser, Country, Organisation, \
+    UserDeletionJob, UserSite
 from authentication_service.utils import strip_empty_optional_fields, check_limit, \
-    to_dict_with_custom_fields, range_filter_parser
+    to_dict_with_custom_fields, range_filter_parser, cursor_ordering, cursor_filter, \
+    encode_cursor, paginate
 
 LOGGER = logging.getLogger(__name__)
 
@@ -37,15 +39,126 @@ USER_VALUES = [
     "gender", "birth_date", "avatar", "country", "created_at", "updated_at",
     "organisation"
 ]
+USER_DELETION_JOB_VALUES = [
+    "id", "deleter_id", "reason", "status", "processed", "deleted", "error",
+    "created_at", "updated_at", "completed_at"
+]
+# Fields users can be ordered by when using cursor pagination. All of them are
+# indexed.
+USER_CURSOR_FIELDS = {
+    "id", "username", "date_joined", "last_login", "updated_at"
+}
+# Arguments of filter_users that change how users are matched or ordered,
+# rather than selecting them.
+USER_FILTER_MODIFIERS = {"search_mode", "rank"}
 
 SUPPORTED_LANGUAGE_CODES = {language[0] for language in settings.LANGUAGES}
 
 
+def filter_users(users, birth_date=None, country=None, date_joined=None, email=None,
+                 email_verified=None, first_name=None, gender=None, is_active=None,
+                 last_login=None, last_name=None, msisdn=None, msisdn_verified=None,
+                 nickname=None, organisation_id=None, updated_at=None, username=None,
+                 q=None, tfa_enabled=None, has_organisation=None, user_ids=None,
+                 site_ids=None, search_mode=None, rank=False):
+    """
+    Apply the user_list filters to a queryset of users. The filters are
+    documented on user_list.
+    :param users: A CoreUser queryset
+    :param rank: Order the users by relevance when searching with q
+    :return: The filtered queryset
+    """
+    search_mode = search_mode or search.SEARCH_MODE_INNER
+
+    # Bools
+    if tfa_enabled is not None:
+        users = users.filter(
+            totpdevice__isnull=not tfa_enabled
+        )
+    if has_organisation is not None:
+        users = users.filter(
+            organisation__isnull=not has_organisation
+        )
+    if email_verified is not None:
+        users = users.filter(
+            email_verified=email_verified
+        )
+    if is_active is not None:
+        users = users.filter(
+            is_active=is_active
+        )
+    if msisdn_verified is not None:
+        users = users.filter(
+            msisdn_verified=msisdn_verified
+        )
+
+    # Dates
+    if birth_date:
+        ranges = range_filter_parser(birth_date)
+        users = users.filter(**{"birth_date__%s" % k: v for k, v in ranges.items()})
+    if date_joined:
+        ranges = range_filter_parser(date_joined)
+        users = users.filter(**{"date_joined__date__%s" % k: v for k, v in ranges.items()})
+    if last_login:
+        ranges = range_filter_parser(last_login)
+        users = users.filter(**{"last_login__date__%s" % k: v for k, v in ranges.items()})
+    if updated_at:
+        ranges = range_filter_parser(updated_at)
+        users = users.filter(**{"updated_at__date__%s" % k: v for k, v in ranges.items()})
+
+    # Partial matches
+    if email:
+        users = users.filter(email__ilike=email)
+    if first_name:
+        users = users.filter(first_name__ilike=first_name)
+    if username:
+        users = users.filter(username__ilike=username)
+    if msisdn:
+        users = users.filter(msisdn__ilike=msisdn)
+    if last_name:
+        users = users.filter(last_name__ilike=last_name)
+    if nickname:
+        users = users.filter(nickname__ilike=nickname)
+    if q:
+        users = search.search(users, q, search_mode, rank=rank)
+        if rank:
+            users = users.order_by("-search_rank", "id")
+
+    # Other filters
+    if country:
+        users = users.filter(country__code=country)
+    if user_ids:
+        users = users.filter(id__in=user_ids)
+    if gender:
+        users = users.filter(gender=gender)
+    if organisation_id:
+        users = users.filter(organisation__id=organisation_id)
+    if site_ids:
+        # In order for the count to be correct, we cannot join with the UserSite table and
+        # need to use a subquery.
+        site_user_ids = UserSite.objects.distinct().filter(site_id__in=site_ids).values(
+            "user_id")
+        users = users.filter(id__in=site_user_ids)
+
+    return users
+
+
+def user_deletion_job_dict(job):
+    """
+    The API representation of a UserDeletionJob. The user ids are left out, as
+    there may be many of them.
+    """
+    result = to_dict_with_custom_fields(job, USER_DELETION_JOB_VALUES)
+    result["total"] = job.total
+    result["error"] = job.error or None
+    return strip_empty_optional_fields(result)
+
+
 class Implementation(AbstractStubClass):
 
     # client_list -- Synchronisation point for meld
     @staticmethod
-    def client_list(request, offset=None, limit=None, client_ids=None, client_token_id=None, *args, **kwargs):
+    def client_list(request, offset=None, limit=None, client_ids=None, client_token_id=None, count=None, *args, **kwargs):
         """
         :param request: An HttpRequest
         :param offset: (optional) An optional query parameter specifying the offset in the result set to start from.
@@ -56,6 +169,8 @@ class Implementation(AbstractStubClass):
         :type client_ids: array
         :param client_token_id: (optional) An optional client id to filter on. This is not the primary key.
         :type client_token_id: string
+        :param count: (optional) An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+        :type count: string
         """
         offset = int(offset if offset else settings.DEFAULT_LISTING_OFFSET)
         limit = check_limit(limit)
@@ -68,15 +183,11 @@ class Implementation(AbstractStubClass):
         if client_token_id:
             clients = clients.filter(client_id=client_token_id)
 
-        clients = clients.annotate(
-            x_total_count=RawSQL("COUNT(*) OVER ()", [])
-        )[offset:offset + limit]
+        clients, headers = paginate(clients, offset, limit, count)
         return (
             [strip_empty_optional_fields(to_dict_with_custom_fields(client, CLIENT_VALUES))
              for client in clients],
-            {
-                "X-Total-Count": clients[0].x_total_count if clients else 0
-            }
+            headers
         )
 
     # client_read -- Synchronisation point for meld
@@ -93,7 +204,7 @@ class Implementation(AbstractStubClass):
 
     # country_list -- Synchronisation point for meld
     @staticmethod
-    def country_list(request, offset=None, limit=None, country_codes=None, *args, **kwargs):
+    def country_list(request, offset=None, limit=None, country_codes=None, count=None, *args, **kwargs):
         """
         :param request: An HttpRequest
         :param offset: (optional) An optional query parameter specifying the offset in the result set to start from.
@@ -102,6 +213,8 @@ class Implementation(AbstractStubClass):
         :type limit: integer
         :param country_codes: (optional) An optional list of country codes
         :type country_codes: array
+        :param count: (optional) An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+        :type count: string
         """
         offset = int(offset if offset else settings.DEFAULT_LISTING_OFFSET)
         limit = check_limit(limit)
@@ -111,15 +224,11 @@ class Implementation(AbstractStubClass):
         if country_codes:
             countries = countries.filter(code__in=country_codes)
 
-        countries = countries.annotate(
-            x_total_count=RawSQL("COUNT(*) OVER ()", [])
-        )[offset:offset + limit]
+        countries, headers = paginate(countries, offset, limit, count)
         return (
             [strip_empty_optional_fields(to_dict_with_custom_fields(country, COUNTRY_VALUES))
              for country in countries],
-            {
-                "X-Total-Count": countries[0].x_total_count if countries else 0
-            }
+            headers
         )
 
     # country_read -- Synchronisation point for meld
@@ -205,7 +314,7 @@ class Implementation(AbstractStubClass):
 
     # organisation_list -- Synchronisation point for meld
     @staticmethod
-    def organisation_list(request, offset=None, limit=None, organisation_ids=None, *args, **kwargs):
+    def organisation_list(request, offset=None, limit=None, organisation_ids=None, count=None, *args, **kwargs):
         """
         :param request: An HttpRequest
         :param offset: (optional) An optional query parameter specifying the offset in the result set to start from.
@@ -214,6 +323,8 @@ class Implementation(AbstractStubClass):
         :type limit: integer
         :param organisation_ids: (optional) An optional list of organisation ids
         :type organisation_ids: array
+        :param count: (optional) An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+        :type count: string
         """
         offset = int(offset if offset else settings.DEFAULT_LISTING_OFFSET)
         limit = check_limit(limit)
@@ -223,16 +334,12 @@ class Implementation(AbstractStubClass):
         if organisation_ids:
             organisations = organisations.filter(id__in=organisation_ids)
 
-        organisations = organisations.annotate(
-            x_total_count=RawSQL("COUNT(*) OVER ()", [])
-        )[offset:offset + limit]
+        organisations, headers = paginate(organisations, offset, limit, count)
         return (
             [strip_empty_optional_fields(to_dict_with_custom_fields(organisation,
                                                                     ORGANISATION_VALUES))
              for organisation in organisations],
-            {
-                "X-Total-Count": organisations[0].x_total_count if organisations else 0
-            }
+            headers
         )
 
     # organisation_create -- Synchronisation point for meld
@@ -314,9 +421,86 @@ class Implementation(AbstractStubClass):
         deleter = get_object_or_404(CoreUser, id=body["deleter_id"])
         tasks.delete_user_and_data_task.delay(user.id, deleter.id, body["reason"])
 
+    # user_bulk_read -- Synchronisation point for meld
+    @staticmethod
+    def user_bulk_read(request, body, *args, **kwargs):
+        """
+        :param request: An HttpRequest
+        :param body: A dictionary containing the parsed and validated body
+        :type body: dict
+        """
+        # Raises a ValueError, which results in a bad request, if an id is
+        # not a valid UUID.
+        user_ids = [str(uuid.UUID(user_id)) for user_id in body["user_ids"]]
+        users = CoreUser.objects.filter(id__in=user_ids)
+        result = {
+            str(user.id): strip_empty_optional_fields(
+                to_dict_with_custom_fields(user, USER_VALUES)
+            )
+            for user in users
+        }
+        return {
+            "users": result,
+            "missing_ids": [user_id for user_id in user_ids if user_id not in result]
+        }
+
+    # user_deletion_job_create -- Synchronisation point for meld
+    @staticmethod
+    def user_deletion_job_create(request, body, *args, **kwargs):
+        """
+        :param request: An HttpRequest
+        :param body: A dictionary containing the parsed and validated body
+        :type body: dict
+        """
+        if ("user_ids" in body) == ("filter" in body):
+            raise BadRequestException("Exactly one of user_ids and filter is required.")
+        # Modifiers do not select users, a filter of only modifiers would
+        # match every user.
+        if "filter" in body and not set(body["filter"]) - USER_FILTER_MODIFIERS:
+            raise BadRequestException("The filter must select the users to delete.")
+        deleter = get_object_or_404(CoreUser, id=body["deleter_id"])
+
+        max_users = settings.USER_DELETION_MAX_USERS
+        if "user_ids" in body:
+            if len(body["user_ids"]) > max_users:
+                raise BadRequestException(
+                    f"At most {max_users} users can be deleted by a job."
+                )
+            # Raises a ValueError, which results in a bad request, if an id is
+            # not a valid UUID.
+            user_ids = [uuid.UUID(user_id) for user_id in body["user_ids"]]
+        else:
+            # The users are selected when the job is created, users matching
+            # the filter later on are not deleted. Broad filters are rejected
+            # with the number of users they match, rather than loading them.
+            users = filter_users(CoreUser.objects.order_by("id"), **body["filter"])
+            user_ids = list(users.values_list("id", flat=True)[:max_users + 1])
+            if len(user_ids) > max_users:
+                raise BadRequestException(
+                    f"The filter matches {users.count()} users, at most "
+                    f"{max_users} can be deleted by a job."
+                )
+
+        job = UserDeletionJob.objects.create(
+            deleter_id=deleter.id, reason=body["reason"], user_ids=user_ids
+        )
+        tasks.delete_users_and_data_task.delay(job.id)
+        return user_deletion_job_dict(job)
+
+    # user_deletion_job_read -- Synchronisation point for meld
+    @staticmethod
+    def user_deletion_job_read(request, job_id, *args, **kwargs):
+        """
+        :param request: An HttpRequest
+        :param job_id: A UUID value identifying the user deletion job.
+        :type job_id: string
+        """
+        job = get_object_or_404(UserDeletionJob, id=job_id)
+        return user_deletion_job_dict(job)
+
     # user_list -- Synchronisation point for meld
     @staticmethod
-    def user_list(request, offset=None, limit=None, birth_date=None, country=None, date_joined=None, email=None, email_verified=None, first_name=None, gender=None, is_active=None, last_login=None, last_name=None, msisdn=None, msisdn_verified=None, nickname=None, organisation_id=None, updated_at=None, username=None, q=None, tfa_enabled=None, has_organisation=None, order_by=None, user_ids=None, site_ids=None, *args, **kwargs):
+    def user_list(request, offset=None, limit=None, birth_date=None, country=None, date_joined=None, email=None, email_verified=None, first_name=None, gender=None, is_active=None, last_login=None, last_name=None, msisdn=None, msisdn_verified=None, nickname=None, organisation_id=None, updated_at=None, username=None, q=None, tfa_enabled=None, has_organisation=None, order_by=None, user_ids=None, site_ids=None, cursor=None, count=None, search_mode=None, *args, **kwargs):
         """
         :param request: An HttpRequest
         :param offset: (optional) An optional query parameter specifying the offset in the result set to start from.
@@ -367,93 +551,60 @@ class Implementation(AbstractStubClass):
         :type user_ids: array
         :param site_ids: (optional) An optional list of site ids
         :type site_ids: array
-        """
+        :param cursor: (optional) An optional opaque cursor for keyset pagination. Pass an empty value to request the first page and the X-Next-Cursor header value of a response for the page that follows it. Cannot be combined with offset.
+        :type cursor: string
+        :param count: (optional) An optional query parameter specifying how X-Total-Count is determined. "exact" counts all matching results, "estimate" uses the database statistics instead and "none" leaves the header out.
+        :type count: string
+        :param search_mode: (optional) An optional query parameter specifying how q is matched. "inner" (the default) matches any part of the text. "token" and "prefix" use full text search to match whole words or the start of words respectively, and order the results by relevance unless order_by is specified.
+        :type search_mode: string
+        """
+        if cursor is not None and offset:
+            raise BadRequestException("The offset and cursor parameters are mutually exclusive.")
         offset = int(offset if offset else settings.DEFAULT_LISTING_OFFSET)
         limit = check_limit(limit)
 
+        search_mode = search_mode or search.SEARCH_MODE_INNER
+        rank = bool(q) and search_mode != search.SEARCH_MODE_INNER and \
+            not order_by and cursor is None
+
         order_by = order_by or ["id"]
+        if cursor is not None:
+            order_by = cursor_ordering(order_by, USER_CURSOR_FIELDS)
         users = get_user_model().objects.order_by(*order_by)
 
-        # Bools
-        if tfa_enabled is not None:
-            users = users.filter(
-                totpdevice__isnull=not tfa_enabled
-            )
-        if has_organisation is not None:
-            users = users.filter(
-                organisation__isnull=not has_organisation
-            )
-        if email_verified is not None:
-            users = users.filter(
-                email_verified=email_verified
-            )
-        if is_active is not None:
-            users = users.filter(
-                is_active=is_active
-            )
-        if msisdn_verified is not None:
-            users = users.filter(
-                msisdn_verified=msisdn_verified
+        users = filter_users(
+            users, birth_date=birth_date, country=country, date_joined=date_joined,
+            email=email, email_verified=email_verified, first_name=first_name,
+            gender=gender, is_active=is_active, last_login=last_login,
+            last_name=last_name, msisdn=msisdn, msisdn_verified=msisdn_verified,
+            nickname=nickname, organisation_id=organisation_id, updated_at=updated_at,
+            username=username, q=q, tfa_enabled=tfa_enabled,
+            has_organisation=has_organisation, user_ids=user_ids, site_ids=site_ids,
+            search_mode=search_mode, rank=rank
+        )
+
+        if cursor is not None:
+            # Keyset pagination. Instead of skipping over offset rows, the
+            # query continues after the last row of the previous page, which
+            # can make use of the indexes on the ordering fields.
+            if cursor:
+                users = users.filter(cursor_filter(CoreUser, cursor, order_by))
+            users = list(users[:limit])
+            headers = {}
+            if len(users) == limit:
+                headers["X-Next-Cursor"] = encode_cursor(users[-1], order_by)
+            return (
+                [strip_empty_optional_fields(to_dict_with_custom_fields(user, USER_VALUES))
+                 for user in users],
+                headers
             )
 
-        # Dates
-        if birth_date:
-            ranges = range_filter_parser(birth_date)
-            users = users.filter(**{"birth_date__%s" % k: v for k, v in ranges.items()})
-        if date_joined:
-            ranges = range_filter_parser(date_joined)
-            users = users.filter(**{"date_joined__date__%s" % k: v for k, v in ranges.items()})
-        if last_login:
-            ranges = range_filter_parser(last_login)
-            users = users.filter(**{"last_login__date__%s" % k: v for k, v in ranges.items()})
-        if updated_at:
-            ranges = range_filter_parser(updated_at)
-            users = users.filter(**{"updated_at__date__%s" % k: v for k, v in ranges.items()})
-
-        # Partial matches
-        if email:
-            users = users.filter(email__ilike=email)
-        if first_name:
-            users = users.filter(first_name__ilike=first_name)
-        if username:
-            users = users.filter(username__ilike=username)
-        if msisdn:
-            users = users.filter(msisdn__ilike=msisdn)
-        if last_name:
-            users = users.filter(last_name__ilike=last_name)
-        if nickname:
-            users = users.filter(nickname__ilike=nickname)
-        if q:
-            users = users.filter(q__ilike=q)
-
-        # Other filters
-        if country:
-            users = users.filter(country__code=country)
-        if user_ids:
-            users = users.filter(id__in=user_ids)
-        if gender:
-            users = users.filter(gender=gender)
-        if organisation_id:
-            users = users.filter(organisation__id=organisation_id)
-        if site_ids:
-            # In order for the count to be correct, we cannot join with the UserSite table and
-            # need to use a subquery.
-            site_user_ids = UserSite.objects.distinct().filter(site_id__in=site_ids).values(
-                "user_id")
-            users = users.filter(id__in=site_user_ids)
-
-        # Add count
-        users = users.annotate(
-            x_total_count=RawSQL("COUNT(*) OVER ()", [])
-        )
-        # Perform the query and get the correct slice
-        users = users[offset:offset + limit]
+        # Perform the query, get the correct slice and count
+        users, headers = paginate(users, offset, limit, count)
         return (
             [strip_empty_optional_fields(to_dict_with_custom_fields(user, USER_VALUES))
              for user in users],
-            {
-                "X-Total-Count": users[0].x_total_count if users else 0
-            }
+            headers
         )
 
     # user_delete -- Synchronisation point for meld
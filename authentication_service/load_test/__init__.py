@@ -0,0 +1,9 @@
+"""
+Load testing of the OpenID Connect authorization code flow.
+
+The flow is driven in process with the Django test client, against the
+clients of the demo_content command. Access Control and the User Data Store
+are replaced by local stub servers, so the timings only include this service
+and a configurable amount of simulated API latency. Run it with the
+load_test_oidc_flow management command.
+"""
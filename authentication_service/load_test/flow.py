@@ -0,0 +1,249 @@
+"""
+The authorization code flow, as a browser and a client site go through it:
+
+authorize -> login page -> login -> consent page -> consent -> token -> userinfo
+
+Every request is timed and the database queries it makes are counted. Each
+worker thread signs in its own user, so the consent of one worker does not
+change the flow of another.
+"""
+import collections
+import contextlib
+import datetime
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import Client as HttpClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from oidc_provider.models import Client, UserConsent
+
+from authentication_service import api_helpers
+from authentication_service.load_test import stubs
+
+STEPS = [
+    "authorize", "login page", "login", "consent page", "consent", "token",
+    "userinfo"
+]
+SCOPES = "openid profile email site roles"
+PASSWORD = "Load!test1"
+
+Sample = collections.namedtuple("Sample", ["step", "seconds", "queries"])
+WorkerResult = collections.namedtuple(
+    "WorkerResult", ["flows", "seconds", "samples", "errors"]
+)
+
+
+class FlowError(Exception):
+
+    def __init__(self, step, response, reason):
+        super(FlowError, self).__init__(
+            f"{step}: {reason} (status {response.status_code})"
+        )
+
+
+@contextlib.contextmanager
+def stubbed_apis(latency: float = 0):
+    """
+    Points the API clients at local stub servers while the block runs.
+    :param latency: Seconds every stub response is delayed
+    :return: The Access Control and User Data Store stub servers
+    """
+    access_control = stubs.access_control_server(latency)
+    user_data_store = stubs.user_data_store_server(latency)
+    apis = [
+        (settings.ACCESS_CONTROL_API, access_control),
+        (settings.AC_OPERATIONAL_API, access_control),
+        (settings.USER_DATA_STORE_API, user_data_store),
+    ]
+    hosts = [api.api_client.configuration.host for api, _ in apis]
+    access_control.start()
+    user_data_store.start()
+    for api, server in apis:
+        api.api_client.configuration.host = server.url
+    api_helpers.invalidate_site_cache()
+    try:
+        yield access_control, user_data_store
+    finally:
+        # Restored in reverse, as clients may share their configuration.
+        for (api, _), host in reversed(list(zip(apis, hosts))):
+            api.api_client.configuration.host = host
+        api_helpers.invalidate_site_cache()
+        access_control.stop()
+        user_data_store.stop()
+
+
+def prepare_users(count: int) -> list:
+    """
+    :param count: The number of users to create or reset
+    :return: The users, which all have PASSWORD as their password
+    """
+    users = []
+    for index in range(count):
+        user, _ = get_user_model().objects.update_or_create(
+            username=f"loadtest{index}",
+            defaults={
+                "first_name": "Load",
+                "last_name": f"Test {index}",
+                "email": f"loadtest{index}@here.com",
+                "nickname": f"loadtest{index}",
+                "birth_date": datetime.date(2000, 1, 1),
+            }
+        )
+        user.set_password(PASSWORD)
+        user.save()
+        users.append(user)
+    return users
+
+
+class OIDCFlow(object):
+
+    def __init__(self, client: Client, user, consent: bool = True):
+        """
+        :param client: The OIDC Client signing in
+        :param user: The user signing in, with PASSWORD as password
+        :param consent: Remove the consent of the user before every flow, so
+            the consent page is shown every time
+        """
+        self.client = client
+        self.user = user
+        self.consent = consent
+        self.redirect_uri = client.redirect_uris[0]
+        self.samples = []
+
+    def request(self, http, step, method, path, data=None, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(http, method)(path, data, **extra)
+            seconds = time.perf_counter() - start
+        self.samples.append(Sample(step, seconds, len(queries)))
+        return response
+
+    def expect_redirect(self, step, response, prefix=""):
+        if response.status_code != 302 or not response.url.startswith(prefix):
+            raise FlowError(step, response, f"expected a redirect to {prefix}")
+        return response.url
+
+    def code(self, step, response, state):
+        url = self.expect_redirect(step, response, self.redirect_uri)
+        query = parse_qs(urlparse(url).query)
+        if query.get("state") != [state] or "code" not in query:
+            raise FlowError(step, response, f"no code in {url}")
+        return query["code"][0]
+
+    def run(self):
+        """
+        Goes through the flow once, with a fresh session.
+        :return: The userinfo claims
+        """
+        if self.consent:
+            UserConsent.objects.filter(user=self.user, client=self.client).delete()
+
+        http = HttpClient()
+        params = {
+            "response_type": "code",
+            "scope": SCOPES,
+            "client_id": self.client.client_id,
+            "redirect_uri": self.redirect_uri,
+            "state": uuid.uuid4().hex,
+        }
+        authorize_path = reverse("oidc_provider:authorize")
+        authorize_url = f"{authorize_path}?{urlencode(params)}"
+
+        response = self.request(http, "authorize", "get", authorize_url)
+        login_url = self.expect_redirect("authorize", response)
+
+        response = self.request(http, "login page", "get", login_url)
+        if response.status_code != 200:
+            raise FlowError("login page", response, "expected the login form")
+
+        response = self.request(http, "login", "post", login_url, {
+            "login_view-current_step": "auth",
+            "auth-username": self.user.username,
+            "auth-password": PASSWORD,
+        })
+        self.expect_redirect("login", response, authorize_path)
+
+        response = self.request(http, "consent page", "get", authorize_url)
+        if response.status_code == 200:
+            response = self.request(
+                http, "consent", "post", authorize_path,
+                dict(params, allow="Authorize")
+            )
+            code = self.code("consent", response, params["state"])
+        else:
+            # The user consented before and the Client reuses consent.
+            code = self.code("consent page", response, params["state"])
+
+        response = self.request(http, "token", "post", reverse("oidc_provider:token"), {
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": self.redirect_uri,
+            "client_id": self.client.client_id,
+            "client_secret": self.client.client_secret,
+        })
+        if response.status_code != 200:
+            raise FlowError("token", response, response.content.decode("utf-8"))
+        access_token = json.loads(response.content.decode("utf-8"))["access_token"]
+
+        response = self.request(
+            http, "userinfo", "get", reverse("oidc_provider:userinfo"),
+            HTTP_AUTHORIZATION=f"Bearer {access_token}"
+        )
+        if response.status_code != 200:
+            raise FlowError("userinfo", response, "expected the claims")
+        claims = json.loads(response.content.decode("utf-8"))
+        if "site" not in claims or "roles" not in claims:
+            raise FlowError("userinfo", response, "missing site or roles claims")
+        return claims
+
+
+def run_worker(client: Client, user, iterations: int, consent: bool,
+               barrier: threading.Barrier = None) -> WorkerResult:
+    flow = OIDCFlow(client, user, consent)
+    errors = []
+    if barrier:
+        barrier.wait()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        try:
+            flow.run()
+        except Exception as e:
+            errors.append(e)
+    return WorkerResult(
+        iterations - len(errors), time.perf_counter() - start, flow.samples,
+        errors
+    )
+
+
+def run(client: Client, threads: int, iterations: int, consent: bool = True) -> list:
+    """
+    :param client: The OIDC Client signing in
+    :param threads: The number of worker threads, each with its own user
+    :param iterations: The number of flows per worker thread
+    :param consent: Show the consent page on every flow
+    :return: A WorkerResult per worker thread
+    """
+    users = prepare_users(threads)
+    if threads == 1:
+        # Runs on the connection of the caller, which lets it run inside a
+        # test transaction.
+        return [run_worker(client, users[0], iterations, consent)]
+
+    barrier = threading.Barrier(threads)
+
+    def worker(user):
+        try:
+            return run_worker(client, user, iterations, consent, barrier)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(worker, users))
@@ -0,0 +1,135 @@
+"""
+Local HTTP servers standing in for the Access Control and User Data Store
+APIs. Only the endpoints used by the authorization code flow are served: the
+Site of a Client, the roles of a user on a Site and the data of a user on a
+Site.
+"""
+import collections
+import http.server
+import json
+import re
+import socketserver
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+BASE_PATH = "/api/v1"
+TIMESTAMP = "2018-01-01T00:00:00+00:00"
+
+
+class StubRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path[len(BASE_PATH):] if url.path.startswith(BASE_PATH) \
+            else url.path
+        self.server.count(path)
+        for pattern, handler in self.server.routes:
+            match = pattern.match(path)
+            if match:
+                status, body = 200, handler(parse_qs(url.query), **match.groupdict())
+                break
+        else:
+            status, body = 404, {"detail": "Not found."}
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        # Logging every request would swamp the report.
+        pass
+
+
+class StubServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, routes: list, latency: float = 0):
+        """
+        :param routes: (regex, handler) pairs. A handler is called with the
+            parsed query string and the named groups of its regex and returns
+            the JSON body of the response.
+        :param latency: Seconds every response is delayed
+        """
+        super(StubServer, self).__init__(("127.0.0.1", 0), StubRequestHandler)
+        self.routes = [(re.compile(regex), handler) for regex, handler in routes]
+        self.latency = latency
+        self.requests = collections.Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address
+        return f"http://{host}:{port}{BASE_PATH}"
+
+    def count(self, path: str):
+        # Paths are counted without their ids.
+        with self._lock:
+            self.requests[re.sub(r"/[^/]*\d[^/]*", "/{id}", path)] += 1
+
+    def handle_error(self, request, client_address):
+        # Clients that time out close their connection before the response.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super(StubServer, self).handle_error(request, client_address)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+
+def site(query, **kwargs):
+    # Every Client is linked to an active Site with the same id.
+    client_id = int(query["client_id"][0])
+    return [{
+        "id": client_id,
+        "name": f"Site {client_id}",
+        "client_id": client_id,
+        "domain_id": 1,
+        "description": "",
+        "is_active": True,
+        "deletion_method_id": 1,
+        "deletion_method_data": {},
+        "created_at": TIMESTAMP,
+        "updated_at": TIMESTAMP,
+    }]
+
+
+def user_site_role_labels_aggregated(query, user_id, site_id):
+    return {"user_id": user_id, "site_id": int(site_id), "roles": ["tech_admin"]}
+
+
+def user_site_data(query, user_id, site_id):
+    return {
+        "user_id": user_id,
+        "site_id": int(site_id),
+        "data": {"load_test": True},
+        "created_at": TIMESTAMP,
+        "updated_at": TIMESTAMP,
+    }
+
+
+def access_control_server(latency: float = 0) -> StubServer:
+    return StubServer([
+        (r"^/sites$", site),
+        (r"^/ops/user_site_role_labels_aggregated/(?P<user_id>[^/]+)/(?P<site_id>\d+)$",
+         user_site_role_labels_aggregated),
+    ], latency)
+
+
+def user_data_store_server(latency: float = 0) -> StubServer:
+    return StubServer([
+        (r"^/usersitedata/(?P<user_id>[^/]+)/(?P<site_id>\d+)$", user_site_data),
+    ], latency)
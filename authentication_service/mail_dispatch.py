@@ -0,0 +1,296 @@
+"""
+Batched sending of emails over a persistent connection.
+
+Messages are put on an in-process queue and a background thread sends them.
+It gathers the messages queued within a short window and sends them over one
+connection, which is kept open for later batches until it has been idle for a
+while. This saves setting up a connection, and a TLS handshake, per email.
+Before a batch is sent over a connection that was kept open, the connection is
+checked with a NOOP, and replaced if the server or a NAT on the way dropped it
+meanwhile.
+
+Messages that the server refused with a temporary (4xx) error are retried on a
+fresh connection, without sending the rest of their batch again. Permanent
+refusals are not retried, and neither are other errors, such as a connection
+dropped while the message was sent, as these may hide a message that was
+delivered. Callers wait for their own message, so errors still reach the task
+that sent it.
+
+Every message has a key, by default its Message-ID, which is recorded in the
+cache once the message is sent. A message of which the key is recorded is not
+sent again, which keeps retries of the sending task from delivering it twice.
+A message that was not sent in time is dropped from the queue.
+
+Each process has its own dispatcher. Under the Celery prefork pool a worker
+process runs one task at a time, which waits for its message, so batches hold
+a single message and only the reuse of the connection remains. Batches only
+form in processes that send from several threads, e.g. with the threads,
+eventlet or gevent pools.
+"""
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.core.mail.message import make_msgid
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+MESSAGES = Counter(
+    "authentication_service_mail_messages_total", "Emails handled by the mail dispatcher",
+    ["result"]
+)
+MESSAGES_PER_CONNECTION = Histogram(
+    "authentication_service_mail_messages_per_connection",
+    "Emails sent over a connection before it was closed",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+SEND_LATENCY = Histogram(
+    "authentication_service_mail_send_latency_seconds",
+    "Time from queueing an email until it was sent (s)"
+)
+
+
+def _is_temporary(error: Exception) -> bool:
+    # Only a 4xx reply says the message was not delivered and may be accepted
+    # later.
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+    elif isinstance(error, smtplib.SMTPResponseException):
+        codes = [error.smtp_code]
+    else:
+        return False
+    return bool(codes) and all(400 <= code < 500 for code in codes)
+
+
+def _is_alive(connection) -> bool:
+    # Only the SMTP backend keeps a connection that the server can drop.
+    smtp = getattr(connection, "connection", None)
+    if not isinstance(smtp, smtplib.SMTP):
+        return True
+    try:
+        return smtp.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+class _Pending(object):
+
+    def __init__(self, message, key):
+        self.message = message
+        self.key = key
+        self.future = Future()
+        self.queued_at = time.monotonic()
+        self.error = None
+        self.retriable = False
+
+
+class MailDispatcher(object):
+
+    def __init__(self, batch_size: int, batch_window: float, max_attempts: int,
+                 idle_timeout: float, send_timeout: float = None, backend: str = None,
+                 sent_key_ttl: float = None, **connection_kwargs):
+        """
+        :param batch_size: The maximum number of messages sent per batch
+        :param batch_window: Seconds to wait for more messages once the first
+            message of a batch is queued
+        :param max_attempts: The number of times a message is tried before its
+            error is returned to the sender
+        :param idle_timeout: Seconds after which an unused connection is closed
+        :param send_timeout: Seconds a sender waits for its message to be sent
+        :param backend: The email backend, settings.EMAIL_BACKEND if omitted
+        :param sent_key_ttl: Seconds the keys of sent messages are kept,
+            settings.MAIL_SENT_KEY_TTL if omitted
+        :param connection_kwargs: Extra arguments for the backend
+        """
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_attempts = max_attempts
+        self.idle_timeout = idle_timeout
+        self.send_timeout = send_timeout
+        self.backend = backend
+        self.sent_key_ttl = sent_key_ttl or settings.MAIL_SENT_KEY_TTL
+        self.connection_kwargs = connection_kwargs
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connection = None
+        self._sent_on_connection = 0
+
+    def send(self, message, key: str = None):
+        """
+        Queues a message and waits until it has been sent.
+        :param message: An EmailMessage
+        :param key: Identifies the message across retries, its Message-ID if
+            omitted. The Message-ID is set on the message if it has none, so
+            every attempt sends the same one.
+        :return: The number of messages sent, 0 or 1. 0 if a message with the
+            same key was already sent.
+        :raises: The error of the last attempt to send the message, or a
+            concurrent.futures.TimeoutError if it was not sent in time
+        """
+        self._ensure_worker()
+        message_id = message.extra_headers.setdefault("Message-ID", make_msgid())
+        pending = _Pending(message, key or message_id)
+        self._queue.put(pending)
+        try:
+            return pending.future.result(self.send_timeout)
+        except TimeoutError:
+            # Only drops the message if it is still queued.
+            pending.future.cancel()
+            raise
+
+    def _ensure_worker(self):
+        # Celery forks its worker processes and threads do not survive a fork,
+        # so the worker is started on first use in every process.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._connection = None
+                self._sent_on_connection = 0
+                threading.Thread(
+                    target=self._run, name="mail-dispatcher", daemon=True
+                ).start()
+                self._pid = os.getpid()
+
+    def _next_batch(self):
+        # Only wait for the idle timeout while a connection is open.
+        timeout = self.idle_timeout if self._connection is not None else None
+        batch = [self._queue.get(timeout=timeout)]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _open(self):
+        if self._connection is not None and not _is_alive(self._connection):
+            logger.info("Replacing the dropped mail connection.")
+            self._close()
+        if self._connection is None:
+            connection = get_connection(
+                self.backend, fail_silently=False, **self.connection_kwargs
+            )
+            connection.open()
+            self._connection = connection
+        return self._connection
+
+    def _close(self):
+        if self._connection is None:
+            return
+        MESSAGES_PER_CONNECTION.observe(self._sent_on_connection)
+        try:
+            self._connection.close()
+        except Exception:
+            logger.exception("Failed to close the mail connection.")
+        self._connection = None
+        self._sent_on_connection = 0
+
+    def _cache_key(self, pending):
+        return f"mail_dispatch:sent:{pending.key}"
+
+    def _was_sent(self, pending):
+        try:
+            return cache.get(self._cache_key(pending)) is not None
+        except Exception:
+            logger.exception("Failed to look up the sent mail key %s", pending.key)
+            return False
+
+    def _record_sent(self, pending):
+        try:
+            cache.set(self._cache_key(pending), 1, self.sent_key_ttl)
+        except Exception:
+            logger.exception("Failed to record the sent mail key %s", pending.key)
+
+    def _send_batch(self, batch):
+        """
+        Sends the messages one by one over the open connection.
+        :return: The messages that could not be sent
+        """
+        try:
+            connection = self._open()
+        except Exception as e:
+            # Nothing was sent, so all messages can be retried.
+            for pending in batch:
+                pending.error = e
+                pending.retriable = True
+            return batch
+
+        failed = []
+        for pending in batch:
+            if self._was_sent(pending):
+                MESSAGES.labels(result="duplicate").inc()
+                pending.future.set_result(0)
+                continue
+            try:
+                connection.send_messages([pending.message])
+            except Exception as e:
+                pending.error = e
+                pending.retriable = _is_temporary(e)
+                failed.append(pending)
+            else:
+                self._record_sent(pending)
+                self._sent_on_connection += 1
+                MESSAGES.labels(result="sent").inc()
+                SEND_LATENCY.observe(time.monotonic() - pending.queued_at)
+                pending.future.set_result(1)
+        return failed
+
+    def _run(self):
+        while True:
+            try:
+                pending = self._next_batch()
+            except queue.Empty:
+                self._close()
+                continue
+
+            # Skips the messages of which the sender stopped waiting.
+            pending = [
+                item for item in pending if item.future.set_running_or_notify_cancel()
+            ]
+            given_up = []
+            for attempt in range(1, self.max_attempts + 1):
+                if not pending:
+                    break
+                pending = self._send_batch(pending)
+                if not pending:
+                    break
+                # The connection may be unusable after an error, so failed
+                # messages are retried on a fresh one.
+                self._close()
+                given_up.extend(item for item in pending if not item.retriable)
+                pending = [item for item in pending if item.retriable]
+                if attempt < self.max_attempts:
+                    MESSAGES.labels(result="retried").inc(len(pending))
+
+            for failed in given_up + pending:
+                MESSAGES.labels(result="failed").inc()
+                logger.error(
+                    "Failed to send mail to %s: %s", failed.message.recipients(),
+                    failed.error
+                )
+                failed.future.set_exception(failed.error)
+
+
+DISPATCHER = MailDispatcher(
+    batch_size=settings.MAIL_BATCH_SIZE,
+    batch_window=settings.MAIL_BATCH_WINDOW,
+    max_attempts=settings.MAIL_SEND_ATTEMPTS,
+    idle_timeout=settings.MAIL_CONNECTION_IDLE_TIMEOUT,
+    send_timeout=settings.MAIL_SEND_TIMEOUT,
+    sent_key_ttl=settings.MAIL_SENT_KEY_TTL,
+)
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from authentication_service import search
+
+
+class Command(BaseCommand):
+    help = "Compute the full text search vectors of users in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The number of users updated per query.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute the vectors of all users, not only the ones "
+                 "without a vector.",
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by("id")
+        if not options["all"]:
+            users = users.filter(search_vector__isnull=True)
+
+        updated = 0
+        last_id = None
+        while True:
+            batch = users if last_id is None else users.filter(id__gt=last_id)
+            ids = list(batch.values_list("id", flat=True)[:options["batch_size"]])
+            if not ids:
+                break
+            # A queryset update does not touch updated_at, which is only set
+            # when users are saved.
+            updated += get_user_model().objects.filter(id__in=ids).update(
+                search_vector=search.column_search_vector()
+            )
+            last_id = ids[-1]
+            self.stdout.write(f"Updated {updated} users...")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated the search vectors of {updated} users."
+        ))
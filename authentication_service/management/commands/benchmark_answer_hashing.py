@@ -0,0 +1,64 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from authentication_service import answer_hashing, constants
+
+
+class Command(BaseCommand):
+    help = "Time the hashing done per registration, a password and the " \
+           "security question answers, under answer hashing policies."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--registrations",
+            type=int,
+            default=20,
+            help="The number of registrations timed per policy.",
+        )
+        parser.add_argument(
+            "--policy",
+            action="append",
+            dest="policies",
+            help="An answer hashing policy as ALGORITHM[:ITERATIONS], may be "
+                 "repeated. Defaults to hashing answers like passwords and "
+                 "to the configured policy.",
+        )
+
+    def handle(self, *args, **options):
+        policies = options["policies"] or [
+            f"{hashers.get_hasher().algorithm}:0",
+            f"{settings.SECURITY_ANSWER_HASHER}:{settings.SECURITY_ANSWER_ITERATIONS}",
+        ]
+        for policy in policies:
+            algorithm, _, iterations = policy.partition(":")
+            try:
+                iterations = int(iterations or 0)
+            except ValueError:
+                raise CommandError(f"Invalid iteration count in policy {policy}")
+            with override_settings(SECURITY_ANSWER_HASHER=algorithm,
+                                   SECURITY_ANSWER_ITERATIONS=iterations):
+                try:
+                    self.time(policy, options["registrations"])
+                except ValueError as e:
+                    # Unknown algorithms and hashers of which the library is
+                    # not installed.
+                    self.stderr.write(f"{policy}: {e}")
+
+    def time(self, policy, amount):
+        timings = []
+        for _ in range(amount):
+            start = time.perf_counter()
+            hashers.make_password("Qwer!234")
+            for _ in range(constants.SECURITY_QUESTION_COUNT):
+                answer_hashing.make_answer("An answer")
+            timings.append(time.perf_counter() - start)
+        median = statistics.median(timings)
+        self.stdout.write(
+            f"{policy}: median {median * 1000:.1f}ms per registration, "
+            f"{1 / median:.1f} registrations/s per thread"
+        )
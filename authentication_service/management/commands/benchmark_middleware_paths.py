@@ -0,0 +1,92 @@
+import statistics
+import time
+
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import translation
+
+from authentication_service import middleware
+
+PATHS = ["/en/login/", "/en/registration/", "/openid/authorize/", "/api/v1/users"]
+
+
+def legacy_path_checks(path):
+    # The whitelist checks as they were done before the paths were
+    # precomputed.
+    whitelisted = path.rstrip("/") in [
+        url.rstrip("/") for url in middleware.SESSION_UPDATE_URL_WHITELIST
+    ]
+    authorize = path.rstrip("/") == \
+        reverse("oidc_provider:authorize").rstrip("/")
+    return whitelisted, authorize
+
+
+def path_checks(path):
+    return middleware.is_whitelisted_path(path), \
+        middleware.is_authorize_path(path)
+
+
+class Command(BaseCommand):
+    help = "Time the per request whitelist path checks of the session, " \
+           "theme and site middlewares."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=10000,
+            help="The number of requests timed per path.",
+        )
+        parser.add_argument(
+            "--language",
+            default="en",
+            help="The language active during the requests.",
+        )
+
+    def handle(self, *args, **options):
+        with translation.override(options["language"]):
+            self.time(
+                "legacy path checks", legacy_path_checks, PATHS,
+                options["requests"]
+            )
+            self.time(
+                "precomputed path checks", path_checks, PATHS,
+                options["requests"]
+            )
+            for middleware_class in [
+                    middleware.ThemeManagementMiddleware,
+                    middleware.SiteInactiveMiddleware,
+                    middleware.SessionDataManagementMiddleware]:
+                self.time_middleware(middleware_class, options["requests"])
+
+    def time_middleware(self, middleware_class, amount):
+        # Plain GET requests without query parameters, which only pay for the
+        # path checks and session access. The authorize path is left out, as
+        # validating its client would dominate the timings.
+        requests = []
+        for path in PATHS:
+            if middleware.is_authorize_path(path):
+                continue
+            request = RequestFactory().get(path)
+            request.session = SessionBase()
+            requests.append(request)
+        self.time(
+            middleware_class.__name__, middleware_class().process_request,
+            requests, amount
+        )
+
+    def time(self, name, func, args, amount):
+        timings = []
+        for arg in args:
+            for _ in range(amount):
+                start = time.perf_counter()
+                func(arg)
+                timings.append((time.perf_counter() - start) * 1000000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{name}: median {statistics.median(timings):.1f}us, "
+            f"p95 {p95:.1f}us"
+        )
@@ -0,0 +1,72 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter per sample. With "eager" the API clients are
+# built and their thread pools started during startup, as they were before
+# both were made lazy.
+CHILD = """
+import json, resource, sys, threading, time
+start = time.perf_counter()
+import django
+django.setup()
+if sys.argv[1] == "eager":
+    from django.conf import settings
+    for name in ("USER_DATA_STORE_API", "ACCESS_CONTROL_API", "AC_OPERATIONAL_API"):
+        getattr(settings, name).api_client.pool.apply_async(int).get()
+print(json.dumps({
+    "setup": time.perf_counter() - start,
+    "threads": threading.active_count(),
+    "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+"""
+
+MODES = ["lazy", "eager"]
+
+
+class Command(BaseCommand):
+    help = "Time the startup of a process loading the settings and apps, " \
+           "and report its threads and peak RSS, with lazily and eagerly " \
+           "built API clients."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=5,
+            help="The number of processes started per mode.",
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        for mode in MODES:
+            samples = []
+            for _ in range(options["processes"]):
+                start = time.perf_counter()
+                result = subprocess.run(
+                    [sys.executable, "-c", CHILD, mode], env=env,
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE
+                )
+                elapsed = time.perf_counter() - start
+                if result.returncode:
+                    raise CommandError(result.stderr.decode("utf-8"))
+                sample = json.loads(result.stdout.decode("utf-8").splitlines()[-1])
+                sample["process"] = elapsed
+                samples.append(sample)
+
+            def median(key):
+                return statistics.median(sample[key] for sample in samples)
+
+            # ru_maxrss is in kilobytes on Linux.
+            self.stdout.write(
+                f"{mode}: median startup {median('process') * 1000:.0f}ms, "
+                f"setup {median('setup') * 1000:.0f}ms, "
+                f"{median('threads'):.0f} threads, "
+                f"peak RSS {median('rss') / 1024:.1f}MB"
+            )
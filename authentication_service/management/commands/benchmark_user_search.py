@@ -0,0 +1,131 @@
+# NOTE: Management command only to be used against a disposable database. The
+# synthetic users are removed again by rolling back the transaction they are
+# created in, but the inserts take locks and generate a lot of WAL.
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from authentication_service import search
+from authentication_service.integration import Implementation
+
+FIRST_NAMES = [
+    "Aisha", "Amara", "Ana", "Chipo", "Chloe", "Daniela", "Esther", "Fatima",
+    "Grace", "Hana", "Ines", "Jasmine", "Joy", "Kemi", "Lerato", "Lina",
+    "Maria", "Mary-Jane", "Naledi", "Nia", "Noor", "Priya", "Rosa", "Sara",
+    "Thandi", "Wanjiru", "Yasmin", "Zainab", "Zola", "Zuri",
+]
+LAST_NAMES = [
+    "Abebe", "Adeyemi", "Ahmed", "Banda", "Chen", "Da Silva", "Dlamini",
+    "Garcia", "Hassan", "Ibrahim", "Kamau", "Khan", "Mensah", "Moyo",
+    "Mwangi", "Ndlovu", "Nguyen", "Okafor", "Osei", "Perez", "Rahman",
+    "Santos", "Singh", "Tembo", "Van der Merwe", "Wanjiku", "Zulu",
+]
+NICKNAMES = ["sunny", "star", "bee", "lulu", "jojo", "kiki"]
+TERMS = ["zainab", "wanj", "mensah", "example", "benchmark_1234", "2782000"]
+
+
+class Command(BaseCommand):
+    help = "Compare the latency and index size of the trigram and full text " \
+           "user searches on synthetic users."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=2000000,
+            help="The number of synthetic users to create.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="The number of times each search is timed.",
+        )
+        parser.add_argument(
+            "--terms",
+            nargs="+",
+            default=TERMS,
+            help="The search terms to time.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_users(options["users"])
+            self.report_index_sizes()
+            for mode in search.SEARCH_MODES:
+                for count in ["exact", "none"]:
+                    self.time_searches(
+                        mode, count, options["terms"], options["repeat"]
+                    )
+            transaction.set_rollback(True)
+
+    def create_users(self, amount):
+        self.stdout.write(f"Creating {amount} synthetic users...")
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {get_user_model()._meta.db_table} (
+                    id, password, is_superuser, username, first_name,
+                    last_name, email, is_staff, is_active, date_joined,
+                    email_verified, msisdn, msisdn_verified, nickname,
+                    birth_date, created_at, updated_at, migration_data
+                )
+                SELECT
+                    md5('benchmark_' || i)::uuid, '', false,
+                    'benchmark_' || i,
+                    (%s::text[])[1 + i %% %s],
+                    (%s::text[])[1 + (i / 7) %% %s],
+                    'benchmark_' || i || '@example.com', false, true, now(),
+                    false, '+2782' || lpad(i::text, 7, '0'), false,
+                    (%s::text[])[1 + i %% 11],
+                    '2000-01-01', now(), now(), '{{}}'
+                FROM generate_series(1, %s) AS i
+                """,
+                [FIRST_NAMES, len(FIRST_NAMES), LAST_NAMES, len(LAST_NAMES),
+                 NICKNAMES, amount]
+            )
+        users = get_user_model().objects.filter(
+            username__startswith="benchmark_"
+        )
+        # Fill both search columns the same way saving the users would.
+        users.update(q=search.ConcatWords(
+            "email", "first_name", "last_name", "msisdn", "nickname", "username"
+        ))
+        users.update(search_vector=search.column_search_vector())
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {get_user_model()._meta.db_table}")
+        self.stdout.write(
+            f"Created users in {time.perf_counter() - start:.1f}s."
+        )
+
+    def report_index_sizes(self):
+        with connection.cursor() as cursor:
+            for index in get_user_model()._meta.indexes:
+                if index.fields in (["q"], ["search_vector"]):
+                    cursor.execute(
+                        "SELECT pg_size_pretty(pg_relation_size(%s::regclass))",
+                        [index.name]
+                    )
+                    self.stdout.write(
+                        f"Index on {index.fields[0]}: {cursor.fetchone()[0]}"
+                    )
+
+    def time_searches(self, mode, count, terms, repeat):
+        timings = []
+        for term in terms:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                Implementation.user_list(
+                    None, q=term, search_mode=mode, count=count
+                )
+                timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"search_mode={mode} count={count}: "
+            f"median {statistics.median(timings):.1f}ms, p95 {p95:.1f}ms"
+        )
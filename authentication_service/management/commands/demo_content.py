@@ -17,6 +17,7 @@ from django_otp.plugins.otp_totp.models import TOTPDevice
 from oidc_provider.models import Client
 from two_factor.utils import get_otpauth_url
 
+from authentication_service import api_helpers
 from user_data_store.rest import ApiException
 
 
@@ -223,6 +224,7 @@ class Command(BaseCommand):
                     })
                     self.stdout.write(
                         self.style.SUCCESS(f"Created site for {client.name}..."))
+                api_helpers.invalidate_site_cache(client.id)
 
                 try:
                     schema = settings.USER_DATA_STORE_API.sitedataschema_read(site.id)
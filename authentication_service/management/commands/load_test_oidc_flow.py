@@ -0,0 +1,113 @@
+import collections
+import statistics
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from oidc_provider.models import Client
+
+from authentication_service.load_test import flow
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = "Load test the OIDC authorization code flow, from authorize to " \
+           "userinfo, against local Access Control and User Data Store stubs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=4,
+            help="The number of worker threads, each signing in its own user.",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=25,
+            help="The number of flows per worker thread.",
+        )
+        parser.add_argument(
+            "--client-id",
+            default="client_id_1",
+            help="The OIDC Client signing in.",
+        )
+        parser.add_argument(
+            "--api-latency",
+            type=float,
+            default=0,
+            help="Milliseconds every stub API response is delayed.",
+        )
+        parser.add_argument(
+            "--reuse-consent",
+            action="store_true",
+            help="Keep the consent of the users between flows, which skips "
+                 "the consent page if the Client reuses consent.",
+        )
+        parser.add_argument(
+            "--skip-setup",
+            action="store_true",
+            help="Don't run the demo_content command first.",
+        )
+
+    def handle(self, *args, **options):
+        if options["threads"] < 1 or options["iterations"] < 1:
+            raise CommandError("--threads and --iterations must be at least 1")
+        if not options["skip_setup"]:
+            call_command("demo_content", no_api_calls=True, stdout=self.stdout)
+        try:
+            client = Client.objects.get(client_id=options["client_id"])
+        except Client.DoesNotExist:
+            raise CommandError(f"Client {options['client_id']} does not exist")
+
+        with override_settings(ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ["testserver"]), \
+                flow.stubbed_apis(options["api_latency"] / 1000) as servers:
+            results = flow.run(
+                client, options["threads"], options["iterations"],
+                consent=not options["reuse_consent"]
+            )
+        self.report(results, servers)
+
+    def report(self, results, servers):
+        timings = collections.defaultdict(list)
+        queries = collections.defaultdict(list)
+        for result in results:
+            for sample in result.samples:
+                timings[sample.step].append(sample.seconds * 1000)
+                queries[sample.step].append(sample.queries)
+
+        for step in flow.STEPS:
+            if not timings[step]:
+                continue
+            values = sorted(timings[step])
+            self.stdout.write(
+                f"{step}: {len(values)} requests, "
+                f"p50 {percentile(values, 0.5):.1f}ms, "
+                f"p95 {percentile(values, 0.95):.1f}ms, "
+                f"p99 {percentile(values, 0.99):.1f}ms, "
+                f"{statistics.mean(queries[step]):.1f} queries/request"
+            )
+
+        flows = sum(result.flows for result in results)
+        seconds = max(result.seconds for result in results)
+        per_thread = statistics.mean(
+            result.flows / result.seconds for result in results
+        )
+        self.stdout.write(
+            f"{flows} flows by {len(results)} threads in {seconds:.1f}s: "
+            f"{flows / seconds:.1f} flows/s, {per_thread:.1f} flows/s per thread"
+        )
+        if flows:
+            for server in servers:
+                for path, count in sorted(server.requests.items()):
+                    self.stdout.write(f"{path}: {count / flows:.2f} calls/flow")
+
+        errors = [error for result in results for error in result.errors]
+        if errors:
+            raise CommandError(
+                f"{len(errors)} flows failed, the first with: {errors[0]}"
+            )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication_service import rate_limit
+
+
+class Command(BaseCommand):
+    help = "Clear the failed attempts of a username, IP address or client, " \
+           "which lifts their lockout."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", help="The username to unblock.")
+        parser.add_argument("--ip", help="The IP address to unblock.")
+        parser.add_argument("--client", help="The id of the client to unblock.")
+
+    def handle(self, *args, **options):
+        identities = {
+            scope: options[scope] for scope in ["username", "ip", "client"]
+            if options[scope]
+        }
+        if not identities:
+            raise CommandError("Specify a --username, --ip or --client.")
+        rate_limit.LIMITER.reset(**identities)
+        self.stdout.write(
+            "Unblocked " + ", ".join(
+                f"{scope} {value}" for scope, value in identities.items()
+            )
+        )
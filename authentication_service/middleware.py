@@ -1,14 +1,13 @@
+import functools
 import time
 from urllib.parse import urlparse, parse_qs, urlencode
 import logging
 
 from oidc_provider.lib.endpoints.authorize import AuthorizeEndpoint
-from oidc_provider.lib.errors import (
-    AuthorizeError,
-    ClientIdError,
-    RedirectUriError
-)
+from oidc_provider.lib.errors import ClientIdError, RedirectUriError
+from oidc_provider.models import Client
 
+from django.conf import settings
 from django.http import HttpResponseBadRequest, HttpResponse
 from django.middleware.locale import LocaleMiddleware
 from django.shortcuts import render
@@ -20,7 +19,7 @@ from django.utils.translation import ugettext as _, LANGUAGE_SESSION_KEY
 from django.views.i18n import LANGUAGE_QUERY_PARAMETER
 from prometheus_client import Histogram
 
-from authentication_service import exceptions, api_helpers
+from authentication_service import cache, exceptions, api_helpers, instrumentation
 from authentication_service.constants import SessionKeys, EXTRA_SESSION_KEY
 from authentication_service.utils import (
     update_session_data, get_session_data, delete_session_data
@@ -40,29 +39,102 @@ SESSION_UPDATE_URL_WHITELIST = [
 ]
 
 
+@functools.lru_cache(maxsize=None)
+def _whitelisted_paths(language):
+    # Reversed urls carry the language prefix, so the normalised paths are
+    # computed once per language.
+    with translation.override(language):
+        return frozenset(
+            str(path).rstrip("/") for path in SESSION_UPDATE_URL_WHITELIST
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _authorize_path(language):
+    with translation.override(language):
+        return reverse("oidc_provider:authorize").rstrip("/")
+
+
+def is_whitelisted_path(path):
+    """
+    Check whether path, ignoring trailing slashes, is one of the
+    SESSION_UPDATE_URL_WHITELIST urls in the active language.
+    """
+    return path.rstrip("/") in _whitelisted_paths(translation.get_language())
+
+
+def is_authorize_path(path):
+    """
+    Check whether path, ignoring trailing slashes, is the oidc authorize url in
+    the active language.
+    """
+    return path.rstrip("/") == _authorize_path(translation.get_language())
+
+
+def clear_path_caches():
+    """
+    Drop the precomputed whitelist paths. Should be called whenever the url
+    configuration or the available languages change.
+    """
+    _whitelisted_paths.cache_clear()
+    _authorize_path.cache_clear()
+
+
+# Process wide cache of client_id -> Client lookups.
+CLIENT_CACHE = cache.TTLCache("client", settings.CLIENT_CACHE_SIZE)
+
+
+def get_client(client_id):
+    """
+    Return the OIDC Client identified by client_id. Lookups are cached for
+    CLIENT_CACHE_TTL seconds, unknown clients are never cached.
+    :param client_id: The Client ID
+    :raises Client.DoesNotExist: If there is no Client with the given ID
+    """
+    client = CLIENT_CACHE.get(client_id)
+    if client is cache.MISSING:
+        client = Client.objects.get(client_id=client_id)
+        CLIENT_CACHE.set(client_id, client, settings.CLIENT_CACHE_TTL)
+    return client
+
+
+def invalidate_client_cache():
+    """
+    Drop all cached Clients. Should be called whenever a Client changes.
+    """
+    CLIENT_CACHE.clear()
+
+
 def authorize_client(request):
     """
     Method to validate client values as supplied on request.
 
+    Only the client and redirect uri are validated here, the oidc authorize
+    view validates the remaining parameters itself. The outcome is memoised on
+    the request, as more than one middleware validates the same request.
+
     Returns a oidc AuthorizeEndpoint object or a Django HttpResponse
     """
+    authorize = getattr(request, "_authorize_client", None)
+    if authorize is not None:
+        return authorize
+
     authorize = AuthorizeEndpoint(request)
     try:
-        authorize.validate_params()
+        try:
+            authorize.client = get_client(authorize.params["client_id"])
+        except Client.DoesNotExist:
+            raise ClientIdError()
+        if authorize.params["redirect_uri"] not in authorize.client.redirect_uris:
+            raise RedirectUriError()
     except (ClientIdError, RedirectUriError) as e:
-        return render(
+        authorize = render(
             request,
             "authentication_service/redirect_middleware_error.html",
             {"error": e.error, "message": e.description},
             status=500
         )
-    except AuthorizeError as e:
-        # Suppress one of the errors oidc raises. It is not required
-        # for pages beyond login.
-        if e.error == "unsupported_response_type":
-            pass
-        else:
-            raise e
+    request._authorize_client = authorize
     return authorize
 
 
@@ -94,8 +166,7 @@ class ThemeManagementMiddleware(MiddlewareMixin):
     session_theme_key = SessionKeys.THEME
 
     def process_request(self, request):
-        if request.path.rstrip("/") in [
-                path.rstrip("/") for path in SESSION_UPDATE_URL_WHITELIST]:
+        if is_whitelisted_path(request.path):
             current_host = request.get_host()
             referer = request.META.get("HTTP_REFERER", None)
             parsed_referer = urlparse(referer)
@@ -127,9 +198,7 @@ class SiteInactiveMiddleware(MiddlewareMixin):
         # checks if (1) this is a login request and (2) if the client_id provided is
         # linked to a disabled site. If so, login is prevented by rendering a custom
         # page explaining that the site has been disabled.
-        if request.path.rstrip("/") == \
-                reverse("oidc_provider:authorize").rstrip("/") and \
-                request.method == "GET":
+        if is_authorize_path(request.path) and request.method == "GET":
             authorize = authorize_client(request)
             if isinstance(authorize, HttpResponse):
                 return authorize
@@ -172,8 +241,7 @@ class SessionDataManagementMiddleware(MiddlewareMixin):
         uri = request.GET.get("redirect_uri", None)
         client_id = request.GET.get("client_id", None)
 
-        if request.path.rstrip("/") in [
-                path.rstrip("/") for path in SESSION_UPDATE_URL_WHITELIST]:
+        if is_whitelisted_path(request.path):
             current_host = request.get_host()
             referer = request.META.get("HTTP_REFERER", None)
             parsed_referer = urlparse(referer)
@@ -292,12 +360,15 @@ class MetricMiddleware(object):
 
     def __call__(self, request):
         start_time = time.time()
-        response = self.get_response(request)
+        with instrumentation.measure() as budget:
+            response = self.get_response(request)
+        duration = time.time() - start_time
         path_prefix = "not_found" if response.status_code == 404 else "/".join(
             request.path.split("/")[:4])
         H.labels(
             path_prefix=path_prefix,
             method=request.method,
             status=response.status_code
-        ).observe(time.time()-start_time)
+        ).observe(duration)
+        instrumentation.observe(request, response, budget, duration)
         return response
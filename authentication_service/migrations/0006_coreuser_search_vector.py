@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.18 on 2026-10-18 09:12
+from __future__ import unicode_literals
+
+import authentication_service.models
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication_service', '0005_auto_20181129_0916'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coreuser',
+            name='search_vector',
+            field=authentication_service.models.AutoSearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='coreuser',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='authenticat_search__da438f_gin'),
+        ),
+    ]
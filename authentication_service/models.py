@@ -3,14 +3,15 @@ import uuid
 from partial_index import PartialIndex
 
 from django.conf import settings
-from django.contrib.auth import hashers
 from django.contrib.auth.models import AbstractUser
-from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.fields import ArrayField, JSONField
 from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
+from authentication_service import answer_hashing, search
 from project.settings import MediaStorage
 
 
@@ -47,6 +48,17 @@ class AutoQueryField(models.TextField):
             return super(AutoQueryField, self).pre_save(model_instance, add)
 
 
+class AutoSearchVectorField(SearchVectorField):
+    """
+    Custom field holding the full text search vector of a user.
+
+    The vector is computed by the database from the searchable fields every
+    time the user is saved, see authentication_service.search.
+    """
+    def pre_save(self, model_instance, add):
+        return search.instance_search_vector(model_instance)
+
+
 class TrigramIndex(GinIndex):
     """
     Inspired by solution on:
@@ -107,6 +119,7 @@ class CoreUser(AbstractUser):
         ],
         null=True
     )
+    search_vector = AutoSearchVectorField(null=True, editable=False)
     migration_data = JSONField(blank=True, default={})
     REQUIRED_FIELDS = ["birth_date", "email"]
 
@@ -129,6 +142,12 @@ class CoreUser(AbstractUser):
         if self.email == "":
             self.email = None
 
+        # Keep the search vector up to date when only some fields are saved.
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and \
+                set(update_fields).intersection(search.SEARCH_FIELDS):
+            kwargs["update_fields"] = set(update_fields) | {"search_vector"}
+
         super(CoreUser, self).save(*args, **kwargs)
 
     @property
@@ -160,6 +179,7 @@ class CoreUser(AbstractUser):
             TrigramIndex(fields=["last_name"],),
             TrigramIndex(fields=["nickname"],),
             TrigramIndex(fields=["q"],),
+            GinIndex(fields=["search_vector"],),
         ]
 
 
@@ -200,12 +220,18 @@ class UserSecurityQuestion(models.Model):
     # NOTE as always, be aware certain update, create and save paths will never
     # trigger save() or the post/pre save signals.
     def save(self, *args, **kwargs):
-        # Make use of django built in password hasher, gives us
-        # "check_password" method for comparison later on. In short, salts and
-        # hashes the text.
-        self.answer = hashers.make_password(self.answer.strip().lower())
+        # Make use of django built in password hashers, under the answer
+        # hashing policy. In short, salts and hashes the text.
+        self.answer = answer_hashing.make_answer(self.answer)
         super(UserSecurityQuestion, self).save(*args, **kwargs)
 
+    def check_answer(self, answer):
+        def setter(encoded):
+            # save() would hash the hash again.
+            self.answer = encoded
+            UserSecurityQuestion.objects.filter(pk=self.pk).update(answer=encoded)
+        return answer_hashing.check_answer(answer, self.answer, setter=setter)
+
     def __str__(self):
         return "%s - %s" % (self.language_code, self.question.id)
 
@@ -264,3 +290,45 @@ class Organisation(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class UserDeletionJob(models.Model):
+    """
+    A request to delete many users at once. The users are deleted in batches
+    by a task, which records its progress on the job.
+    """
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _("Pending")),
+        (STATUS_RUNNING, _("Running")),
+        (STATUS_COMPLETED, _("Completed")),
+        (STATUS_FAILED, _("Failed")),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Not a foreign key, the deleter may be deleted while the job runs.
+    deleter_id = models.UUIDField()
+    reason = models.TextField()
+    user_ids = ArrayField(models.UUIDField())
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    # The number of user_ids handled so far, also the offset of the next batch.
+    processed = models.PositiveIntegerField(default=0)
+    # The number of users actually deleted. Users that no longer existed when
+    # their batch was handled are not counted.
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    @property
+    def total(self):
+        return len(self.user_ids)
+
+    def __str__(self):
+        return f"{self.id} - {self.status}"
@@ -1,6 +1,9 @@
 import datetime
 import logging
+import time
+from concurrent import futures
 
+import urllib3
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -8,7 +11,7 @@ from django.utils.translation import ugettext as _
 
 from oidc_provider.lib.claims import ScopeClaims
 
-from authentication_service import api_helpers
+from authentication_service import api_clients, api_helpers, cache, instrumentation
 from authentication_service.models import UserSite
 
 USER_MODEL = get_user_model()
@@ -44,6 +47,33 @@ CLAIMS_MAP = {
 
 LOGGER = logging.getLogger(__name__)
 
+# Process wide cache of the userinfo of a user and of its scope claims per
+# Client and scopes. Keys end with the time the user was last updated, so
+# changes to a user, made by any process, are picked up on its next request.
+# Site data and roles are only refreshed once their entries expire.
+CLAIMS_CACHE = cache.TTLCache("claims", settings.CLAIMS_CACHE_SIZE)
+
+
+# Worker threads looking up the site data and roles claims of userinfo
+# requests concurrently.
+CLAIMS_EXECUTOR = futures.ThreadPoolExecutor(
+    max_workers=settings.CLAIMS_CONCURRENCY
+)
+
+
+def _is_timeout(error: Exception) -> bool:
+    # The generated clients let urllib3 timeouts through, either as they are
+    # or wrapped once the retries ran out.
+    return isinstance(error, (futures.TimeoutError, urllib3.exceptions.TimeoutError)) \
+        or isinstance(getattr(error, "reason", None), urllib3.exceptions.TimeoutError)
+
+
+def invalidate_claims_cache():
+    """
+    Drop the cached claims of this process.
+    """
+    CLAIMS_CACHE.clear()
+
 
 def userinfo(claims: dict, user: USER_MODEL) -> dict:
     """
@@ -54,11 +84,18 @@ def userinfo(claims: dict, user: USER_MODEL) -> dict:
     :return: The claims dictionary populated with values
     """
     LOGGER.debug("User info request for {}: Claims={}".format(user, claims))
+    cache_key = (user.id, None, None, user.updated_at)
+    values = CLAIMS_CACHE.get(cache_key)
+    if values is cache.MISSING:
+        values = {
+            key: mapfun(user) for key, mapfun in CLAIMS_MAP.items() if mapfun
+        }
+        CLAIMS_CACHE.set(cache_key, values, settings.CLAIMS_CACHE_TTL)
+
     for key in claims:
         if key in CLAIMS_MAP:
-            mapfun = CLAIMS_MAP[key]
-            if mapfun:
-                claims[key] = mapfun(user)
+            if key in values:
+                claims[key] = values[key]
         else:
             LOGGER.error("Unsupported claim '{}' encountered.".format(key))
 
@@ -86,6 +123,93 @@ class CustomScopeClaims(ScopeClaims):
         _(u"Roles"), _(u"Roles for the requesting site"),
     )
 
+    def __init__(self, *args, **kwargs):
+        super(CustomScopeClaims, self).__init__(*args, **kwargs)
+        self._lookups = None
+        self._deadline = None
+        self._complete = True
+
+    def create_response_dic(self) -> dict:
+        """
+        The claims of the requested scopes are cached for CLAIMS_CACHE_TTL
+        seconds, so a Client polling userinfo does not cause remote calls
+        every time. Claims that were omitted because a lookup timed out are
+        not cached.
+        """
+        cache_key = (
+            self.user.id, self.client.id, tuple(sorted(self.scopes)),
+            self.user.updated_at
+        )
+        dic = CLAIMS_CACHE.get(cache_key)
+        if dic is cache.MISSING:
+            self._start_lookups()
+            dic = super(CustomScopeClaims, self).create_response_dic()
+            if self._complete:
+                CLAIMS_CACHE.set(cache_key, dic, settings.CLAIMS_CACHE_TTL)
+        return dict(dic)
+
+    def _start_lookups(self):
+        """
+        Resolves the Site of the Client once and starts the site data and
+        roles lookups of the requested scopes on the claims executor, so they
+        run concurrently. If the Site can't be resolved in time, the lookups
+        fail with its error.
+        """
+        self._lookups = {}
+        scopes = {"site", "roles"}.intersection(self.scopes)
+        if not scopes:
+            return
+
+        timeout = settings.CLAIMS_API_TIMEOUT
+        self._deadline = time.monotonic() + timeout if timeout else None
+        try:
+            site_id = api_helpers.get_site_for_client(self.client.id, timeout=timeout)
+        except Exception as e:
+            if not (_is_timeout(e) or api_clients.is_failure(e)):
+                raise
+            for scope in scopes:
+                self._lookups[scope] = futures.Future()
+                self._lookups[scope].set_exception(e)
+            return
+        budget = instrumentation.current()
+
+        def lookup(func):
+            # The API calls count towards the request they are made for.
+            with instrumentation.activate(budget):
+                return func(self.user.id, site_id, timeout=timeout)
+
+        if "site" in scopes:
+            self._lookups["site"] = CLAIMS_EXECUTOR.submit(
+                lookup, api_helpers.get_user_site_data
+            )
+        if "roles" in scopes:
+            self._lookups["roles"] = CLAIMS_EXECUTOR.submit(
+                lookup, api_helpers.get_user_site_roles
+            )
+
+    def _lookup(self, scope: str):
+        """
+        :return: The result of the lookup of scope, or cache.MISSING if it
+            timed out or the API is unavailable, e.g. when its circuit is open
+        """
+        if self._lookups is None:
+            self._start_lookups()
+        timeout = None
+        if self._deadline is not None:
+            timeout = max(self._deadline - time.monotonic(), 0)
+        try:
+            return self._lookups[scope].result(timeout=timeout)
+        except Exception as e:
+            if not (_is_timeout(e) or api_clients.is_failure(e)):
+                raise
+            LOGGER.warning(
+                "Omitting the %s claims of user %s for client %s: %s",
+                scope, self.user.id, self.client.client_id,
+                e.__class__.__name__
+            )
+            self._complete = False
+            return cache.MISSING
+
     def scope_site(self) -> dict:
         """
         The following attributes are available when constructing custom scopes:
@@ -95,17 +219,15 @@ class CustomScopeClaims(ScopeClaims):
         * self.client: The Client requesting this claim.
         :return: A dictionary containing the claims for the custom Site scope
         """
-        # Find the Site ID associated with this Client
-        site_id = api_helpers.get_site_for_client(self.client.id)
-
         LOGGER.debug("Looking up site {} data for user {}".format(
             self.client.client_id, self.user))
-        data = api_helpers.get_user_site_data(
-            self.user.id, site_id).to_dict()["data"]
-        now = timezone.now().astimezone(datetime.timezone.utc).isoformat()
-        result = {
-            "site": {"retrieved_at": f"{now}", "data": data},
-        }
+        site_data = self._lookup("site")
+        result = {}
+        if site_data is not cache.MISSING:
+            now = timezone.now().astimezone(datetime.timezone.utc).isoformat()
+            result["site"] = {
+                "retrieved_at": f"{now}", "data": site_data.to_dict()["data"]
+            }
         if self.client.client_id == self.user.migration_data.get("client_id"):
             result["migration_information"] = self.user.migration_data
 
@@ -123,8 +245,7 @@ class CustomScopeClaims(ScopeClaims):
         LOGGER.debug("Requesting roles for user: %s/%s, on site: %s" % (
             self.user.username, self.user.id, self.client))
 
-        roles = api_helpers.get_user_site_role_labels_aggregated(
-            self.user.id, self.client.id)
-        result = {"roles": roles}
-
-        return result
+        roles = self._lookup("roles")
+        if roles is cache.MISSING:
+            return {}
+        return {"roles": roles}
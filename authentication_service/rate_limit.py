@@ -0,0 +1,316 @@
+"""
+Rate limiting of login, password reset and security question attempts.
+
+Failed attempts are counted per username, IP address and client in sliding
+windows. Each window is approximated by two fixed window counters: the count
+of the current window plus the count of the previous window, weighted by the
+part of it that still overlaps the sliding window. This keeps a constant
+amount of state per key, however many attempts are made.
+
+The counters live in Redis, where one Lua script reads and increments all the
+counters of an attempt in a single round trip. Without a Redis URL an
+in-process store is used, which is only suitable for a single process.
+
+Attempts are audited through a buffered background writer, so they do not add
+a database insert to the request.
+"""
+import functools
+import logging
+import math
+import threading
+import time
+
+import redis
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.http import HttpResponseRedirect
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from prometheus_client import Counter
+
+from authentication_service import constants, event_buffer, utils
+
+logger = logging.getLogger(__name__)
+
+ATTEMPTS = Counter(
+    "authentication_service_rate_limited_attempts_total",
+    "Attempts seen by the rate limiter", ["view", "result"]
+)
+
+# KEYS holds the current and previous window counter of every key, in pairs.
+# ARGV[1] is the increment for the current counters and ARGV[2] their
+# time-to-live in milliseconds.
+SLIDING_WINDOW_SCRIPT = """
+local increment = tonumber(ARGV[1])
+local counts = {}
+for i = 1, #KEYS, 2 do
+    local current
+    if increment > 0 then
+        current = redis.call("INCRBY", KEYS[i], increment)
+        redis.call("PEXPIRE", KEYS[i], ARGV[2])
+    else
+        current = tonumber(redis.call("GET", KEYS[i]) or "0")
+    end
+    local previous = tonumber(redis.call("GET", KEYS[i + 1]) or "0")
+    counts[#counts + 1] = {current, previous}
+end
+return counts
+"""
+
+
+class RedisWindowStore(object):
+
+    def __init__(self, url: str):
+        self._redis = redis.StrictRedis.from_url(url)
+        self._script = self._redis.register_script(SLIDING_WINDOW_SCRIPT)
+
+    def counts(self, keys: list, increment: int, ttl: float) -> list:
+        """
+        :param keys: Pairs of (current, previous) window counter keys
+        :param increment: Added to the current counters
+        :param ttl: Seconds the current counters are kept
+        :return: A (current, previous) count for every pair
+        """
+        flat_keys = [key for pair in keys for key in pair]
+        return [
+            tuple(pair) for pair in
+            self._script(keys=flat_keys, args=[increment, int(ttl * 1000)])
+        ]
+
+    def delete(self, keys: list):
+        self._redis.delete(*keys)
+
+
+class LocalWindowStore(object):
+    """
+    Expired counters are swept at most once per time-to-live, rather than on
+    every call.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0
+
+    def counts(self, keys: list, increment: int, ttl: float) -> list:
+        now = time.monotonic()
+        result = []
+        with self._lock:
+            for current_key, previous_key in keys:
+                count, expires_at = self._data.get(current_key, (0, 0))
+                if expires_at <= now:
+                    count = 0
+                if increment > 0:
+                    count += increment
+                    self._data[current_key] = (count, now + ttl)
+                previous, expires_at = self._data.get(previous_key, (0, 0))
+                result.append((count, previous if expires_at > now else 0))
+            if now >= self._next_sweep:
+                self._next_sweep = now + ttl
+                for key in [key for key, (_, expires_at) in self._data.items()
+                            if expires_at <= now]:
+                    del self._data[key]
+        return result
+
+    def delete(self, keys: list):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class SlidingWindowLimiter(object):
+
+    def __init__(self, store, window: int, limits: dict, prefix: str):
+        """
+        :param store: A RedisWindowStore or LocalWindowStore
+        :param window: The length of the sliding window in seconds
+        :param limits: The number of failed attempts allowed per window, by
+            scope. Scopes with a limit of 0 are not limited.
+        :param prefix: Prefix of the counter keys
+        """
+        self.store = store
+        self.window = window
+        self.limits = limits
+        self.prefix = prefix
+
+    def _identities(self, identities: dict) -> list:
+        return [
+            (scope, str(value).lower() if scope == "username" else str(value))
+            for scope, value in sorted(identities.items())
+            if value and self.limits.get(scope)
+        ]
+
+    def _keys(self, scope: str, value: str, index: int) -> tuple:
+        return (
+            f"{self.prefix}:{scope}:{value}:{index}",
+            f"{self.prefix}:{scope}:{value}:{index - 1}",
+        )
+
+    def _exceeded(self, identities: dict, increment: int) -> list:
+        identities = self._identities(identities)
+        if not identities:
+            return []
+        now = time.time()
+        index = math.floor(now / self.window)
+        # The part of the previous window that is still inside the sliding
+        # window.
+        weight = 1 - (now % self.window) / self.window
+        keys = [self._keys(scope, value, index) for scope, value in identities]
+        try:
+            counts = self.store.counts(keys, increment, self.window * 2)
+        except Exception:
+            # Rather let attempts through than lock everybody out while the
+            # store is unavailable.
+            logger.exception("Failed to read the rate limit counters.")
+            return []
+        return [
+            scope for (scope, _), (current, previous) in zip(identities, counts)
+            if current + previous * weight > self.limits[scope]
+        ]
+
+    def blocked(self, **identities) -> list:
+        """
+        :param identities: Values of the username, ip and client scopes
+        :return: The scopes that exceeded their limit
+        """
+        return self._exceeded(identities, 0)
+
+    def record_failure(self, **identities) -> list:
+        """
+        Counts a failed attempt.
+        :param identities: Values of the username, ip and client scopes
+        :return: The scopes that exceeded their limit, including this attempt
+        """
+        return self._exceeded(identities, 1)
+
+    def reset(self, **identities):
+        """
+        Clears the failed attempts of the given scope values.
+        """
+        index = math.floor(time.time() / self.window)
+        keys = [
+            key for scope, value in self._identities(identities)
+            for key in self._keys(scope, value, index)
+        ]
+        if keys:
+            self.store.delete(keys)
+
+
+def get_ip(request) -> str:
+    if settings.RATE_LIMIT_REVERSE_PROXY_HEADER:
+        forwarded = request.META.get(settings.RATE_LIMIT_REVERSE_PROXY_HEADER, "")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def get_identities(request, get_username=None) -> dict:
+    return {
+        "username": get_username(request) if get_username else None,
+        "ip": get_ip(request),
+        "client": utils.get_session_data(request, constants.SessionKeys.CLIENT_ID),
+    }
+
+
+def username_from_post(request):
+    return request.POST.get(settings.RATE_LIMIT_USERNAME_FORM_FIELD, "")[:255] or None
+
+
+def lockout_response(request):
+    return HttpResponseRedirect(reverse("lockout_view"))
+
+
+def database_sink(batch):
+    """
+    Stores a batch of attempts as Defender access attempts, which are listed
+    in the admin. Only the model of django-defender is used, its lockouts are
+    replaced by the LIMITER.
+
+    It runs on the thread of the audit buffer, of which no request closes the
+    connection. So a connection that broke since the last batch, e.g. when
+    the database restarted, is dropped first and the connection is closed
+    after the insert.
+    """
+    from defender.models import AccessAttempt
+    close_old_connections()
+    try:
+        AccessAttempt.objects.bulk_create([AccessAttempt(**attempt) for attempt in batch])
+    finally:
+        connection.close()
+
+
+def log_sink(batch):
+    for attempt in batch:
+        logger.info(
+            "%s attempt for %s from %s on %s.",
+            "Valid" if attempt["login_valid"] else "Failed", attempt["username"],
+            attempt["ip_address"], attempt["path_info"]
+        )
+
+
+def audit(request, username, valid):
+    AUDIT.put(
+        user_agent=request.META.get("HTTP_USER_AGENT", "<unknown>")[:255],
+        ip_address=get_ip(request) or None,
+        username=username,
+        http_accept=request.META.get("HTTP_ACCEPT", "<unknown>")[:1025],
+        path_info=request.META.get("PATH_INFO", "<unknown>")[:255],
+        login_valid=valid,
+    )
+
+
+def watch_attempts(view_name: str, get_username=None):
+    """
+    Decorates a view that handles attempts. Requests from a blocked username,
+    IP address or client are redirected to the lockout page. A POST that does
+    not result in a redirect counts as a failed attempt.
+    :param view_name: The view label of the attempt metrics
+    :param get_username: Callable returning the username of a request, if any
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(request, *args, **kwargs):
+            identities = get_identities(request, get_username)
+            if LIMITER.blocked(**identities):
+                ATTEMPTS.labels(view=view_name, result="blocked").inc()
+                return lockout_response(request)
+
+            response = func(request, *args, **kwargs)
+
+            if request.method == "POST":
+                failed = response is not None and \
+                    not response.has_header("location") and \
+                    response.status_code != 302
+                audit(request, identities["username"], not failed)
+                if not failed:
+                    ATTEMPTS.labels(view=view_name, result="allowed").inc()
+                    LIMITER.reset(username=identities["username"])
+                elif LIMITER.record_failure(**identities):
+                    ATTEMPTS.labels(view=view_name, result="locked").inc()
+                    return lockout_response(request)
+                else:
+                    ATTEMPTS.labels(view=view_name, result="failed").inc()
+            return response
+
+        return wrapper
+    return decorator
+
+
+LIMITER = SlidingWindowLimiter(
+    RedisWindowStore(settings.RATE_LIMIT_REDIS_URL) if settings.RATE_LIMIT_REDIS_URL
+    else LocalWindowStore(),
+    window=settings.RATE_LIMIT_WINDOW,
+    limits={
+        "username": settings.RATE_LIMIT_USERNAME_LIMIT,
+        "ip": settings.RATE_LIMIT_IP_LIMIT,
+        "client": settings.RATE_LIMIT_CLIENT_LIMIT,
+    },
+    prefix=settings.RATE_LIMIT_KEY_PREFIX,
+)
+
+AUDIT = event_buffer.EventBuffer(
+    import_string(settings.RATE_LIMIT_AUDIT_SINK),
+    maxsize=settings.RATE_LIMIT_AUDIT_BUFFER_SIZE,
+    batch_size=settings.RATE_LIMIT_AUDIT_BATCH_SIZE,
+    flush_interval=settings.RATE_LIMIT_AUDIT_FLUSH_INTERVAL,
+)
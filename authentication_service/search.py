@@ -0,0 +1,140 @@
+"""
+Full text search on users.
+
+Every user has a search_vector column holding a tsvector of the searchable
+text fields, weighted per field. It is maintained by the model on save and
+can be (re)built for existing users with the backfill_search_vectors
+management command.
+
+The values are indexed as is, as well as split into their alphanumeric
+parts. That way "jane.doe@example.com" can be found as a whole, or by
+searching for "jane" or "doe".
+"""
+import re
+from collections import OrderedDict
+
+from django.contrib.postgres.search import SearchQueryField, SearchRank, \
+    SearchVector
+from django.db.models import F, Func, TextField, Value
+
+# The "simple" configuration lower cases words but does not stem them or drop
+# stop words, which suits names, usernames and email addresses.
+SEARCH_CONFIG = "simple"
+
+# The fields that are searched, along with the weight used when ranking
+# matches on them.
+SEARCH_FIELDS = OrderedDict([
+    ("username", "A"),
+    ("email", "A"),
+    ("first_name", "B"),
+    ("last_name", "B"),
+    ("nickname", "B"),
+    ("msisdn", "C"),
+])
+
+SEARCH_MODE_INNER = "inner"
+SEARCH_MODE_TOKEN = "token"
+SEARCH_MODE_PREFIX = "prefix"
+SEARCH_MODES = [SEARCH_MODE_INNER, SEARCH_MODE_TOKEN, SEARCH_MODE_PREFIX]
+
+
+class TextFunc(Func):
+
+    def __init__(self, *expressions, **extra):
+        super(TextFunc, self).__init__(
+            *expressions, output_field=TextField(), **extra
+        )
+
+
+class AlphanumericParts(TextFunc):
+    function = "regexp_replace"
+    template = "%(function)s(%(expressions)s, '[^[:alnum:]]+', ' ', 'g')"
+
+
+class ConcatWords(TextFunc):
+    function = "concat_ws"
+    template = "%(function)s(' ', %(expressions)s)"
+
+
+class TsQuery(Func):
+    function = "to_tsquery"
+    template = f"%(function)s('{SEARCH_CONFIG}'::regconfig, %(expressions)s)"
+
+    def __init__(self, expression, **extra):
+        super(TsQuery, self).__init__(
+            expression, output_field=SearchQueryField(), **extra
+        )
+
+
+def search_vector(values):
+    """ Builds the expression computing a user's search vector.
+    :param values: A dict of expressions providing the value of each of the
+        SEARCH_FIELDS, e.g. Value instances when saving a user or F instances
+        when updating users in bulk.
+    :return: A tsvector expression
+    """
+    vector = None
+    for name, weight in SEARCH_FIELDS.items():
+        value = values[name]
+        part = SearchVector(
+            ConcatWords(value, AlphanumericParts(value)),
+            config=SEARCH_CONFIG, weight=weight
+        )
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def column_search_vector():
+    """ The search vector expression computed from the stored user columns,
+    for use in queryset updates.
+    """
+    return search_vector({name: F(name) for name in SEARCH_FIELDS})
+
+
+def instance_search_vector(user):
+    """ The search vector expression computed from the values on a user
+    instance, for use when saving it.
+    """
+    return search_vector({
+        name: Value(getattr(user, name, None)) for name in SEARCH_FIELDS
+    })
+
+
+def search_query(text, mode):
+    """ Builds the text search query for the search text. All alphanumeric
+    parts of the text need to match.
+    :param text: The text to search for.
+    :param mode: SEARCH_MODE_TOKEN to match whole words or
+        SEARCH_MODE_PREFIX to match the start of words.
+    :return: A tsquery expression or None if text contains no words
+    """
+    words = re.findall(r"[^\W_]+", text.lower())
+    if not words:
+        return None
+    suffix = ":*" if mode == SEARCH_MODE_PREFIX else ""
+    # The words contain only alphanumeric characters, which means they can
+    # not contain tsquery operators.
+    return TsQuery(Value(" & ".join(f"{word}{suffix}" for word in words)))
+
+
+def search(queryset, text, mode, rank=False):
+    """ Filters a user queryset on the search text.
+    :param queryset: A CoreUser queryset.
+    :param text: The text to search for.
+    :param mode: One of SEARCH_MODES.
+    :param rank: Annotate the matches with a search_rank value, which is
+        higher for more relevant matches. Not supported by the inner mode.
+    :return: The filtered queryset
+    """
+    if mode == SEARCH_MODE_INNER:
+        return queryset.filter(q__ilike=text)
+
+    query = search_query(text, mode)
+    if query is None:
+        return queryset.none()
+    queryset = queryset.filter(search_vector=query)
+    if rank:
+        queryset = queryset.annotate(
+            search_rank=SearchRank(F("search_vector"), query)
+        )
+    return queryset
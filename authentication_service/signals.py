@@ -1,17 +1,22 @@
 import logging
 
+from celery.signals import worker_process_init
+from oidc_provider.models import Client
 from oidc_provider.signals import user_accept_consent
 
 from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.conf import settings
 
-from authentication_service import api_helpers
+from authentication_service import answer_hashing, api_helpers, email_templates, \
+    event_buffer, middleware
 from authentication_service.constants import SessionKeys
 from authentication_service.models import UserSite
 from authentication_service.utils import get_session_data
 
-from kinesis_conducer.producer_events import events, schemas
+from kinesis_conducer.producer_events import schemas
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +31,50 @@ def user_accepted_consent_callback(sender, user, client, **kwargs):
     logger.debug(message.format(user=user, client=client))
 
 
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def client_site_cache_callback(sender, instance, **kwargs):
+    # The Site linked to a Client is cached, make sure changes to the Client
+    # are picked up.
+    api_helpers.invalidate_site_cache(instance.id)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def client_cache_callback(sender, instance, **kwargs):
+    # Clients are cached by their client_id, which may itself have changed, so
+    # all entries are dropped.
+    middleware.invalidate_client_cache()
+
+
+@receiver(setting_changed)
+def path_cache_callback(sender, setting, **kwargs):
+    # The whitelisted middleware paths depend on the url configuration and the
+    # language prefixes in it.
+    if setting in ("ROOT_URLCONF", "LANGUAGES", "LANGUAGE_CODE"):
+        middleware.clear_path_caches()
+
+
+@receiver(setting_changed)
+def answer_hasher_callback(sender, setting, **kwargs):
+    if setting in ("SECURITY_ANSWER_HASHER", "SECURITY_ANSWER_ITERATIONS",
+                   "PASSWORD_HASHERS"):
+        answer_hashing.get_hasher.cache_clear()
+
+
+@receiver(setting_changed)
+def email_template_cache_callback(sender, setting, **kwargs):
+    if setting == "TEMPLATES":
+        email_templates.clear()
+
+
+@worker_process_init.connect
+def warm_email_templates(**kwargs):
+    # Load the email templates before the first task needs them, rather than
+    # parsing them while sending.
+    email_templates.warm()
+
+
 def get_site_id(request):
     """
     Returns the site_id for the client found on the session.
@@ -42,8 +91,10 @@ def get_site_id(request):
 
 @receiver(user_logged_in)
 def user_login_kinesis_callback(sender, request, user, **kwargs):
+    # The site lookup is cached and the event is published in the background,
+    # keeping both off the request path as far as possible.
     site_id = get_site_id(request)
-    events.put_event(
+    event_buffer.BUFFER.put(
         event_type=schemas.EventTypes.USER_LOGIN,
         site_id=site_id,
         user_id=str(user.id),
@@ -52,8 +103,10 @@ def user_login_kinesis_callback(sender, request, user, **kwargs):
 
 @receiver(user_logged_out)
 def user_logout_kinesis_callback(sender, request, user, **kwargs):
+    # The site lookup is cached and the event is published in the background,
+    # keeping both off the request path as far as possible.
     site_id = get_site_id(request)
-    events.put_event(
+    event_buffer.BUFFER.put(
         event_type=schemas.EventTypes.USER_LOGOUT,
         site_id=site_id,
         user_id=str(user.id),
@@ -1,8 +1,11 @@
 import logging
 import typing
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import urllib3
+from celery import current_task
 from celery.task import task
 from django.utils.dateparse import parse_datetime
 from oidc_provider.models import Token, Code, UserConsent
@@ -11,15 +14,19 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.core import signing
+from django.core.cache import cache
 from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
 from django.forms import model_to_dict
-from django.template import loader
 from django.utils import timezone, translation
 from django.utils.html import strip_tags
 from django.utils.http import urlencode
 from django.utils.translation import ugettext as _
+from prometheus_client import Histogram
 
-from authentication_service.models import Organisation, UserSite, UserSecurityQuestion
+from authentication_service import email_templates, mail_dispatch
+from authentication_service.models import Organisation, UserDeletionJob, UserSite, \
+    UserSecurityQuestion
 from access_control.rest import ApiException as AccessControlApiException
 from user_data_store.rest import ApiException as UserDataStoreApiException
 
@@ -29,6 +36,18 @@ FROM_EMAIL = "auth@gehosting.org"
 
 UserModel = get_user_model()
 
+DELETION_STEP_DURATION = Histogram(
+    "authentication_service_user_deletion_step_duration_seconds",
+    "User deletion step duration (s)", ["step"]
+)
+
+# The errors after which the deletion tasks are retried. The steps are
+# idempotent, so this includes read timeouts, after which the other service
+# may have completed the step.
+DELETION_RETRY_ERRORS = (
+    AccessControlApiException, UserDataStoreApiException, urllib3.exceptions.HTTPError
+)
+
 MAIL_TYPE_DATA = {
     "default": {
         "subject": _("Email from Girl Effect"),
@@ -52,6 +71,47 @@ MAIL_TYPE_DATA = {
 }
 
 
+def fetch_objects(objects_to_fetch: typing.List[dict]) -> dict:
+    """
+    Fetches the instances described by objects_to_fetch, see send_mail, with
+    one query per model. Content types are looked up through the cache of the
+    ContentType manager.
+    :return: A dict of the instances by their context key
+    """
+    ids_by_model = {}
+    for obj in objects_to_fetch:
+        ids_by_model.setdefault((obj["app_label"], obj["model"]), set()).add(obj["id"])
+
+    model_classes = {}
+    instances = {}
+    for (app_label, model), ids in ids_by_model.items():
+        model_class = ContentType.objects.get_by_natural_key(
+            app_label, model
+        ).model_class()
+        model_classes[(app_label, model)] = model_class
+        for pk, instance in model_class.objects.in_bulk(ids).items():
+            instances[(app_label, model, str(pk))] = instance
+
+    objects = {}
+    for obj in objects_to_fetch:
+        instance = instances.get((obj["app_label"], obj["model"], str(obj["id"])))
+        if instance is None:
+            raise model_classes[(obj["app_label"], obj["model"])].DoesNotExist(
+                f"{obj['app_label']}.{obj['model']} {obj['id']} does not exist."
+            )
+        objects[obj.get("context_key", obj["model"].lower())] = instance
+    return objects
+
+
+def _mail_key():
+    """
+    Returns the id of the running task, which its retries keep, so an email
+    sent by an earlier try is not sent again. None outside of a task.
+    """
+    request = current_task.request if current_task else None
+    return request.id if request and request.id else None
+
+
 @task(name="email_task", default_retry_delay=300, max_retries=2)
 def send_mail(
         context: dict,
@@ -61,7 +121,9 @@ def send_mail(
     """
     Task to construct and send emails.
 
-    context: context to be passed to the email template.
+    context: context to be passed to the email template. Values that are
+        already serialised, e.g. a dict with the fields of a user that the
+        template needs, do not have to be fetched.
     mail_type: key for a managed dict containing default settings for certain mail types.
     extra: Overrides the default mail type setting if needed.
     objects_to_fetch: Django model instances do not serialise well. This is a
@@ -103,16 +165,9 @@ def send_mail(
 
     # Fetches instance for each object from the db and puts it into
     # context, that gets passed to the email template.
-    for obj in objects_to_fetch:
-        obj_type = ContentType.objects.get(
-            app_label=obj["app_label"],
-            model=obj["model"]
-        )
-        model_class = obj_type.model_class()
-        instance = model_class.objects.get(id=obj["id"])
-        context[obj.get("context_key", obj["model"].lower())] = instance
+    context.update(fetch_objects(objects_to_fetch))
 
-    text_content = loader.render_to_string(template_name, context)
+    text_content = email_templates.render_to_string(template_name, context)
 
     message = EmailMultiAlternatives(
         subject=subject,
@@ -132,7 +187,7 @@ def send_mail(
         message.attach(*attachment)
 
     logger.info("Sent mail of type %s on %s" % (mail_type, now))
-    message.send()
+    mail_dispatch.DISPATCHER.send(message, key=_mail_key())
 
 
 @task(name="invitation_email_task", default_retry_delay=300, max_retries=2)
@@ -175,8 +230,8 @@ def send_invitation_email(invitation: dict, registration_url: str, language=None
             context["expires_at"] = parse_datetime(context["expires_at"])
 
         # Generate the email from the template
-        html_content = loader.render_to_string("authentication_service/email/invitation.html",
-                                               context)
+        html_content = email_templates.render_to_string(
+            "authentication_service/email/invitation.html", context)
         text_content = strip_tags(html_content)
         message = EmailMultiAlternatives(
             subject=subject,
@@ -187,7 +242,7 @@ def send_invitation_email(invitation: dict, registration_url: str, language=None
             headers={"Unique-ID": uuid.uuid1().hex},
         )
         message.attach_alternative(html_content, "text/html")
-        message.send()
+        mail_dispatch.DISPATCHER.send(message, key=_mail_key())
 
         logger.info(f"Sent invitation from {sender.username} "
                     f"to {invitation['first_name']} {invitation['last_name']}")
@@ -211,45 +266,29 @@ def purge_expired_invitations(cutoff_date):
     logger.info(f"Purged {result.amount} invitations.")
 
 
-@task(name="delete_user_and_data",
-      default_retry_delay=5 * 60,
-      autoretry_for=(AccessControlApiException, UserDataStoreApiException),
-      retry_backoff=True,
-      retry_backoff_max=600,
-      retry_jitter=True)
-def delete_user_and_data_task(user_id: uuid.UUID, deleter_id: uuid.UUID, reason: str):
+def _run_deletion_step(checkpoints: list, user_id: str, step: str, func, *args,
+                       checkpoint: str = None):
     """
-    A task to clean up user-related data on the core components and remove
-    the specified user profile itself.
-    We keep track of deleted users (see the architecture documentation for the reasons)
-    as the sites that they have visited.
-    https://praekeltorg.atlassian.net/wiki/spaces/GECI/pages/477266059/Detailed+Architectural+Design#DetailedArchitecturalDesign-DeletionofUserData
-
-    IMPORTANT: This function is written so that it is idempotent, i.e. it can be run repeatedly
-    without any unwanted side-effects. The reason is that, should something fail (like an API call),
-    this task can be retried at a later stage.
-
-    :param user_id: The user to delete.
-    :param deleter_id: The user requesting the deletion.
-    :param reason: The reason for the deletion.
+    Runs and times a user deletion step, unless an earlier attempt completed it
+    already.
+    :param checkpoints: A list the cache key of the step checkpoint is added to
+    :param user_id: The user being deleted
+    :param step: The name of the step, used to label its timing metric
+    :param func: The step itself, called with args
+    :param checkpoint: The checkpoint name, if the step runs more than once per user
     """
-    user_data_store_api = settings.USER_DATA_STORE_API
-    operational_api = settings.AC_OPERATIONAL_API
-
-    # Cast UUIDs to strings, which can be used in both the API calls and
-    # model lookups.
-    user_id = str(user_id)
-    deleter_id = str(deleter_id)
+    key = f"delete_user_and_data:{user_id}:{checkpoint or step}"
+    checkpoints.append(key)
+    if cache.get(key):
+        return
+    with DELETION_STEP_DURATION.labels(step=step).time():
+        func(*args)
+    cache.set(key, True, settings.USER_DELETION_CHECKPOINT_TTL)
 
-    try:
-        user = UserModel.objects.get(id=user_id)
 
-        # Disable user
-        user.is_active = False
-        user.save()
-    except UserModel.DoesNotExist:
-        logger.error(f"User {user_id} cannot be deleted because it does not exist.")
-        return  # Nothing to do
+def _create_deleted_user(user, deleter_id: str, reason: str):
+    user_data_store_api = settings.USER_DATA_STORE_API
+    user_id = str(user.id)
 
     # Check if this job has been attempted before.
     try:
@@ -276,45 +315,35 @@ def delete_user_and_data_task(user_id: uuid.UUID, deleter_id: uuid.UUID, reason:
 
         user_data_store_api.deleteduser_create(data=data)
 
-    # Create DeletedSite entries
-    for user_site in UserSite.objects.filter(user_id=user_id):
-        try:
-            deleted_user_site = user_data_store_api.deletedusersite_read(user_id, user_site.site_id)
-        except UserDataStoreApiException as e:
-            if e.status == 404:
-                deleted_user_site = None
-            else:
-                raise
-
-        if deleted_user_site is None:
-            user_data_store_api.deletedusersite_create(
-                data={
-                    "deleted_user_id": user_id,
-                    "site_id": user_site.site_id,
-                }
-            )
-
-    # Delete tokens
-    Token.objects.filter(user_id=user_id).delete()
-
-    # Delete consent
-    UserConsent.objects.filter(user_id=user_id).delete()
 
-    # Delete code
-    Code.objects.filter(user_id=user_id).delete()
+def _create_deleted_user_site(user_id: str, site_id: int):
+    user_data_store_api = settings.USER_DATA_STORE_API
+    try:
+        deleted_user_site = user_data_store_api.deletedusersite_read(user_id, site_id)
+    except UserDataStoreApiException as e:
+        if e.status == 404:
+            deleted_user_site = None
+        else:
+            raise
 
-    # Delete UserSite entries
-    UserSite.objects.filter(user_id=user_id).delete()
+    if deleted_user_site is None:
+        user_data_store_api.deletedusersite_create(
+            data={
+                "deleted_user_id": user_id,
+                "site_id": site_id,
+            }
+        )
 
-    # Delete UserSecurityQuestion entries
-    UserSecurityQuestion.objects.filter(user_id=user_id).delete()
 
-    # Delete Access Control data
-    result = operational_api.delete_user_data(user_id)
+def _delete_access_control_data(user_id: str):
+    result = settings.AC_OPERATIONAL_API.delete_user_data(user_id)
     logger.debug(f"{result.amount} rows deleted from Access Control")
 
+
+def _delete_user_data_store_data(user_id: str):
     # Delete User Data Store data and set the "deleted_at" value
     # of the DeletedUser entity.
+    user_data_store_api = settings.USER_DATA_STORE_API
     result = user_data_store_api.delete_user_data(user_id)
     logger.debug(f"{result.amount} rows deleted from User Data Store")
 
@@ -322,6 +351,123 @@ def delete_user_and_data_task(user_id: uuid.UUID, deleter_id: uuid.UUID, reason:
         user_id, data={"deleted_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")}
     )
 
+
+def _delete_local_data(user_ids: typing.List[str]):
+    with DELETION_STEP_DURATION.labels(step="local_data").time(), transaction.atomic():
+        Token.objects.filter(user_id__in=user_ids).delete()
+        UserConsent.objects.filter(user_id__in=user_ids).delete()
+        Code.objects.filter(user_id__in=user_ids).delete()
+        UserSite.objects.filter(user_id__in=user_ids).delete()
+        UserSecurityQuestion.objects.filter(user_id__in=user_ids).delete()
+
+
+def _delete_users_and_data(users: list, deleter_id: str, reason: str) -> int:
+    """
+    Deletes the data of the given, already deactivated, users on the core
+    components and then the users themselves.
+
+    Neither Access Control nor the User Data Store offer batch endpoints, so the
+    remote steps fan out to the per user endpoints instead. They run
+    concurrently, with at most USER_DELETION_CONCURRENCY API calls in flight.
+    The worker threads only call the APIs, all database access stays on the
+    calling thread.
+
+    Completed remote steps are checkpointed in the cache, so that a retry only
+    redoes the steps that did not finish. The local data of all users is
+    deleted in a single transaction.
+    :param users: The users to delete
+    :param deleter_id: The user requesting the deletion
+    :param reason: The reason for the deletion
+    :return: The number of users deleted
+    """
+    user_ids = [str(user.id) for user in users]
+    user_sites = UserSite.objects.filter(user_id__in=user_ids).values_list(
+        "user_id", "site_id"
+    )
+    checkpoints = []
+
+    with ThreadPoolExecutor(max_workers=settings.USER_DELETION_CONCURRENCY) as executor:
+        def submit(user_id, step, func, *args, checkpoint=None):
+            return executor.submit(
+                _run_deletion_step, checkpoints, user_id, step, func, *args,
+                checkpoint=checkpoint
+            )
+
+        # The DeletedUser entries must exist before the DeletedUserSite
+        # entries referring to them are created.
+        futures = [
+            submit(str(user.id), "deleted_user", _create_deleted_user, user, deleter_id, reason)
+            for user in users
+        ]
+        for future in futures:
+            future.result()
+
+        futures = [
+            submit(
+                str(user_id), "deleted_user_site", _create_deleted_user_site,
+                str(user_id), site_id, checkpoint=f"deleted_user_site:{site_id}"
+            ) for user_id, site_id in user_sites
+        ] + [
+            submit(user_id, "access_control_data", _delete_access_control_data, user_id)
+            for user_id in user_ids
+        ]
+        # The UserSite entries are only deleted once the DeletedUserSite
+        # entries exist, so that a retry can still find them.
+        for future in futures:
+            future.result()
+
+        futures = [
+            submit(user_id, "user_data_store_data", _delete_user_data_store_data, user_id)
+            for user_id in user_ids
+        ]
+        _delete_local_data(user_ids)
+        for future in futures:
+            future.result()
+
+    # Finally, delete the users
+    _, deleted = UserModel.objects.filter(id__in=user_ids).delete()
+    cache.delete_many(checkpoints)
+    return deleted.get(UserModel._meta.label, 0)
+
+
+@task(name="delete_user_and_data",
+      default_retry_delay=5 * 60,
+      autoretry_for=DELETION_RETRY_ERRORS,
+      retry_backoff=True,
+      retry_backoff_max=600,
+      retry_jitter=True)
+def delete_user_and_data_task(user_id: uuid.UUID, deleter_id: uuid.UUID, reason: str):
+    """
+    A task to clean up user-related data on the core components and remove
+    the specified user profile itself.
+    We keep track of deleted users (see the architecture documentation for the reasons)
+    as the sites that they have visited.
+    https://praekeltorg.atlassian.net/wiki/spaces/GECI/pages/477266059/Detailed+Architectural+Design#DetailedArchitecturalDesign-DeletionofUserData
+
+    IMPORTANT: This function is written so that it is idempotent, i.e. it can be run repeatedly
+    without any unwanted side-effects. The reason is that, should something fail (like an API call),
+    this task can be retried at a later stage. Completed steps are checkpointed in the cache, so
+    a retry only redoes the steps that did not finish.
+
+    :param user_id: The user to delete.
+    :param deleter_id: The user requesting the deletion.
+    :param reason: The reason for the deletion.
+    """
+    # Cast UUIDs to strings, which can be used in both the API calls and
+    # model lookups.
+    user_id = str(user_id)
+    deleter_id = str(deleter_id)
+
+    try:
+        user = UserModel.objects.get(id=user_id)
+
+        # Disable user
+        user.is_active = False
+        user.save()
+    except UserModel.DoesNotExist:
+        logger.error(f"User {user_id} cannot be deleted because it does not exist.")
+        return  # Nothing to do
+
     # Keep a copy of some of the fields for the email notification
     user_dict = model_to_dict(user, fields=[
         "id", "username", "first_name", "last_name"
@@ -329,8 +475,7 @@ def delete_user_and_data_task(user_id: uuid.UUID, deleter_id: uuid.UUID, reason:
     # For some reason model_to_dict does not include the id. Add it explicitly.
     user_dict["id"] = user_id
 
-    # Finally, delete the user
-    user.delete()
+    _delete_users_and_data([user], deleter_id, reason)
 
     # We try to send a confirmation email to the user requesting the deletion.
     # If it fails, we cannot retry
@@ -349,6 +494,57 @@ def delete_user_and_data_task(user_id: uuid.UUID, deleter_id: uuid.UUID, reason:
         logger.error(f"User {deleter_id} cannot be found, so we cannot send an email.")
 
 
+@task(name="delete_users_and_data",
+      bind=True,
+      default_retry_delay=5 * 60,
+      autoretry_for=DELETION_RETRY_ERRORS,
+      retry_backoff=True,
+      retry_backoff_max=600,
+      retry_jitter=True)
+def delete_users_and_data_task(self, job_id: uuid.UUID):
+    """
+    A task deleting the users of a UserDeletionJob, and their data, in batches
+    of USER_DELETION_BATCH_SIZE users. Progress is saved on the job after every
+    batch, so that a retry continues with the batch that failed.
+
+    Unlike delete_user_and_data_task, no deletion confirmations are sent.
+
+    :param job_id: The UserDeletionJob to run.
+    """
+    job = UserDeletionJob.objects.get(id=job_id)
+    if job.status == UserDeletionJob.STATUS_COMPLETED:
+        return  # Nothing to do
+
+    job.status = UserDeletionJob.STATUS_RUNNING
+    job.save(update_fields=["status", "updated_at"])
+    deleter_id = str(job.deleter_id)
+
+    try:
+        while job.processed < job.total:
+            batch = job.user_ids[job.processed:job.processed + settings.USER_DELETION_BATCH_SIZE]
+            users = UserModel.objects.filter(id__in=batch)
+            users.update(is_active=False)
+            users = list(users)
+            if users:
+                job.deleted += _delete_users_and_data(users, deleter_id, job.reason)
+            job.processed += len(batch)
+            job.save(update_fields=["processed", "deleted", "updated_at"])
+    except Exception as e:
+        # The job only fails once the task is not going to be retried.
+        retried = isinstance(e, DELETION_RETRY_ERRORS) \
+            and self.request.retries < self.max_retries
+        if not retried:
+            job.status = UserDeletionJob.STATUS_FAILED
+            job.error = str(e)
+            job.save(update_fields=["status", "error", "updated_at"])
+        raise
+
+    job.status = UserDeletionJob.STATUS_COMPLETED
+    job.completed_at = timezone.now()
+    job.save(update_fields=["status", "completed_at", "updated_at"])
+    logger.info(f"Deleted {job.deleted} of {job.total} users for deletion job {job.id}.")
+
+
 @task(name="send_deletion_confirmation",
       default_retry_delay=5 * 60,
       retry_backoff=True,
@@ -361,7 +557,7 @@ def send_deletion_confirmation_task(
     subject = _("Confirmation of user and data deletion")
 
     # Generate the email from the template
-    html_content = loader.render_to_string(
+    html_content = email_templates.render_to_string(
         "authentication_service/email/deletion_confirmation.html",
         {"user": user, "deleter": deleter}
     )
@@ -375,7 +571,7 @@ def send_deletion_confirmation_task(
         headers={"Unique-ID": uuid.uuid1().hex},
     )
     message.attach_alternative(html_content, "text/html")
-    message.send()
+    mail_dispatch.DISPATCHER.send(message, key=_mail_key())
 
     logger.info(f"Sent deletion confirmation for {user['username']} ({user['id']})"
                 f" to {deleter['first_name']} {deleter['last_name']} ({deleter['email']})")
@@ -10,6 +10,7 @@ import django.conf.locale
 from project.settings_base import *
 import access_control
 import user_data_store
+from authentication_service import api_clients
 
 env = Env()
 
@@ -26,6 +27,52 @@ CLIENT_REQUEST_EMAIL = env.list("CLIENT_REQUEST_EMAIL", [])
 # service. This service can not have a client that is required to create a
 # site entry.
 AUTHENTICATION_SERVICE_HARDCODED_SITE_ID = 0
+
+# authentication_service/api_helpers.py: Site lookups are not cached by default,
+# tests mock the Access Control API per test case.
+SITE_CACHE_TTL = 0
+SITE_CACHE_NEGATIVE_TTL = 0
+SITE_FALLBACK_TTL = 0
+SITE_CACHE_SIZE = 100
+
+# authentication_service/oidc_provider_settings.py: Claims are not cached by
+# default, tests that need the cache override the ttl.
+CLAIMS_CACHE_TTL = 0
+CLAIMS_CACHE_SIZE = 100
+CLAIMS_CONCURRENCY = 4
+CLAIMS_API_TIMEOUT = 5
+
+# authentication_service/middleware.py: Clients are not cached by default,
+# tests that need the cache override the ttl.
+CLIENT_CACHE_TTL = 0
+CLIENT_CACHE_SIZE = 100
+
+# authentication_service/api_clients.py
+API_POOL_SIZE = 4
+API_CONNECT_TIMEOUT = 2
+API_READ_TIMEOUT = 10
+API_RETRIES = 0
+API_RETRY_BACKOFF = 0
+API_KEEP_ALIVE = True
+API_BREAKER_THRESHOLD = 5
+API_BREAKER_RESET_TIMEOUT = 30
+API_BREAKER_ENDPOINTS = {}
+
+# authentication_service/event_buffer.py
+EVENT_BUFFER_SINK = "authentication_service.event_buffer.kinesis_sink"
+EVENT_BUFFER_SIZE = 1000
+EVENT_BUFFER_BATCH_SIZE = 500
+EVENT_BUFFER_FLUSH_INTERVAL = 0.1
+EVENT_BUFFER_PUT_TIMEOUT = 0
+
+# authentication_service/tasks.py
+USER_DELETION_CONCURRENCY = 4
+USER_DELETION_CHECKPOINT_TTL = 600
+USER_DELETION_BATCH_SIZE = 2
+USER_DELETION_MAX_USERS = 10000
+
+# authentication_service/instrumentation.py
+SLOW_REQUEST_THRESHOLD = 0
 #--Project settings end
 
 # Django Settings
@@ -149,6 +196,7 @@ ADDITIONAL_APPS = [
     "django_otp.plugins.otp_static",
     "django_otp.plugins.otp_totp",
     "two_factor",
+    # Only stores the audited login attempts, see rate_limit.database_sink.
     "defender",
     "celery",
 
@@ -201,20 +249,23 @@ LAYERS = {
 # https://docs.djangoproject.com/en/1.11/ref/settings/#password-reset-timeout-days
 PASSWORD_RESET_TIMEOUT_DAYS = 3
 
-# Defender options
-DEFENDER_LOGIN_FAILURE_LIMIT = 5  # A maximum of 5 failed attempts to be allowed
-DEFENDER_BEHIND_REVERSE_PROXY = False
-DEFENDER_LOCK_OUT_BY_IP_AND_USERNAME = False
-DEFENDER_DISABLE_IP_LOCKOUT = True
-DEFENDER_DISABLE_USERNAME_LOCKOUT = False
-DEFENDER_COOLOFF_TIME = 600  # seconds that failures will be remembered
-DEFENDER_REVERSE_PROXY_HEADER = "HTTP_X_FORWARDED_FOR"
-DEFENDER_CACHE_PREFIX = "defender"
-DEFENDER_LOCKOUT_URL = "/lockout"
-DEFENDER_REDIS_URL = env.str("REDIS_URI", "redis://localhost:6379/0")
-DEFENDER_STORE_ACCESS_ATTEMPTS = True
-DEFENDER_ACCESS_ATTEMPT_EXPIRATION = 24  # hours
-DEFENDER_USERNAME_FORM_FIELD = "auth-username"
+# authentication_service/rate_limit.py
+RATE_LIMIT_REDIS_URL = env.str("REDIS_URI", "redis://localhost:6379/0")
+RATE_LIMIT_KEY_PREFIX = "test_rate_limit"
+RATE_LIMIT_WINDOW = 600
+RATE_LIMIT_USERNAME_LIMIT = 5
+RATE_LIMIT_IP_LIMIT = 0
+RATE_LIMIT_CLIENT_LIMIT = 0
+RATE_LIMIT_USERNAME_FORM_FIELD = "auth-username"
+RATE_LIMIT_REVERSE_PROXY_HEADER = ""
+RATE_LIMIT_AUDIT_SINK = "authentication_service.rate_limit.log_sink"
+RATE_LIMIT_AUDIT_BUFFER_SIZE = 1000
+RATE_LIMIT_AUDIT_BATCH_SIZE = 100
+RATE_LIMIT_AUDIT_FLUSH_INTERVAL = 0.1
+
+# authentication_service/answer_hashing.py
+SECURITY_ANSWER_HASHER = "pbkdf2_sha256"
+SECURITY_ANSWER_ITERATIONS = 0
 
 ALLOWED_HOSTS = env.list("ALLOWED_HOSTS", "127.0.0.1,localhost")
 
@@ -264,6 +315,7 @@ CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 # API Settings
 STUBS_CLASS = "authentication_service.integration.Implementation"
 SWAGGER_API_VALIDATE_RESPONSES = True
+SWAGGER_API_VALIDATE_RESPONSES_SAMPLE_RATE = 1.0
 DEFAULT_LISTING_LIMIT = 20
 MAX_LISTING_LIMIT = 100
 MIN_LISTING_LIMIT = 1
@@ -335,6 +387,14 @@ EMAIL_USE_TLS = env.bool("EMAIL_USE_TLS", False)
 EMAIL_USE_SSL = env.bool("EMAIL_USE_SSL", False)
 EMAIL_TIMEOUT = env.int("EMAIL_TIMEOUT", None)
 
+# authentication_service/mail_dispatch.py
+MAIL_BATCH_SIZE = 50
+MAIL_BATCH_WINDOW = 0
+MAIL_SEND_ATTEMPTS = 3
+MAIL_CONNECTION_IDLE_TIMEOUT = 1
+MAIL_SEND_TIMEOUT = 10
+MAIL_SENT_KEY_TTL = 60
+
 if not env.bool("BUILDER", False):
     # Celery workers now require the Access Control API.
     # GE API settings and setup
@@ -344,30 +404,41 @@ if not env.bool("BUILDER", False):
     ACCESS_CONTROL_API_URL = env.str("ACCESS_CONTROL_API")
     ACCESS_CONTROL_API_KEY = env.str("ACCESS_CONTROL_API_KEY")
 
-    # Setup API clients
-    config = user_data_store.configuration.Configuration()
-    config.host = USER_DATA_STORE_API_URL
-    config = access_control.configuration.Configuration()
-    config.host = ACCESS_CONTROL_API_URL
-    USER_DATA_STORE_API = user_data_store.api.UserDataApi(
-        api_client=user_data_store.ApiClient(
-            header_name="X-API-KEY",
-            header_value=USER_DATA_STORE_API_KEY,
-            configuration=config
+    # Setup API clients. They are built once, on first use, as not every
+    # process calls the APIs. The CRUD and operational APIs of a service share one
+    # client and with it one connection pool.
+    API_CLIENT_OPTIONS = {
+        "pool_size": API_POOL_SIZE,
+        "connect_timeout": API_CONNECT_TIMEOUT,
+        "read_timeout": API_READ_TIMEOUT,
+        "retries": API_RETRIES,
+        "retry_backoff": API_RETRY_BACKOFF,
+        "keep_alive": API_KEEP_ALIVE,
+        "breaker_threshold": API_BREAKER_THRESHOLD,
+        "breaker_reset_timeout": API_BREAKER_RESET_TIMEOUT,
+        "breaker_endpoints": API_BREAKER_ENDPOINTS,
+    }
+    USER_DATA_STORE_API = api_clients.lazy(
+        lambda: user_data_store.api.UserDataApi(api_client=api_clients.build(
+            user_data_store, USER_DATA_STORE_API_URL, USER_DATA_STORE_API_KEY,
+            **API_CLIENT_OPTIONS
+        ))
+    )
+
+    ACCESS_CONTROL_API_CLIENT = api_clients.lazy(
+        lambda: api_clients.build(
+            access_control, ACCESS_CONTROL_API_URL, ACCESS_CONTROL_API_KEY,
+            **API_CLIENT_OPTIONS
         )
     )
-    ACCESS_CONTROL_API = access_control.api.AccessControlApi(
-        api_client=access_control.ApiClient(
-            header_name="X-API-KEY",
-            header_value=ACCESS_CONTROL_API_KEY,
-            configuration=config
+    ACCESS_CONTROL_API = api_clients.lazy(
+        lambda: access_control.api.AccessControlApi(
+            api_client=ACCESS_CONTROL_API_CLIENT
         )
     )
-    AC_OPERATIONAL_API = access_control.api.OperationalApi(
-        api_client=access_control.ApiClient(
-            header_name="X-API-KEY",
-            header_value=ACCESS_CONTROL_API_KEY,
-            configuration=config
+    AC_OPERATIONAL_API = api_clients.lazy(
+        lambda: access_control.api.OperationalApi(
+            api_client=ACCESS_CONTROL_API_CLIENT
         )
     )
 
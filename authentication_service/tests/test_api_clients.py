@@ -0,0 +1,220 @@
+import threading
+import time
+from unittest.mock import patch
+
+import access_control
+import urllib3
+from django.conf import settings
+from django.test import TestCase
+from prometheus_client import REGISTRY
+
+from authentication_service import api_clients
+from authentication_service.load_test import stubs
+
+
+class ApiClientsTestCase(TestCase):
+
+    def setUp(self):
+        super(ApiClientsTestCase, self).setUp()
+        self.server = stubs.access_control_server(latency=0.2)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def build(self, **kwargs):
+        options = {
+            "pool_size": 1, "connect_timeout": 1, "read_timeout": 1,
+            "retries": 0, "retry_backoff": 0, "keep_alive": True,
+            "breaker_threshold": 0, "breaker_reset_timeout": 0,
+            "breaker_endpoints": {}
+        }
+        options.update(kwargs)
+        return access_control.api.AccessControlApi(api_client=api_clients.build(
+            access_control, self.server.url, "key", **options
+        ))
+
+    def test_shared_client(self):
+        self.assertIs(
+            settings.ACCESS_CONTROL_API.api_client,
+            settings.AC_OPERATIONAL_API.api_client
+        )
+
+    def test_default_timeout(self):
+        api = self.build(read_timeout=0.05)
+        with self.assertRaises(urllib3.exceptions.MaxRetryError) as context:
+            api.site_list(client_id=1)
+        self.assertIsInstance(
+            context.exception.reason, urllib3.exceptions.ReadTimeoutError
+        )
+
+        # A timeout set on the request wins.
+        self.assertEqual(api.site_list(client_id=1, _request_timeout=(1, 1))[0].id, 1)
+
+    def test_retries(self):
+        # Read timeouts are not retried.
+        api = self.build(read_timeout=0.05, retries=2)
+        with self.assertRaises(urllib3.exceptions.MaxRetryError):
+            api.site_list(client_id=1)
+        self.assertEqual(self.server.requests["/sites"], 1)
+
+        # Failed connections are, unless the request set its own timeout.
+        api.api_client.configuration.host = "http://127.0.0.1:1/api/v1"
+        with patch.object(api_clients.JitterRetry, "sleep") as sleep:
+            with self.assertRaises(urllib3.exceptions.MaxRetryError):
+                api.site_list(client_id=1)
+            self.assertEqual(sleep.call_count, 2)
+            sleep.reset_mock()
+            with self.assertRaises(urllib3.exceptions.MaxRetryError):
+                api.site_list(client_id=1, _request_timeout=(1, 1))
+            sleep.assert_not_called()
+
+    def test_saturation(self):
+        def saturated():
+            return REGISTRY.get_sample_value(
+                "authentication_service_api_pool_saturated_total",
+                {"service": "access_control"}
+            ) or 0
+
+        api = self.build()
+        before = saturated()
+        threads = [
+            threading.Thread(target=api.site_list, kwargs={"client_id": 1})
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(saturated(), before + 1)
+        self.assertEqual(api.api_client.rest_client.pool_manager.in_flight, 0)
+
+    def test_lazy_thread_pool(self):
+        api = self.build()
+        pool = api.api_client.pool
+        self.assertIsInstance(pool, api_clients.LazyThreadPool)
+        self.assertIsNone(pool._pool)
+
+        thread = api.site_list(client_id=1, **{"async": True})
+        self.assertEqual(thread.get(timeout=5)[0].id, 1)
+        self.assertIsNotNone(pool._pool)
+
+    def test_lazy_builds_once(self):
+        barrier = threading.Barrier(4, timeout=5)
+        built = []
+
+        def factory():
+            built.append(object())
+            time.sleep(0.05)
+            return built[-1]
+
+        client = api_clients.lazy(factory)
+
+        def use():
+            barrier.wait()
+            hash(client)
+
+        threads = [threading.Thread(target=use) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(built), 1)
+
+    def test_backoff_jitter(self):
+        retry = api_clients.JitterRetry(total=5, backoff_factor=1)
+        for _ in range(3):
+            retry = retry.increment("GET", "/sites")
+        with patch("authentication_service.api_clients.random.uniform") as uniform:
+            uniform.side_effect = lambda low, high: high
+            self.assertEqual(retry.get_backoff_time(), 4)
+            uniform.assert_called_once_with(0, 4)
+
+
+class CircuitBreakerTestCase(TestCase):
+
+    def setUp(self):
+        super(CircuitBreakerTestCase, self).setUp()
+        self.server = stubs.access_control_server(latency=0.2)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def build(self, **kwargs):
+        options = {
+            "pool_size": 1, "connect_timeout": 1, "read_timeout": 0.05,
+            "retries": 0, "retry_backoff": 0, "keep_alive": True,
+            "breaker_threshold": 2, "breaker_reset_timeout": 60,
+            "breaker_endpoints": {}
+        }
+        options.update(kwargs)
+        return access_control.api.AccessControlApi(api_client=api_clients.build(
+            access_control, self.server.url, "key", **options
+        ))
+
+    def state(self, endpoint="GET /sites"):
+        return REGISTRY.get_sample_value(
+            "authentication_service_api_circuit_state",
+            {"service": "access_control", "endpoint": endpoint}
+        )
+
+    def fail(self, api, times):
+        for _ in range(times):
+            with self.assertRaises(urllib3.exceptions.MaxRetryError):
+                api.site_list(client_id=1)
+
+    def test_opens_after_threshold(self):
+        api = self.build()
+        self.fail(api, 2)
+        self.assertEqual(self.state(), api_clients.OPEN)
+
+        start = time.monotonic()
+        with self.assertRaises(access_control.rest.ApiException) as context:
+            api.site_list(client_id=1)
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertEqual(context.exception.status, 503)
+        self.assertEqual(self.server.requests["/sites"], 2)
+
+        # Other endpoints have their own circuit.
+        operational = access_control.api.OperationalApi(api_client=api.api_client)
+        roles = operational.get_user_site_role_labels_aggregated(
+            "1", 1, _request_timeout=(1, 1)
+        ).roles
+        self.assertEqual(roles, ["tech_admin"])
+
+    def test_client_errors_are_not_failures(self):
+        api = self.build(read_timeout=1)
+        for _ in range(3):
+            with self.assertRaises(access_control.rest.ApiException) as context:
+                api.domain_read(1)
+            self.assertEqual(context.exception.status, 404)
+        self.assertEqual(self.state("GET /domains/{domain_id}"), api_clients.CLOSED)
+
+    def test_half_open_probe(self):
+        api = self.build(breaker_reset_timeout=0.1)
+        self.fail(api, 2)
+        time.sleep(0.1)
+
+        # A failed probe opens the circuit again.
+        self.fail(api, 1)
+        self.assertEqual(self.state(), api_clients.OPEN)
+        with self.assertRaises(access_control.rest.ApiException):
+            api.site_list(client_id=1)
+        self.assertEqual(self.server.requests["/sites"], 3)
+
+        # A successful probe closes it.
+        time.sleep(0.1)
+        self.server.latency = 0
+        self.assertEqual(api.site_list(client_id=1)[0].id, 1)
+        self.assertEqual(self.state(), api_clients.CLOSED)
+
+    def test_single_probe(self):
+        circuit = api_clients.Circuit("access_control", "GET /test", 1, 0)
+        circuit.record_failure()
+        self.assertTrue(circuit.allow())
+        self.assertEqual(circuit.state, api_clients.HALF_OPEN)
+        self.assertFalse(circuit.allow())
+        circuit.record_success()
+        self.assertTrue(circuit.allow())
+
+    def test_endpoint_overrides(self):
+        api = self.build(breaker_endpoints={"GET /sites": {"failure_threshold": 1}})
+        self.fail(api, 1)
+        self.assertEqual(self.state(), api_clients.OPEN)
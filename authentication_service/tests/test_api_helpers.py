@@ -0,0 +1,145 @@
+from unittest.mock import MagicMock, patch
+
+import urllib3
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+
+from access_control.rest import ApiException as AccessControlApiException
+from authentication_service import api_helpers, cache
+
+
+class TTLCacheTestCase(TestCase):
+
+    def test_get_set(self):
+        ttl_cache = cache.TTLCache("test", 10)
+        self.assertIs(ttl_cache.get("a"), cache.MISSING)
+        ttl_cache.set("a", 1, 60)
+        self.assertEqual(ttl_cache.get("a"), 1)
+
+        # None is a valid value to cache.
+        ttl_cache.set("b", None, 60)
+        self.assertIsNone(ttl_cache.get("b"))
+
+    def test_no_ttl(self):
+        ttl_cache = cache.TTLCache("test", 10)
+        ttl_cache.set("a", 1, 60)
+        ttl_cache.set("a", 2, 0)
+        self.assertIs(ttl_cache.get("a"), cache.MISSING)
+
+    @patch("authentication_service.cache.time.monotonic")
+    def test_expiry(self, mocked_monotonic):
+        mocked_monotonic.return_value = 100
+        ttl_cache = cache.TTLCache("test", 10)
+        ttl_cache.set("a", 1, 60)
+        mocked_monotonic.return_value = 159
+        self.assertEqual(ttl_cache.get("a"), 1)
+        mocked_monotonic.return_value = 160
+        self.assertIs(ttl_cache.get("a"), cache.MISSING)
+        self.assertEqual(len(ttl_cache), 0)
+
+    def test_lru_eviction(self):
+        ttl_cache = cache.TTLCache("test", 2)
+        ttl_cache.set("a", 1, 60)
+        ttl_cache.set("b", 2, 60)
+        # Touch "a", which makes "b" the least recently used entry.
+        ttl_cache.get("a")
+        ttl_cache.set("c", 3, 60)
+        self.assertEqual(len(ttl_cache), 2)
+        self.assertIs(ttl_cache.get("b"), cache.MISSING)
+        self.assertEqual(ttl_cache.get("a"), 1)
+        self.assertEqual(ttl_cache.get("c"), 3)
+
+
+@override_settings(SITE_CACHE_TTL=60, SITE_CACHE_NEGATIVE_TTL=60)
+class SiteCacheTestCase(TestCase):
+
+    def setUp(self):
+        super(SiteCacheTestCase, self).setUp()
+        api_helpers.invalidate_site_cache()
+        self.addCleanup(api_helpers.invalidate_site_cache)
+
+    @override_settings(ACCESS_CONTROL_API=MagicMock())
+    def test_site_lookups_are_cached(self):
+        site_list = settings.ACCESS_CONTROL_API.site_list
+        site_list.return_value = [MagicMock(id=4, is_active=True)]
+
+        self.assertEqual(api_helpers.get_site_for_client(1), 4)
+        self.assertTrue(api_helpers.is_site_active(MagicMock(id=1)))
+        self.assertEqual(api_helpers.get_site_for_client(1), 4)
+        site_list.assert_called_once_with(client_id=1, _request_timeout=None)
+
+        # Invalidation forces a new lookup.
+        api_helpers.invalidate_site_cache(1)
+        self.assertEqual(api_helpers.get_site_for_client(1), 4)
+        self.assertEqual(site_list.call_count, 2)
+
+    @override_settings(ACCESS_CONTROL_API=MagicMock())
+    def test_unknown_clients_are_cached(self):
+        site_list = settings.ACCESS_CONTROL_API.site_list
+        site_list.return_value = []
+
+        with self.assertRaises(ImproperlyConfigured):
+            api_helpers.get_site_for_client(2)
+        with self.assertRaises(ImproperlyConfigured):
+            api_helpers.is_site_active(MagicMock(id=2))
+        site_list.assert_called_once_with(client_id=2, _request_timeout=None)
+
+    @override_settings(ACCESS_CONTROL_API=MagicMock())
+    def test_clients_with_several_sites(self):
+        site_list = settings.ACCESS_CONTROL_API.site_list
+        site_list.return_value = [
+            MagicMock(id=4, is_active=True), MagicMock(id=5, is_active=False)
+        ]
+
+        with self.assertLogs(api_helpers.LOGGER, "WARNING"):
+            with self.assertRaises(ImproperlyConfigured):
+                api_helpers.get_site_for_client(7)
+        self.assertTrue(api_helpers.is_site_active(MagicMock(id=7)))
+        site_list.assert_called_once_with(client_id=7, _request_timeout=None)
+
+    @override_settings(ACCESS_CONTROL_API=MagicMock())
+    def test_errors_are_not_cached(self):
+        site_list = settings.ACCESS_CONTROL_API.site_list
+        site_list.side_effect = AccessControlApiException(status=500)
+
+        self.assertFalse(api_helpers.is_site_active(MagicMock(id=3)))
+        self.assertFalse(api_helpers.is_site_active(MagicMock(id=3)))
+        self.assertEqual(site_list.call_count, 2)
+
+    @override_settings(ACCESS_CONTROL_API=MagicMock(), SITE_CACHE_TTL=0,
+                       SITE_FALLBACK_TTL=60)
+    def test_fallback_to_last_known_site(self):
+        site_list = settings.ACCESS_CONTROL_API.site_list
+        site_list.return_value = [MagicMock(id=4, is_active=False)]
+        self.assertFalse(api_helpers.is_site_active(MagicMock(id=5)))
+
+        site_list.side_effect = urllib3.exceptions.MaxRetryError(None, "/sites")
+        with self.assertLogs(api_helpers.LOGGER, "WARNING"):
+            self.assertEqual(api_helpers.get_site_for_client(5), 4)
+        self.assertFalse(api_helpers.is_site_active(MagicMock(id=5)))
+
+        # Open circuits fall back as well, other errors do not.
+        site_list.side_effect = AccessControlApiException(status=503)
+        self.assertEqual(api_helpers.get_site_for_client(5), 4)
+        site_list.side_effect = AccessControlApiException(status=403)
+        with self.assertRaises(AccessControlApiException):
+            api_helpers.get_site_for_client(5)
+
+    @override_settings(ACCESS_CONTROL_API=MagicMock(), SITE_CACHE_TTL=0,
+                       SITE_FALLBACK_TTL=0)
+    def test_fail_fast_without_fallback(self):
+        site_list = settings.ACCESS_CONTROL_API.site_list
+        site_list.return_value = [MagicMock(id=4, is_active=True)]
+        api_helpers.get_site_for_client(6)
+
+        site_list.side_effect = urllib3.exceptions.MaxRetryError(None, "/sites")
+        with self.assertRaises(urllib3.exceptions.MaxRetryError):
+            api_helpers.get_site_for_client(6)
+
+        # The site is treated as inactive rather than failing the request.
+        site_list.side_effect = urllib3.exceptions.MaxRetryError(
+            None, "/sites", urllib3.exceptions.ReadTimeoutError(None, "/sites", "Read timed out.")
+        )
+        with self.assertLogs(api_helpers.LOGGER, "ERROR"):
+            self.assertFalse(api_helpers.is_site_active(MagicMock(id=6)))
@@ -0,0 +1,54 @@
+import datetime
+from unittest.mock import patch
+
+from django.template import loader
+from django.test import TestCase
+from django.utils import translation
+
+from authentication_service import email_templates
+
+INVITATION = "authentication_service/email/invitation.html"
+
+
+class EmailTemplatesTestCase(TestCase):
+
+    def setUp(self):
+        super(EmailTemplatesTestCase, self).setUp()
+        email_templates.clear()
+        self.addCleanup(email_templates.clear)
+        self.context = {
+            "first_name": "first",
+            "last_name": "last",
+            "organisation": "organisation",
+            "url": "http://example.com/register?invitation=a&b",
+            "expires_at": datetime.datetime(2020, 1, 1),
+            "sender": {"first_name": "sender", "last_name": "last"},
+        }
+
+    def test_render_matches_loader(self):
+        for language in ["en", "fr", "sw"]:
+            with translation.override(language):
+                self.assertEqual(
+                    email_templates.render_to_string(INVITATION, self.context),
+                    loader.render_to_string(INVITATION, self.context)
+                )
+
+    def test_templates_are_cached(self):
+        with translation.override("en"):
+            template = email_templates.get_template(INVITATION).template
+        # The cached template is shared by all languages.
+        with translation.override("fr"):
+            self.assertIs(email_templates.get_template(INVITATION).template, template)
+
+        email_templates.clear()
+        self.assertIsNot(email_templates.get_template(INVITATION).template, template)
+
+    def test_warm(self):
+        with patch(
+            "authentication_service.email_templates.get_template",
+            side_effect=email_templates.get_template
+        ) as mocked_get_template:
+            email_templates.warm()
+        self.assertEqual(
+            mocked_get_template.call_count, len(email_templates.EMAIL_TEMPLATES)
+        )
@@ -0,0 +1,106 @@
+import datetime
+import threading
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from kinesis_conducer.producer_events import schemas
+
+from authentication_service import event_buffer
+
+
+class FakeSink(object):
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+        self.called = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, batch):
+        self.called.set()
+        self.release.wait(5)
+        if self.fail:
+            raise Exception("Sink unavailable")
+        self.batches.append([event["user_id"] for event in batch])
+
+
+class EventBufferTestCase(TestCase):
+
+    def test_flush_on_batch_size(self):
+        sink = FakeSink()
+        buffer = event_buffer.EventBuffer(
+            sink, maxsize=10, batch_size=2, flush_interval=10)
+        for user_id in range(3):
+            self.assertTrue(buffer.put(user_id=user_id))
+        # The last event is flushed once the interval passes.
+        self.assertFalse(buffer.flush(timeout=0.5))
+        self.assertEqual(sink.batches, [[0, 1]])
+
+    def test_flush_on_interval(self):
+        sink = FakeSink()
+        buffer = event_buffer.EventBuffer(
+            sink, maxsize=10, batch_size=100, flush_interval=0.05)
+        buffer.put(user_id=0)
+        buffer.put(user_id=1)
+        self.assertTrue(buffer.flush(timeout=5))
+        self.assertEqual(sink.batches, [[0, 1]])
+
+    def test_drop_when_full(self):
+        sink = FakeSink()
+        sink.release.clear()
+        buffer = event_buffer.EventBuffer(
+            sink, maxsize=1, batch_size=1, flush_interval=0)
+        buffer.put(user_id=0)
+        # Wait until the worker is busy with the first event, after which the
+        # queue has room for one more.
+        self.assertTrue(sink.called.wait(5))
+        self.assertTrue(buffer.put(user_id=1))
+        self.assertFalse(buffer.put(user_id=2))
+
+        sink.release.set()
+        self.assertTrue(buffer.flush(timeout=5))
+        self.assertEqual(sink.batches, [[0], [1]])
+
+    def test_sink_errors(self):
+        sink = FakeSink(fail=True)
+        buffer = event_buffer.EventBuffer(
+            sink, maxsize=10, batch_size=1, flush_interval=0)
+        buffer.put(user_id=0)
+        self.assertTrue(buffer.flush(timeout=5))
+
+        # The worker keeps going after a failure.
+        sink.fail = False
+        buffer.put(user_id=1)
+        self.assertTrue(buffer.flush(timeout=5))
+        self.assertEqual(sink.batches, [[1]])
+
+
+class LoginEventTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="event_user", password="password",
+            birth_date=datetime.date(2000, 1, 1)
+        )
+
+    @patch("authentication_service.signals.event_buffer.BUFFER.put")
+    def test_login_and_logout_events(self, mocked_put):
+        self.client.login(username="event_user", password="password")
+        mocked_put.assert_called_once_with(
+            event_type=schemas.EventTypes.USER_LOGIN,
+            site_id=settings.AUTHENTICATION_SERVICE_HARDCODED_SITE_ID,
+            user_id=str(self.user.id),
+        )
+
+        mocked_put.reset_mock()
+        self.client.logout()
+        mocked_put.assert_called_once_with(
+            event_type=schemas.EventTypes.USER_LOGOUT,
+            site_id=settings.AUTHENTICATION_SERVICE_HARDCODED_SITE_ID,
+            user_id=str(self.user.id),
+        )
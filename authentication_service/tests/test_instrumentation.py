@@ -0,0 +1,68 @@
+import access_control
+from django.contrib.auth import get_user_model, hashers
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from authentication_service import instrumentation
+from authentication_service.load_test import stubs
+
+
+class MeasureTestCase(TestCase):
+
+    def test_queries(self):
+        with instrumentation.measure() as budget:
+            get_user_model().objects.count()
+            get_user_model().objects.exists()
+            # Queries are counted without the debug cursor and its logging.
+            self.assertFalse(connection.queries_logged)
+        self.assertEqual(budget.queries, 2)
+        self.assertGreater(budget.query_seconds, 0)
+        self.assertIsNone(instrumentation.current())
+
+        # Queries outside a measurement are neither counted nor kept.
+        get_user_model().objects.count()
+        self.assertEqual(budget.queries, 2)
+
+    def test_hashing(self):
+        encoded = hashers.make_password("Qwer!234")
+        with instrumentation.measure() as budget:
+            self.assertTrue(hashers.check_password("Qwer!234", encoded))
+        # Verifying encodes the password again, which is not counted twice.
+        self.assertEqual(budget.calls["hashing"], 1)
+        self.assertGreater(budget.seconds["hashing"], 0)
+
+    def test_api_calls(self):
+        server = stubs.access_control_server()
+        server.start()
+        self.addCleanup(server.stop)
+        config = access_control.configuration.Configuration()
+        config.host = server.url
+        api = access_control.api.AccessControlApi(
+            api_client=access_control.ApiClient(configuration=config)
+        )
+        with instrumentation.measure() as budget:
+            api.site_list(client_id=1)
+            api.site_list(client_id=2)
+        self.assertEqual(budget.calls["api"], 2)
+        self.assertEqual(budget.calls["hashing"], 0)
+
+
+class MetricMiddlewareTestCase(TestCase):
+
+    def test_metrics_by_view(self):
+        def count():
+            return REGISTRY.get_sample_value(
+                "authentication_service_request_queries_count", {"view": "login"}
+            ) or 0
+
+        before = count()
+        self.client.get(reverse("login"))
+        self.assertEqual(count(), before + 1)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0.000001)
+    def test_slow_requests(self):
+        with self.assertLogs(instrumentation.LOGGER, "WARNING") as logs:
+            self.client.get(reverse("login"))
+        self.assertIn(f"Slow request GET {reverse('login')} (login)", logs.output[0])
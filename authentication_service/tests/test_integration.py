@@ -18,6 +18,7 @@ from django_otp.util import random_hex
 from access_control import Invitation
 from authentication_service import models
 from authentication_service.api import schemas
+from authentication_service.integration import Implementation
 from authentication_service.models import UserSite
 
 
@@ -671,6 +672,304 @@ class IntegrationTestCase(TestCase):
         )
         self.assertEqual(response.status_code, 400)
 
+    def test_user_bulk_read(self):
+        missing_id = str(uuid.uuid4())
+        response = self.client.post(
+            "/api/v1/user_bulk_read",
+            data=json.dumps({
+                "user_ids": [str(self.user_1.id), missing_id, str(self.user_3.id)]
+            }),
+            content_type="application/json",
+            **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(
+            set(result["users"].keys()), {str(self.user_1.id), str(self.user_3.id)})
+        self.assertEqual(result["missing_ids"], [missing_id])
+        user = result["users"][str(self.user_1.id)]
+        jsonschema.validate(user, schema=schemas.user)
+        self.assertEqual(user["organisation_id"], self.organisations[0].id)
+        self.assertEqual(
+            user, self.client.get(f"/api/v1/users/{self.user_1.id}", **self.headers).json())
+
+        # Users are read with a single query.
+        with self.assertNumQueries(1):
+            Implementation.user_bulk_read(None, {
+                "user_ids": [str(self.user_1.id), str(self.user_2.id)]
+            })
+
+        # Test without authorisation
+        response = self.client.post(
+            "/api/v1/user_bulk_read",
+            data=json.dumps({"user_ids": [str(self.user_1.id)]}),
+            content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 401)
+
+        # Test bad requests
+        for user_ids in [[], ["not-a-uuid"], [str(uuid.uuid4()) for _ in range(101)]]:
+            response = self.client.post(
+                "/api/v1/user_bulk_read",
+                data=json.dumps({"user_ids": user_ids}),
+                content_type="application/json",
+                **self.headers
+            )
+            self.assertEqual(response.status_code, 400)
+
+    @patch("authentication_service.tasks.delete_users_and_data_task.delay")
+    def test_user_deletion_job(self, mocked_delay):
+        # Jobs for a list of ids
+        user_ids = [str(self.user_2.id), str(self.user_3.id)]
+        response = self.client.post(
+            "/api/v1/user_deletion_jobs",
+            data=json.dumps({
+                "user_ids": user_ids,
+                "deleter_id": str(self.user_1.id),
+                "reason": "Clean up"
+            }),
+            content_type="application/json",
+            **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        job = response.json()
+        jsonschema.validate(job, schema=schemas.user_deletion_job)
+        self.assertEqual(job["status"], models.UserDeletionJob.STATUS_PENDING)
+        self.assertEqual(job["total"], 2)
+        self.assertEqual(job["processed"], 0)
+        mocked_delay.assert_called_once_with(uuid.UUID(job["id"]))
+        self.assertEqual(
+            [str(user_id) for user_id in
+             models.UserDeletionJob.objects.get(id=job["id"]).user_ids],
+            user_ids
+        )
+        self.assertEqual(
+            self.client.get(
+                f"/api/v1/user_deletion_jobs/{job['id']}", **self.headers).json(),
+            job
+        )
+
+        # Jobs for a filter select the matching users when they are created
+        response = self.client.post(
+            "/api/v1/user_deletion_jobs",
+            data=json.dumps({
+                "filter": {"username": "test_user", "email_verified": False},
+                "deleter_id": str(self.user_1.id),
+                "reason": "Clean up"
+            }),
+            content_type="application/json",
+            **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        job = models.UserDeletionJob.objects.get(id=response.json()["id"])
+        self.assertEqual(
+            set(job.user_ids), {self.user_1.id, self.user_2.id, self.user_3.id}
+        )
+
+        # Test bad requests
+        job_count = models.UserDeletionJob.objects.count()
+        for body in [
+            {"reason": "No users"},
+            {"user_ids": user_ids, "filter": {"username": "test_user"}},
+            {"filter": {}},
+            {"filter": {"unknown": "field"}},
+            {"filter": {"search_mode": "prefix"}},
+            {"user_ids": ["not-a-uuid"]},
+        ]:
+            body.setdefault("deleter_id", str(self.user_1.id))
+            body.setdefault("reason", "Clean up")
+            response = self.client.post(
+                "/api/v1/user_deletion_jobs",
+                data=json.dumps(body),
+                content_type="application/json",
+                **self.headers
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(models.UserDeletionJob.objects.count(), job_count)
+
+        # Selections of more than USER_DELETION_MAX_USERS users are rejected
+        with override_settings(USER_DELETION_MAX_USERS=2):
+            for body, message in [
+                ({"filter": {"username": "test_user", "email_verified": False}},
+                 "The filter matches 3 users"),
+                ({"user_ids": [str(self.user_1.id), str(self.user_2.id), str(self.user_3.id)]},
+                 "At most 2 users"),
+            ]:
+                body.update(deleter_id=str(self.user_1.id), reason="Clean up")
+                response = self.client.post(
+                    "/api/v1/user_deletion_jobs",
+                    data=json.dumps(body),
+                    content_type="application/json",
+                    **self.headers
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(message, response.content.decode("utf-8"))
+        self.assertEqual(models.UserDeletionJob.objects.count(), job_count)
+
+        # Unknown deleters and jobs
+        response = self.client.post(
+            "/api/v1/user_deletion_jobs",
+            data=json.dumps({
+                "user_ids": user_ids,
+                "deleter_id": str(uuid.uuid4()),
+                "reason": "Clean up"
+            }),
+            content_type="application/json",
+            **self.headers
+        )
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            f"/api/v1/user_deletion_jobs/{uuid.uuid4()}", **self.headers)
+        self.assertEqual(response.status_code, 404)
+
+        # Test without authorisation
+        response = self.client.get(f"/api/v1/user_deletion_jobs/{job.id}")
+        self.assertEqual(response.status_code, 401)
+
+    def test_query_counts(self):
+        # Related objects are serialised from their ids, which means the
+        # number of queries does not depend on the number of results.
+        country = models.Country.objects.first()
+        get_user_model().objects.update(
+            country=country, organisation=self.organisations[1],
+            avatar="avatar.png"
+        )
+        user_ids = [str(user.id) for user in get_user_model().objects.all()]
+
+        for method, kwargs in [
+            (Implementation.client_list, {}),
+            (Implementation.client_read, {"client_id": self.client_1.id}),
+            (Implementation.country_list, {}),
+            (Implementation.country_read, {"country_code": country.code}),
+            (Implementation.organisation_list, {}),
+            (Implementation.organisation_read,
+             {"organisation_id": self.organisations[1].id}),
+            (Implementation.user_list, {}),
+            (Implementation.user_list, {"count": "none"}),
+            (Implementation.user_list, {"cursor": ""}),
+            (Implementation.user_read, {"user_id": self.user_1.id}),
+            (Implementation.user_bulk_read, {"body": {"user_ids": user_ids}}),
+        ]:
+            with self.assertNumQueries(1):
+                method(None, **kwargs)
+
+        user = Implementation.user_read(None, self.user_1.id)
+        self.assertEqual(user["country"], country.code)
+        self.assertEqual(user["organisation_id"], self.organisations[1].id)
+        self.assertTrue(user["avatar"].endswith("avatar.png"))
+
+    def test_user_list_search_mode(self):
+        def search(query):
+            response = self.client.get(
+                f"/api/v1/users?{query}", **self.headers)
+            self.assertEqual(response.status_code, 200)
+            return [user["username"] for user in response.json()]
+
+        self.assertEqual(search("q=firstname&search_mode=token"), ["test_user_1"])
+        self.assertEqual(search("q=first&search_mode=token"), [])
+        self.assertEqual(search("q=first&search_mode=prefix"), ["test_user_1"])
+        self.assertEqual(search("q=irstnam&search_mode=inner"), ["test_user_1"])
+        self.assertEqual(search("q=irstnam&search_mode=prefix"), [])
+
+        # All words need to match, in any order.
+        self.assertEqual(
+            search("q=lastname+firstname&search_mode=token"), ["test_user_1"])
+        self.assertEqual(search("q=lastname+nobody&search_mode=token"), [])
+
+        # Results are ordered by relevance, unless an ordering is specified.
+        # The third user matches on both the username and email address.
+        self.assertEqual(search("q=test&search_mode=prefix")[0], "test_user_3")
+        self.assertEqual(
+            search("q=test&search_mode=prefix&order_by=username"),
+            ["test_user_1", "test_user_2", "test_user_3"]
+        )
+
+        # The search vector is kept up to date.
+        self.user_2.first_name = "Zebra"
+        self.user_2.save(update_fields=["first_name"])
+        self.assertEqual(search("q=zeb&search_mode=prefix"), ["test_user_2"])
+
+        response = self.client.get(
+            "/api/v1/users?q=test&search_mode=fuzzy", **self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_list_count(self):
+        total = get_user_model().objects.count()
+        for url in [
+            "/api/v1/users", "/api/v1/clients", "/api/v1/countries",
+            "/api/v1/organisations"
+        ]:
+            response = self.client.get(f"{url}?count=exact", **self.headers)
+            self.assertIn("X-Total-Count", response)
+
+            response = self.client.get(f"{url}?count=none", **self.headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("X-Total-Count", response)
+
+            response = self.client.get(f"{url}?count=estimate", **self.headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("X-Total-Count", response)
+
+            response = self.client.get(f"{url}?count=all", **self.headers)
+            self.assertEqual(response.status_code, 400)
+
+        # The last page gives the exact total without counting.
+        response = self.client.get(
+            "/api/v1/users?count=estimate&offset=1", **self.headers)
+        self.assertEqual(int(response["X-Total-Count"]), total)
+
+        # Estimates are never less than the number of users seen.
+        response = self.client.get(
+            "/api/v1/users?count=estimate&limit=1&offset=1", **self.headers)
+        self.assertGreaterEqual(int(response["X-Total-Count"]), 2)
+        response = self.client.get(
+            "/api/v1/users?count=estimate&limit=1&q=test_user", **self.headers)
+        self.assertGreaterEqual(int(response["X-Total-Count"]), 1)
+
+    def test_user_list_cursor(self):
+        users = get_user_model().objects.all()
+        for order_by, ordering in [
+            ("", ["id"]),
+            ("-date_joined", ["-date_joined", "id"]),
+            # No user has logged in, so the pages are ordered on the
+            # tie breaker alone.
+            ("last_login,-username", ["last_login", "-username", "id"]),
+        ]:
+            expected = [str(user.id) for user in users.order_by(*ordering)]
+            url = f"/api/v1/users?limit=2&order_by={order_by}" if order_by \
+                else "/api/v1/users?limit=2"
+            cursor = ""
+            ids = []
+            while cursor is not None:
+                response = self.client.get(
+                    f"{url}&cursor={cursor}", **self.headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn("X-Total-Count", response)
+                ids.extend(user["id"] for user in response.json())
+                cursor = response.get("X-Next-Cursor")
+            self.assertEqual(ids, expected)
+
+    def test_user_list_cursor_errors(self):
+        response = self.client.get(
+            "/api/v1/users?cursor=invalid", **self.headers)
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(
+            "/api/v1/users?cursor=&offset=1", **self.headers)
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(
+            "/api/v1/users?cursor=&order_by=first_name", **self.headers)
+        self.assertEqual(response.status_code, 400)
+
+        # A cursor is only valid for the ordering it was created with.
+        response = self.client.get(
+            "/api/v1/users?cursor=&limit=1", **self.headers)
+        cursor = response["X-Next-Cursor"]
+        response = self.client.get(
+            f"/api/v1/users?cursor={cursor}&order_by=username", **self.headers)
+        self.assertEqual(response.status_code, 400)
+
     @override_settings(ACCESS_CONTROL_API=MagicMock(invitation_read=MagicMock()))
     @patch("authentication_service.tasks.send_invitation_email.delay", MagicMock())
     def test_invitation_send(self):
@@ -0,0 +1,65 @@
+import io
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from oidc_provider.models import Client
+
+from authentication_service.load_test import flow
+
+
+class OIDCFlowTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super(OIDCFlowTestCase, cls).setUpTestData()
+        call_command("demo_content", no_api_calls=True, verbosity=0)
+        cls.client_1 = Client.objects.get(client_id="client_id_1")
+
+    def test_flow(self):
+        with flow.stubbed_apis() as (access_control, user_data_store):
+            results = flow.run(self.client_1, threads=1, iterations=2)
+            self.assertEqual(
+                settings.AC_OPERATIONAL_API.api_client.configuration.host,
+                access_control.url
+            )
+        self.assertNotEqual(
+            settings.ACCESS_CONTROL_API.api_client.configuration.host,
+            access_control.url
+        )
+
+        [result] = results
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.flows, 2)
+        self.assertEqual(
+            [sample.step for sample in result.samples], flow.STEPS * 2
+        )
+        # The Site is cached, the roles and site data are looked up per flow.
+        self.assertEqual(access_control.requests["/sites"], 1)
+        self.assertEqual(
+            access_control.requests["/ops/user_site_role_labels_aggregated/{id}/{id}"], 2
+        )
+        self.assertEqual(user_data_store.requests["/usersitedata/{id}/{id}"], 2)
+
+    def test_reused_consent(self):
+        with flow.stubbed_apis():
+            [result] = flow.run(self.client_1, threads=1, iterations=2, consent=False)
+        self.assertEqual(result.errors, [])
+        steps = [sample.step for sample in result.samples]
+        self.assertEqual(steps.count("consent"), 1)
+
+    def test_failed_flows(self):
+        with flow.stubbed_apis(), patch.object(
+                flow.OIDCFlow, "run", side_effect=[{}, Exception("failed")]):
+            [result] = flow.run(self.client_1, threads=1, iterations=2)
+        self.assertEqual(result.flows, 1)
+        self.assertEqual(len(result.errors), 1)
+
+        with patch.object(flow.OIDCFlow, "run", side_effect=Exception("failed")):
+            with self.assertRaisesMessage(CommandError, "1 flows failed"):
+                call_command(
+                    "load_test_oidc_flow", threads=1, iterations=1,
+                    skip_setup=True, stdout=io.StringIO()
+                )
@@ -0,0 +1,232 @@
+import asyncore
+import smtpd
+import smtplib
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.mail.backends.smtp import EmailBackend
+from django.test import TestCase
+
+from authentication_service import mail_dispatch
+
+
+class LocalSMTPServer(smtpd.SMTPServer):
+    """
+    A local SMTP server standing in for the mail relay. It counts the
+    connections made and rejects messages for the recipients in `fail` with
+    `reply`.
+    """
+
+    def __init__(self, fail=None, fail_once=True, reply="451 Try again later"):
+        self._map = {}
+        super(LocalSMTPServer, self).__init__(
+            ("127.0.0.1", 0), None, map=self._map, decode_data=True
+        )
+        self.port = self.socket.getsockname()[1]
+        self.fail = set(fail or [])
+        self.fail_once = fail_once
+        self.reply = reply
+        self.connections = 0
+        self.sockets = []
+        self.recipients = []
+        self._thread = threading.Thread(
+            target=asyncore.loop,
+            kwargs={"timeout": 0.05, "map": self._map}, daemon=True
+        )
+
+    def handle_accepted(self, conn, addr):
+        self.connections += 1
+        self.sockets.append(conn)
+        super(LocalSMTPServer, self).handle_accepted(conn, addr)
+
+    def drop_connections(self):
+        # As the relay does with connections that have been idle too long.
+        for conn in self.sockets:
+            conn.shutdown(socket.SHUT_RDWR)
+        self.sockets = []
+
+    def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+        failing = self.fail.intersection(rcpttos)
+        if failing:
+            if self.fail_once:
+                self.fail.difference_update(failing)
+            return self.reply
+        self.recipients.extend(rcpttos)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.close()
+        asyncore.close_all(map=self._map)
+        self._thread.join(5)
+
+
+class MailDispatcherTestCase(TestCase):
+
+    def setUp(self):
+        super(MailDispatcherTestCase, self).setUp()
+        self.server = LocalSMTPServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def dispatcher(self, **kwargs):
+        options = {
+            "batch_size": 10,
+            "batch_window": 0.2,
+            "max_attempts": 3,
+            "idle_timeout": 0.5,
+            "send_timeout": 10,
+        }
+        options.update(kwargs)
+        return mail_dispatch.MailDispatcher(
+            backend="django.core.mail.backends.smtp.EmailBackend",
+            host="127.0.0.1", port=self.server.port, username="",
+            password="", use_tls=False, use_ssl=False, timeout=5,
+            **options
+        )
+
+    def send_concurrently(self, dispatcher, recipients):
+        with ThreadPoolExecutor(len(recipients)) as executor:
+            futures = [
+                executor.submit(
+                    dispatcher.send,
+                    EmailMessage("Subject", "Body", "from@example.com", [to])
+                ) for to in recipients
+            ]
+        return [future.result() for future in futures]
+
+    def test_messages_share_a_connection(self):
+        dispatcher = self.dispatcher()
+        recipients = ["user%s@example.com" % i for i in range(5)]
+        self.assertEqual(
+            self.send_concurrently(dispatcher, recipients), [1] * 5
+        )
+        self.assertEqual(sorted(self.server.recipients), recipients)
+        self.assertEqual(self.server.connections, 1)
+
+        # The connection stays open for messages sent later.
+        dispatcher.send(
+            EmailMessage("Subject", "Body", "from@example.com",
+                         ["later@example.com"])
+        )
+        self.assertEqual(self.server.connections, 1)
+
+    def test_only_failed_messages_are_retried(self):
+        self.server.fail = {"fail@example.com"}
+        dispatcher = self.dispatcher()
+        recipients = [
+            "user0@example.com", "fail@example.com", "user1@example.com"
+        ]
+        self.assertEqual(
+            self.send_concurrently(dispatcher, recipients), [1] * 3
+        )
+        # Every message arrives once and the failed one is sent over a fresh
+        # connection.
+        self.assertEqual(sorted(self.server.recipients), sorted(recipients))
+        self.assertEqual(self.server.connections, 2)
+
+    def test_error_after_max_attempts(self):
+        self.server.fail = {"fail@example.com"}
+        self.server.fail_once = False
+        dispatcher = self.dispatcher(max_attempts=2)
+        with self.assertRaises(smtplib.SMTPDataError):
+            dispatcher.send(
+                EmailMessage("Subject", "Body", "from@example.com",
+                             ["fail@example.com"])
+            )
+        self.assertEqual(self.server.connections, 2)
+
+        # The dispatcher keeps sending other messages.
+        dispatcher.send(
+            EmailMessage("Subject", "Body", "from@example.com",
+                         ["user@example.com"])
+        )
+        self.assertEqual(self.server.recipients, ["user@example.com"])
+
+    def test_permanent_errors_are_not_retried(self):
+        self.server.fail = {"fail@example.com"}
+        self.server.reply = "550 Mailbox unavailable"
+        dispatcher = self.dispatcher()
+        with self.assertRaises(smtplib.SMTPDataError):
+            dispatcher.send(
+                EmailMessage("Subject", "Body", "from@example.com",
+                             ["fail@example.com"])
+            )
+        self.assertEqual(self.server.connections, 1)
+
+    def test_dropped_idle_connection_is_replaced(self):
+        dispatcher = self.dispatcher(idle_timeout=10)
+        for to in ["user0@example.com", "user1@example.com"]:
+            self.assertEqual(dispatcher.send(
+                EmailMessage("Subject", "Body", "from@example.com", [to])
+            ), 1)
+            self.server.drop_connections()
+            time.sleep(0.1)
+        self.assertEqual(
+            self.server.recipients, ["user0@example.com", "user1@example.com"]
+        )
+        self.assertEqual(self.server.connections, 2)
+
+    def test_sent_keys_are_not_sent_again(self):
+        dispatcher = self.dispatcher()
+        for expected in [1, 0]:
+            self.assertEqual(dispatcher.send(
+                EmailMessage("Subject", "Body", "from@example.com",
+                             ["user@example.com"]),
+                key="task-id"
+            ), expected)
+        self.assertEqual(self.server.recipients, ["user@example.com"])
+
+        # Without a key the Message-ID is used, which stays the same when the
+        # message is sent again.
+        message = EmailMessage("Subject", "Body", "from@example.com",
+                               ["other@example.com"])
+        self.assertEqual(dispatcher.send(message), 1)
+        self.assertEqual(dispatcher.send(message), 0)
+        self.assertEqual(
+            self.server.recipients, ["user@example.com", "other@example.com"]
+        )
+
+    def test_dropped_connection_is_not_retried(self):
+        dispatcher = self.dispatcher()
+        with patch.object(
+                EmailBackend, "send_messages",
+                side_effect=smtplib.SMTPServerDisconnected("Connection lost")
+        ) as mocked_send_messages:
+            with self.assertRaises(smtplib.SMTPServerDisconnected):
+                dispatcher.send(
+                    EmailMessage("Subject", "Body", "from@example.com",
+                                 ["user@example.com"])
+                )
+        mocked_send_messages.assert_called_once()
+
+    def test_timed_out_message_is_dropped(self):
+        dispatcher = self.dispatcher(batch_window=0.5, send_timeout=0.1)
+        with self.assertRaises(TimeoutError):
+            dispatcher.send(
+                EmailMessage("Subject", "Body", "from@example.com",
+                             ["user@example.com"])
+            )
+        time.sleep(0.6)
+        self.assertEqual(self.server.recipients, [])
+
+    def test_default_backend(self):
+        dispatcher = mail_dispatch.MailDispatcher(
+            batch_size=10, batch_window=0, max_attempts=1, idle_timeout=0.5,
+            send_timeout=10
+        )
+        dispatcher.send(
+            EmailMessage("Subject", "Body", "from@example.com",
+                         ["user@example.com"])
+        )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["user@example.com"])
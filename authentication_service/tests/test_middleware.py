@@ -3,13 +3,14 @@ from unittest.mock import MagicMock, patch
 
 from django.contrib.auth import get_user_model
 from django.core.urlresolvers import reverse
-from django.test import TestCase, override_settings
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import translation
 from django.utils.translation import activate
 from django.utils.translation import LANGUAGE_SESSION_KEY
 
 from oidc_provider.models import Client
 
-from authentication_service import constants, exceptions
+from authentication_service import constants, exceptions, middleware
 
 
 class TestSessionMiddleware(TestCase):
@@ -561,3 +562,86 @@ class TestLanguageUpdateMiddleware(TestCase):
             self.client.session[LANGUAGE_SESSION_KEY],
             "prs"
         )
+
+
+class TestAuthorizeClient(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super(TestAuthorizeClient, cls).setUpTestData()
+        cls.oidc_client = Client.objects.create(
+            name="cached_client",
+            client_id="cached_client_id",
+            client_secret="super_client_secret_cached",
+            response_type="code",
+            jwt_alg="HS256",
+            redirect_uris=["http://example.com/"]
+        )
+
+    def setUp(self):
+        middleware.invalidate_client_cache()
+        self.addCleanup(middleware.invalidate_client_cache)
+
+    def authorize_request(self, **params):
+        query = {
+            "client_id": "cached_client_id",
+            "redirect_uri": "http://example.com/",
+            "response_type": "code",
+            "scope": "openid",
+        }
+        query.update(params)
+        return RequestFactory().get(reverse("oidc_provider:authorize"), query)
+
+    def test_validation_errors(self):
+        response = middleware.authorize_client(
+            self.authorize_request(client_id="unknown"))
+        self.assertEqual(response.status_code, 500)
+
+        response = middleware.authorize_client(
+            self.authorize_request(redirect_uri="http://evil.com/"))
+        self.assertEqual(response.status_code, 500)
+
+    def test_memoised_per_request(self):
+        request = self.authorize_request()
+        with self.assertNumQueries(1):
+            authorize = middleware.authorize_client(request)
+            self.assertIs(middleware.authorize_client(request), authorize)
+        self.assertEqual(authorize.client.name, "cached_client")
+
+    @override_settings(CLIENT_CACHE_TTL=60)
+    def test_cached_across_requests(self):
+        with self.assertNumQueries(1):
+            middleware.authorize_client(self.authorize_request())
+            authorize = middleware.authorize_client(self.authorize_request())
+        self.assertEqual(authorize.client.name, "cached_client")
+
+        # Changes to the client are picked up.
+        self.oidc_client.name = "renamed_client"
+        self.oidc_client.save()
+        with self.assertNumQueries(1):
+            authorize = middleware.authorize_client(self.authorize_request())
+        self.assertEqual(authorize.client.name, "renamed_client")
+
+        self.oidc_client.delete()
+        response = middleware.authorize_client(self.authorize_request())
+        self.assertEqual(response.status_code, 500)
+
+
+class TestWhitelistPaths(TestCase):
+
+    def test_whitelisted_path(self):
+        with translation.override("en"):
+            self.assertTrue(middleware.is_whitelisted_path("/en/registration/"))
+            self.assertTrue(middleware.is_whitelisted_path("/en/registration"))
+            self.assertFalse(middleware.is_whitelisted_path("/fr/registration/"))
+            self.assertFalse(middleware.is_whitelisted_path("/en/login/"))
+        with translation.override("fr"):
+            self.assertTrue(middleware.is_whitelisted_path("/fr/registration/"))
+            self.assertFalse(middleware.is_whitelisted_path("/en/registration/"))
+
+    def test_authorize_path(self):
+        self.assertTrue(middleware.is_authorize_path(
+            reverse("oidc_provider:authorize")))
+        self.assertTrue(middleware.is_authorize_path(
+            reverse("oidc_provider:authorize").rstrip("/")))
+        self.assertFalse(middleware.is_authorize_path(reverse("login")))
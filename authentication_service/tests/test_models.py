@@ -1,7 +1,7 @@
 import uuid
 import datetime
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.conf import settings
 from django.contrib.auth import get_user_model, hashers
 from django.core.exceptions import ValidationError
@@ -58,6 +58,27 @@ class TestRegistrationModels(TestCase):
 
         self.assertIsNotNone(self.user.has_security_questions)
 
+    @override_settings(SECURITY_ANSWER_ITERATIONS=1000)
+    def test_answer_hashing_policy(self):
+        answer = UserSecurityQuestion.objects.create(
+            user=self.user,
+            answer="Some_text",
+            language_code="en",
+            question=self.question_one
+        )
+        self.assertTrue(answer.answer.startswith("pbkdf2_sha256$1000$"))
+
+        # Answers hashed under another policy are rehashed once they are
+        # answered correctly.
+        with override_settings(SECURITY_ANSWER_ITERATIONS=2000):
+            self.assertFalse(answer.check_answer("wrong"))
+            self.assertTrue(answer.answer.startswith("pbkdf2_sha256$1000$"))
+
+            self.assertTrue(answer.check_answer(" SOME_text "))
+            answer.refresh_from_db()
+            self.assertTrue(answer.answer.startswith("pbkdf2_sha256$2000$"))
+            self.assertTrue(answer.check_answer("some_text"))
+
 
 class UserModelTestCase(TestCase):
 
@@ -0,0 +1,165 @@
+import datetime
+import threading
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from oidc_provider.models import Client
+
+from access_control.rest import ApiException as AccessControlApiException
+from authentication_service import oidc_provider_settings
+
+
+@override_settings(CLAIMS_CACHE_TTL=60)
+class ClaimsCacheTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super(ClaimsCacheTestCase, cls).setUpTestData()
+        cls.user = get_user_model().objects.create_user(
+            username="claimsuser", password="Qwer!234", first_name="Claims",
+            last_name="User", birth_date=datetime.date(2000, 1, 1)
+        )
+        cls.client_1 = Client.objects.create(
+            client_id="claims_client", name="Claims Client",
+            client_secret="secret", response_type="code",
+            redirect_uris=["http://example.com/"]
+        )
+
+    def setUp(self):
+        super(ClaimsCacheTestCase, self).setUp()
+        self.user.refresh_from_db()
+        oidc_provider_settings.invalidate_claims_cache()
+        self.addCleanup(oidc_provider_settings.invalidate_claims_cache)
+        patcher = patch.multiple(
+            "authentication_service.oidc_provider_settings.api_helpers",
+            get_site_for_client=MagicMock(return_value=1),
+            get_user_site_data=MagicMock(),
+            get_user_site_roles=MagicMock(return_value=["admin"]),
+        )
+        self.api_helpers = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.api_helpers["get_user_site_data"].return_value.to_dict.return_value = {
+            "data": {"foo": "bar"}
+        }
+
+    def claims(self, scopes):
+        token = MagicMock(user=self.user, client=self.client_1, scope=scopes)
+        return oidc_provider_settings.CustomScopeClaims(token).create_response_dic()
+
+    def test_claims_are_cached(self):
+        claims = self.claims(["openid", "site", "roles"])
+        self.assertEqual(claims["site"]["data"], {"foo": "bar"})
+        self.assertEqual(claims["roles"], ["admin"])
+        self.assertEqual(self.claims(["roles", "site", "openid"]), claims)
+        self.api_helpers["get_user_site_data"].assert_called_once()
+        self.api_helpers["get_user_site_roles"].assert_called_once()
+
+        # Other scopes are cached separately.
+        self.claims(["openid", "roles"])
+        self.assertEqual(
+            self.api_helpers["get_user_site_roles"].call_count, 2
+        )
+
+    def test_user_changes_invalidate(self):
+        self.claims(["openid", "roles"])
+        # Saves made elsewhere are picked up, as the key includes updated_at.
+        get_user_model().objects.get(id=self.user.id).save()
+        self.user.refresh_from_db()
+        self.claims(["openid", "roles"])
+        self.assertEqual(
+            self.api_helpers["get_user_site_roles"].call_count, 2
+        )
+
+        # Logins only update last_login, which does not invalidate.
+        self.user.save(update_fields=["last_login"])
+        self.claims(["openid", "roles"])
+        self.assertEqual(
+            self.api_helpers["get_user_site_roles"].call_count, 2
+        )
+
+    def test_userinfo(self):
+        claims = oidc_provider_settings.userinfo(
+            {"given_name": None, "nickname": None}, self.user
+        )
+        self.assertEqual(claims, {"given_name": "Claims", "nickname": "claimsuser"})
+
+        # The cached userinfo follows changes to the user.
+        get_user_model().objects.filter(id=self.user.id).update(first_name="Other")
+        self.user.refresh_from_db()
+        self.user.save()
+        claims = oidc_provider_settings.userinfo({"given_name": None}, self.user)
+        self.assertEqual(claims, {"given_name": "Other"})
+
+    def test_lookups_run_concurrently(self):
+        # Each lookup only returns once the other one started.
+        barrier = threading.Barrier(2, timeout=5)
+
+        def site_data(*args, **kwargs):
+            barrier.wait()
+            return self.api_helpers["get_user_site_data"].return_value
+
+        def roles(*args, **kwargs):
+            barrier.wait()
+            return ["admin"]
+
+        self.api_helpers["get_user_site_data"].side_effect = site_data
+        self.api_helpers["get_user_site_roles"].side_effect = roles
+        claims = self.claims(["openid", "site", "roles"])
+        self.assertEqual(claims["site"]["data"], {"foo": "bar"})
+        self.assertEqual(claims["roles"], ["admin"])
+        # The Site is resolved once for both lookups.
+        self.api_helpers["get_site_for_client"].assert_called_once_with(
+            self.client_1.id, timeout=5
+        )
+        self.api_helpers["get_user_site_roles"].assert_called_once_with(
+            self.user.id, 1, timeout=5
+        )
+
+    @override_settings(CLAIMS_API_TIMEOUT=0.05)
+    def test_lookup_timeouts(self):
+        event = threading.Event()
+        self.addCleanup(event.set)
+        self.api_helpers["get_user_site_roles"].side_effect = lambda *args, **kwargs: event.wait(5)
+
+        with self.assertLogs(oidc_provider_settings.LOGGER, "WARNING") as logs:
+            claims = self.claims(["openid", "site", "roles"])
+        self.assertEqual(claims["site"]["data"], {"foo": "bar"})
+        self.assertNotIn("roles", claims)
+        self.assertIn("Omitting the roles claims", logs.output[0])
+
+        # Incomplete claims are not cached.
+        event.set()
+        self.api_helpers["get_user_site_roles"].side_effect = None
+        self.assertEqual(self.claims(["openid", "site", "roles"])["roles"], ["admin"])
+
+    def test_lookup_errors(self):
+        self.api_helpers["get_user_site_roles"].side_effect = AccessControlApiException(status=403)
+        with self.assertRaises(AccessControlApiException):
+            self.claims(["openid", "roles"])
+
+    def test_unavailable_apis(self):
+        # Server errors and open circuits omit the claims, like timeouts.
+        self.api_helpers["get_user_site_roles"].side_effect = AccessControlApiException(status=503)
+        with self.assertLogs(oidc_provider_settings.LOGGER, "WARNING"):
+            claims = self.claims(["openid", "site", "roles"])
+        self.assertEqual(claims["site"]["data"], {"foo": "bar"})
+        self.assertNotIn("roles", claims)
+
+        # Incomplete claims are not cached.
+        self.api_helpers["get_user_site_roles"].side_effect = None
+        self.assertEqual(self.claims(["openid", "site", "roles"])["roles"], ["admin"])
+
+    def test_unavailable_site(self):
+        self.api_helpers["get_site_for_client"].side_effect = AccessControlApiException(status=503)
+        with self.assertLogs(oidc_provider_settings.LOGGER, "WARNING") as logs:
+            claims = self.claims(["openid", "site", "roles"])
+        self.assertNotIn("site", claims)
+        self.assertNotIn("roles", claims)
+        self.assertEqual(len(logs.output), 2)
+        self.api_helpers["get_user_site_data"].assert_not_called()
+        self.api_helpers["get_user_site_roles"].assert_not_called()
+
+        # Incomplete claims are not cached.
+        self.api_helpers["get_site_for_client"].side_effect = None
+        self.assertEqual(self.claims(["openid", "site", "roles"])["roles"], ["admin"])
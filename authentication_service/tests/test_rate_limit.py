@@ -0,0 +1,228 @@
+import datetime
+import io
+import threading
+import uuid
+from unittest.mock import patch
+
+from defender.models import AccessAttempt
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management import call_command
+from django.http import HttpResponse, HttpResponseRedirect
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from authentication_service import constants, rate_limit, utils
+
+
+class SlidingWindowLimiterTestCase(TestCase):
+
+    def setUp(self):
+        super(SlidingWindowLimiterTestCase, self).setUp()
+        self.limiter = rate_limit.SlidingWindowLimiter(
+            rate_limit.LocalWindowStore(), window=100,
+            limits={"username": 2, "ip": 3, "client": 0}, prefix="test"
+        )
+        patcher = patch("authentication_service.rate_limit.time.time", return_value=1000)
+        self.time = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_limits(self):
+        self.assertEqual(self.limiter.record_failure(username="User", ip="1.1.1.1"), [])
+        self.assertEqual(self.limiter.record_failure(username="user", ip="1.1.1.1"), [])
+        # Usernames are not case sensitive.
+        self.assertEqual(
+            self.limiter.record_failure(username="USER", ip="1.1.1.1"), ["username"]
+        )
+        self.assertEqual(self.limiter.blocked(username="user"), ["username"])
+        self.assertEqual(self.limiter.blocked(username="other", ip="1.1.1.1"), [])
+        self.assertEqual(
+            self.limiter.record_failure(username="other", ip="1.1.1.1"), ["ip"]
+        )
+
+        # Scopes without a limit are never blocked.
+        for _ in range(5):
+            self.assertEqual(self.limiter.record_failure(client="1"), [])
+
+        self.limiter.reset(username="user")
+        self.assertEqual(self.limiter.blocked(username="user"), [])
+        self.assertEqual(self.limiter.blocked(ip="1.1.1.1"), ["ip"])
+
+    def test_sliding_window(self):
+        for _ in range(3):
+            self.limiter.record_failure(username="user")
+        self.assertEqual(self.limiter.blocked(username="user"), ["username"])
+
+        # Halfway into the next window half of the previous failures count.
+        self.time.return_value = 1150
+        self.assertEqual(self.limiter.blocked(username="user"), [])
+        self.assertEqual(self.limiter.record_failure(username="user"), ["username"])
+
+        # The failures are forgotten once they are out of the window.
+        self.time.return_value = 1300
+        self.assertEqual(self.limiter.blocked(username="user"), [])
+
+    def test_store_errors(self):
+        with patch.object(self.limiter.store, "counts", side_effect=Exception):
+            self.assertEqual(self.limiter.record_failure(username="user"), [])
+
+
+class LocalWindowStoreTestCase(TestCase):
+
+    @patch("authentication_service.rate_limit.time.monotonic")
+    def test_expired_counters_are_swept(self, monotonic):
+        store = rate_limit.LocalWindowStore()
+        monotonic.return_value = 100
+        store.counts([("a:1", "a:0")], 1, 10)
+        monotonic.return_value = 105
+        store.counts([("b:1", "b:0")], 1, 10)
+
+        # Only one sweep is made per time-to-live.
+        monotonic.return_value = 111
+        self.assertEqual(store.counts([("b:1", "b:0")], 0, 10), [(1, 0)])
+        self.assertEqual(set(store._data), {"b:1"})
+        monotonic.return_value = 116
+        store.counts([("c:1", "c:0")], 0, 10)
+        self.assertEqual(set(store._data), {"b:1"})
+        monotonic.return_value = 121
+        store.counts([("c:1", "c:0")], 0, 10)
+        self.assertEqual(store._data, {})
+
+
+class RedisWindowStoreTestCase(TestCase):
+
+    def test_counts(self):
+        store = rate_limit.RedisWindowStore(settings.RATE_LIMIT_REDIS_URL)
+        prefix = f"{settings.RATE_LIMIT_KEY_PREFIX}:{uuid.uuid4().hex}"
+        keys = [(f"{prefix}:a:1", f"{prefix}:a:0"), (f"{prefix}:b:1", f"{prefix}:b:0")]
+        self.addCleanup(store.delete, [key for pair in keys for key in pair])
+
+        self.assertEqual(store.counts(keys, 0, 10), [(0, 0), (0, 0)])
+        self.assertEqual(store.counts(keys, 1, 10), [(1, 0), (1, 0)])
+        self.assertEqual(store.counts(keys[:1], 1, 10), [(2, 0)])
+        self.assertEqual(store.counts([(keys[0][1], keys[0][0])], 0, 10), [(0, 2)])
+
+
+class WatchAttemptsTestCase(TestCase):
+
+    def setUp(self):
+        super(WatchAttemptsTestCase, self).setUp()
+        self.limiter = rate_limit.SlidingWindowLimiter(
+            rate_limit.LocalWindowStore(), window=100,
+            limits={"username": 1, "ip": 0, "client": 2}, prefix="test"
+        )
+        patcher = patch("authentication_service.rate_limit.LIMITER", self.limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("authentication_service.rate_limit.AUDIT.put")
+        self.audit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        @rate_limit.watch_attempts("test", get_username=rate_limit.username_from_post)
+        def view(request):
+            if request.POST.get("password") == "right":
+                return HttpResponseRedirect("/")
+            return HttpResponse()
+        self.view = view
+
+    def post(self, username, password, client_id=None):
+        request = RequestFactory().post("/login/", {
+            settings.RATE_LIMIT_USERNAME_FORM_FIELD: username,
+            "password": password
+        })
+        request.session = SessionBase()
+        if client_id:
+            utils.update_session_data(request, constants.SessionKeys.CLIENT_ID, client_id)
+        return self.view(request)
+
+    def assertLockedOut(self, response):
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse("lockout_view"))
+
+    def test_username_lockout(self):
+        self.assertEqual(self.post("user", "wrong").status_code, 200)
+        self.audit.assert_called_once_with(
+            user_agent="<unknown>", ip_address="127.0.0.1", username="user",
+            http_accept="<unknown>", path_info="/login/", login_valid=False
+        )
+        self.assertLockedOut(self.post("user", "wrong"))
+        # Even the right password is refused.
+        self.assertLockedOut(self.post("user", "right"))
+
+        self.limiter.reset(username="user")
+        response = self.post("user", "right")
+        self.assertEqual(response.url, "/")
+        self.assertEqual(self.audit.call_args[1]["login_valid"], True)
+
+    def test_client_lockout(self):
+        self.assertEqual(self.post("one", "wrong", client_id=1).status_code, 200)
+        self.assertEqual(self.post("two", "wrong", client_id=1).status_code, 200)
+        self.assertLockedOut(self.post("three", "wrong", client_id=1))
+        self.assertEqual(self.post("four", "wrong", client_id=2).status_code, 200)
+
+    def test_success_resets_username(self):
+        self.assertEqual(self.post("user", "wrong").status_code, 200)
+        self.assertEqual(self.post("user", "right").url, "/")
+        self.assertEqual(self.post("user", "wrong").status_code, 200)
+
+
+class AuditSinkTestCase(TransactionTestCase):
+
+    def test_database_sink(self):
+        # The sink runs on the thread of the audit buffer, which must not
+        # keep a connection open between batches.
+        connected = []
+
+        def flush():
+            for _ in range(2):
+                rate_limit.database_sink([{
+                    "user_agent": "agent", "ip_address": "127.0.0.1", "username": "user",
+                    "http_accept": "*/*", "path_info": "/login/", "login_valid": False
+                }] * 2)
+                connected.append(connection.connection is not None)
+
+        thread = threading.Thread(target=flush)
+        thread.start()
+        thread.join()
+        self.assertEqual(connected, [False, False])
+        self.assertEqual(AccessAttempt.objects.filter(username="user").count(), 4)
+
+
+class UnblockTestCase(TestCase):
+
+    def setUp(self):
+        super(UnblockTestCase, self).setUp()
+        self.limiter = rate_limit.SlidingWindowLimiter(
+            rate_limit.LocalWindowStore(), window=100,
+            limits={"username": 1, "ip": 1, "client": 0}, prefix="test"
+        )
+        patcher = patch("authentication_service.rate_limit.LIMITER", self.limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for _ in range(2):
+            self.limiter.record_failure(username="user", ip="127.0.0.1")
+
+    def test_command(self):
+        call_command("unblock_attempts", "--username", "user", stdout=io.StringIO())
+        self.assertEqual(self.limiter.blocked(username="user", ip="127.0.0.1"), ["ip"])
+        call_command("unblock_attempts", "--ip", "127.0.0.1", stdout=io.StringIO())
+        self.assertEqual(self.limiter.blocked(username="user", ip="127.0.0.1"), [])
+
+    def test_admin_action(self):
+        attempt = AccessAttempt.objects.create(
+            user_agent="agent", ip_address="127.0.0.1", username="user",
+            http_accept="*/*", path_info="/login/", login_valid=False
+        )
+        admin_user = get_user_model().objects.create_superuser(
+            username="unblockadmin", email="unblock@example.com",
+            password="Qwer!234", birth_date=datetime.date(2000, 1, 1)
+        )
+        self.client.force_login(admin_user)
+        response = self.client.post(
+            reverse("admin:defender_accessattempt_changelist"),
+            {"action": "unblock", "_selected_action": [attempt.id]}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.limiter.blocked(username="user", ip="127.0.0.1"), [])
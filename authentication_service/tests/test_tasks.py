@@ -3,6 +3,7 @@ import logging
 import uuid
 from unittest.mock import MagicMock
 
+import urllib3
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
@@ -21,6 +22,7 @@ from authentication_service import tasks, models
 
 # TODO we need more test functions, for now only actual use cases are covered.
 from authentication_service.models import Organisation, UserSite, UserSecurityQuestion
+from user_data_store.rest import ApiException as UserDataStoreApiException
 
 
 class SendMailCase(TestCase):
@@ -127,6 +129,49 @@ class SendMailCase(TestCase):
             )
         )
 
+    def test_reset_password_mail_serialised_context(self):
+        context = {
+            "email": self.user.email,
+            "domain": "test:8000",
+            "site_name": "test_site",
+            "uid": urlsafe_base64_encode(force_bytes(self.user.pk)).decode("utf-8"),
+            "token": default_token_generator.make_token(self.user),
+            "protocol": "http",
+            "user": {"get_username": self.user.username},
+        }
+        with self.assertNumQueries(0):
+            tasks.send_mail(
+                context,
+                "password_reset",
+                extra={"recipients": [self.user.email]}
+            )
+        self.assertIn(
+            "Your username, in case you've forgotten: %s\n" % self.user.username,
+            mail.outbox[0].body
+        )
+
+    def test_fetch_objects(self):
+        other_user = get_user_model().objects.create(
+            username="other_task_user", birth_date=datetime.date(2001, 1, 1)
+        )
+        objects_to_fetch = [{
+            "app_label": "authentication_service",
+            "model": "coreuser",
+            "id": user.id,
+            "context_key": key,
+        } for key, user in [("user", self.user), ("other", other_user)]]
+
+        # Content types are cached, after which the users of both entries are
+        # fetched with one query.
+        tasks.fetch_objects(objects_to_fetch)
+        with self.assertNumQueries(1):
+            objects = tasks.fetch_objects(objects_to_fetch)
+        self.assertEqual(objects, {"user": self.user, "other": other_user})
+
+        objects_to_fetch[1]["id"] = uuid.uuid4()
+        with self.assertRaises(get_user_model().DoesNotExist):
+            tasks.fetch_objects(objects_to_fetch)
+
 
 class SendInvitationMail(TestCase):
 
@@ -297,3 +342,209 @@ class DeleteUserAndData(TestCase):
                 f"ERROR:authentication_service.tasks:User {user_id} cannot be deleted "
                 "because it does not exist."
             ])
+
+    @override_settings(
+        AC_OPERATIONAL_API=MagicMock(
+            delete_user_data=MagicMock(
+                return_value=access_control.UserDeletionData(amount=10)
+            )
+        ),
+        USER_DATA_STORE_API=MagicMock(
+            deleteduser_read=MagicMock(return_value=None),
+            deleteduser_create=MagicMock(return_value={}),
+            deleteduser_update=MagicMock(return_value={}),
+            deletedusersite_read=MagicMock(return_value=None),
+            deletedusersite_create=MagicMock(return_value={}),
+            delete_user_data=MagicMock(
+                side_effect=[
+                    UserDataStoreApiException(status=500),
+                    user_data_store.UserDeletionData(amount=5)
+                ]
+            )
+        )
+    )
+    def test_delete_user_and_data_task_retry(self):
+        for site_id in range(2, 6):
+            models.UserSite.objects.create(user=self.user, site_id=site_id)
+
+        with self.assertRaises(UserDataStoreApiException):
+            tasks.delete_user_and_data_task(
+                user_id=self.user.id,
+                deleter_id=self.deleter.id,
+                reason="Because this is a test"
+            )
+        # The local data is deleted, the user only once all remote data is.
+        self.assertFalse(UserSite.objects.filter(user=self.user).exists())
+        self.assertTrue(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
+
+        tasks.delete_user_and_data_task(
+            user_id=self.user.id,
+            deleter_id=self.deleter.id,
+            reason="Because this is a test"
+        )
+
+        # Steps completed by the first attempt were not repeated.
+        user_data_store_api = settings.USER_DATA_STORE_API
+        user_data_store_api.deleteduser_create.assert_called_once()
+        self.assertEqual(user_data_store_api.deletedusersite_create.call_count, 5)
+        self.assertEqual(
+            sorted(call[1]["data"]["site_id"] for call in
+                   user_data_store_api.deletedusersite_create.call_args_list),
+            [1, 2, 3, 4, 5]
+        )
+        settings.AC_OPERATIONAL_API.delete_user_data.assert_called_once()
+        self.assertEqual(user_data_store_api.delete_user_data.call_count, 2)
+        user_data_store_api.deleteduser_update.assert_called_once()
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
+
+
+class DeleteUsersAndData(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user_model = get_user_model()
+        cls.deleter = user_model.objects.create(
+            username="bulk_deleter",
+            birth_date=datetime.date(2000, 1, 1)
+        )
+        cls.users = [
+            user_model.objects.create(
+                username=f"bulk_user_{i}",
+                birth_date=datetime.date(2000, 1, 1)
+            ) for i in range(3)
+        ]
+        for user in cls.users:
+            models.UserSite.objects.create(user=user, site_id=1)
+        call_command("load_security_questions")
+        models.UserSecurityQuestion.objects.create(
+            user=cls.users[0],
+            question_id=1
+        )
+
+    def create_job(self, user_ids):
+        return models.UserDeletionJob.objects.create(
+            deleter_id=self.deleter.id,
+            reason="Because this is a test",
+            user_ids=user_ids
+        )
+
+    @override_settings(
+        AC_OPERATIONAL_API=MagicMock(
+            delete_user_data=MagicMock(
+                return_value=access_control.UserDeletionData(amount=10)
+            )
+        ),
+        USER_DATA_STORE_API=MagicMock(
+            deleteduser_read=MagicMock(return_value=None),
+            deleteduser_create=MagicMock(return_value={}),
+            deleteduser_update=MagicMock(return_value={}),
+            deletedusersite_read=MagicMock(return_value=None),
+            deletedusersite_create=MagicMock(return_value={}),
+            delete_user_data=MagicMock(
+                return_value=user_data_store.UserDeletionData(amount=5)
+            )
+        )
+    )
+    def test_delete_users_and_data_task(self):
+        missing_id = uuid.uuid4()
+        job = self.create_job([user.id for user in self.users] + [missing_id])
+
+        tasks.delete_users_and_data_task(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.UserDeletionJob.STATUS_COMPLETED)
+        self.assertEqual(job.processed, 4)
+        self.assertEqual(job.deleted, 3)
+        self.assertIsNotNone(job.completed_at)
+
+        user_ids = [user.id for user in self.users]
+        self.assertFalse(get_user_model().objects.filter(id__in=user_ids).exists())
+        self.assertFalse(UserSite.objects.filter(user_id__in=user_ids).exists())
+        self.assertFalse(
+            UserSecurityQuestion.objects.filter(user_id__in=user_ids).exists())
+        self.assertTrue(
+            get_user_model().objects.filter(id=self.deleter.id).exists())
+
+        user_data_store_api = settings.USER_DATA_STORE_API
+        self.assertEqual(user_data_store_api.deleteduser_create.call_count, 3)
+        self.assertEqual(user_data_store_api.deletedusersite_create.call_count, 3)
+        self.assertEqual(user_data_store_api.delete_user_data.call_count, 3)
+        self.assertEqual(settings.AC_OPERATIONAL_API.delete_user_data.call_count, 3)
+
+        # Completed jobs are not run again.
+        tasks.delete_users_and_data_task(job.id)
+        self.assertEqual(user_data_store_api.deleteduser_create.call_count, 3)
+
+    @override_settings(
+        AC_OPERATIONAL_API=MagicMock(
+            delete_user_data=MagicMock(
+                return_value=access_control.UserDeletionData(amount=10)
+            )
+        ),
+        USER_DATA_STORE_API=MagicMock(
+            deleteduser_read=MagicMock(return_value=None),
+            deleteduser_create=MagicMock(return_value={}),
+            deleteduser_update=MagicMock(return_value={}),
+            deletedusersite_read=MagicMock(return_value=None),
+            deletedusersite_create=MagicMock(return_value={}),
+            delete_user_data=MagicMock(
+                side_effect=[
+                    user_data_store.UserDeletionData(amount=5),
+                    user_data_store.UserDeletionData(amount=5),
+                    UserDataStoreApiException(status=500),
+                    user_data_store.UserDeletionData(amount=5),
+                ]
+            )
+        )
+    )
+    def test_delete_users_and_data_task_retry(self):
+        job = self.create_job([user.id for user in self.users])
+
+        # The first batch of two users is deleted, the second one fails.
+        with self.assertRaises(UserDataStoreApiException):
+            tasks.delete_users_and_data_task(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.UserDeletionJob.STATUS_RUNNING)
+        self.assertEqual(job.processed, 2)
+        self.assertEqual(job.deleted, 2)
+
+        # A retry continues with the second batch.
+        tasks.delete_users_and_data_task(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.UserDeletionJob.STATUS_COMPLETED)
+        self.assertEqual(job.processed, 3)
+        self.assertEqual(job.deleted, 3)
+        user_data_store_api = settings.USER_DATA_STORE_API
+        self.assertEqual(user_data_store_api.deleteduser_create.call_count, 3)
+        self.assertEqual(user_data_store_api.delete_user_data.call_count, 4)
+
+    @override_settings(
+        AC_OPERATIONAL_API=MagicMock(
+            delete_user_data=MagicMock(side_effect=urllib3.exceptions.MaxRetryError(
+                None, "/ops/user_data",
+                urllib3.exceptions.ReadTimeoutError(None, "/ops/user_data", "Read timed out.")
+            ))
+        ),
+        USER_DATA_STORE_API=MagicMock(
+            deleteduser_read=MagicMock(return_value=None),
+            deleteduser_create=MagicMock(return_value={}),
+            deletedusersite_read=MagicMock(return_value=None),
+            deletedusersite_create=MagicMock(return_value={}),
+        )
+    )
+    def test_delete_users_and_data_task_timeout(self):
+        job = self.create_job([user.id for user in self.users])
+
+        # Read timeouts are retried, so the job does not fail.
+        with self.assertRaises(urllib3.exceptions.MaxRetryError):
+            tasks.delete_users_and_data_task(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.UserDeletionJob.STATUS_RUNNING)
+        self.assertEqual(job.processed, 0)
+        self.assertIn(
+            urllib3.exceptions.HTTPError, tasks.delete_users_and_data_task.autoretry_for
+        )
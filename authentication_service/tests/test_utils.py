@@ -1,10 +1,18 @@
 import datetime
+import uuid
+from unittest.mock import patch
+
+from jsonschema import ValidationError
 
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.middleware import SessionMiddleware
 from django.core.exceptions import SuspiciousOperation
-from django.test import TestCase
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, override_settings
 
 from authentication_service import utils, exceptions
+from authentication_service.api import schemas, utils as api_utils, views as api_views
+from authentication_service.integration import Implementation
 
 
 class APIKeyTestCase(TestCase):
@@ -187,3 +195,69 @@ class DateFilterTestCase(TestCase):
                 e.message,
                 "Date value(1) does not have correct format YYYY-MM-DD"
             )
+
+
+class SessionDataTestCase(TestCase):
+
+    def setUp(self):
+        self.request = RequestFactory().get("/")
+        SessionMiddleware().process_request(self.request)
+
+    def test_update_session_data(self):
+        utils.update_session_data(self.request, "key", "value")
+        self.assertTrue(self.request.session.modified)
+        self.assertEqual(utils.get_session_data(self.request, "key"), "value")
+
+        # Setting the same value again does not mark the session as modified.
+        self.request.session.modified = False
+        utils.update_session_data(self.request, "key", "value")
+        self.assertFalse(self.request.session.modified)
+
+        utils.update_session_data(self.request, "key", "other value")
+        self.assertTrue(self.request.session.modified)
+        self.assertEqual(
+            utils.get_session_data(self.request, "key"), "other value")
+
+    def test_delete_session_data(self):
+        # Deleting keys that are not present does not mark the session as
+        # modified.
+        utils.delete_session_data(self.request, ["key"])
+        self.assertFalse(self.request.session.modified)
+
+        utils.update_session_data(self.request, "key", "value")
+        self.request.session.modified = False
+        utils.delete_session_data(self.request, ["key", "other_key"])
+        self.assertTrue(self.request.session.modified)
+        self.assertIsNone(utils.get_session_data(self.request, "key"))
+
+
+class APIValidationTestCase(TestCase):
+
+    def test_validators_are_cached(self):
+        schema = {"type": "string", "format": "uuid"}
+        validator = api_utils.get_validator(schema)
+        # Equal schemas share a validator, even when they are new objects.
+        self.assertIs(api_utils.get_validator(dict(schema)), validator)
+        self.assertIsNot(api_utils.get_validator({"type": "integer"}), validator)
+
+        api_utils.validate(str(uuid.uuid4()), schema)
+        with self.assertRaises(ValidationError):
+            api_utils.validate("not-a-uuid", schema)
+
+    def test_sampled_response_validation(self):
+        # The generated views use the sampled validation of the utils.
+        self.assertIs(api_views.maybe_validate_result, api_utils.maybe_validate_result)
+
+        user = get_user_model().objects.create(
+            username="test_user", birth_date=datetime.date(2000, 1, 1)
+        )
+        content = JsonResponse(Implementation.user_read(None, user.id)).content
+        with self.assertLogs(api_utils._LOGGER, "ERROR") as logs:
+            api_utils.maybe_validate_result(content, schemas.user)
+            api_utils.maybe_validate_result(content, schemas.country)
+        self.assertEqual(len(logs.output), 1)
+
+        with override_settings(SWAGGER_API_VALIDATE_RESPONSES_SAMPLE_RATE=0), \
+                patch("authentication_service.api.utils.validate") as validate:
+            api_utils.maybe_validate_result(content, schemas.country)
+        validate.assert_not_called()
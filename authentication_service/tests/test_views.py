@@ -18,10 +18,9 @@ from django_otp.util import random_hex
 
 from oidc_provider.models import Client
 from unittest.mock import patch, MagicMock
-from defender.utils import unblock_username
 from access_control import Invitation, InvitationRedirectUrl
 
-from authentication_service import constants
+from authentication_service import constants, rate_limit
 from django.contrib.auth.hashers import check_password, make_password
 from authentication_service.models import (
     SecurityQuestion,
@@ -97,9 +96,9 @@ class TestLogin(TestCase):
         )
         self.assertContains(response, "Your account has been deactivated. Please contact support.")
 
-    # patch bellow django defender util to always return true
-    # func take 3 args (request, login_unsuccessful, get_username)
-    @patch("defender.utils.check_request", new=lambda a, b, c: True)
+    # patch below rate limiter to never lock the user out
+    @patch("authentication_service.rate_limit.LIMITER.record_failure",
+           new=lambda **identities: [])
     def test_invalid_user_login(self):
         user = get_user_model().objects.create_user(
             username="testusername",
@@ -557,7 +556,7 @@ class TestLockout(TestCase):
             "auth-username": self.user.username,
             "auth-password": "wrongpassword"
         }
-        allowed_attempts = settings.DEFENDER_LOGIN_FAILURE_LIMIT
+        allowed_attempts = settings.RATE_LIMIT_USERNAME_LIMIT
         attempt = 0
         while attempt < allowed_attempts:
             attempt += 1
@@ -583,7 +582,7 @@ class TestLockout(TestCase):
                           "base.html"])
 
         # Manually unblock the username. This allows the user to try again.
-        unblock_username(self.user.username)
+        rate_limit.LIMITER.reset(username=self.user.username)
 
         self.client.get(login_url)
         response = self.client.post(login_url, login_data)
@@ -622,7 +621,7 @@ class TestSecurityQuestionLockout(TestCase):
 
     def test_lockout_on_reset(self):
         # Ensure user is not blocked
-        unblock_username(self.user.username)
+        rate_limit.LIMITER.reset(username=self.user.username)
 
         session = self.client.session
         session["lookup_user_id"] = str(self.user.id)
@@ -635,7 +634,7 @@ class TestSecurityQuestionLockout(TestCase):
             "question_%s" % self.user_answer_one.id: "test",
             "question_%s" % self.user_answer_two.id: "answer"
         }
-        allowed_attempts = settings.DEFENDER_LOGIN_FAILURE_LIMIT
+        allowed_attempts = settings.RATE_LIMIT_USERNAME_LIMIT
         attempt = 0
 
         while attempt < allowed_attempts:
@@ -663,7 +662,7 @@ class TestSecurityQuestionLockout(TestCase):
                          ["authentication_service/lockout.html",
                           "base.html"])
 
-        unblock_username(self.user.username)
+        rate_limit.LIMITER.reset(username=self.user.username)
 
         self.client.get(reset_url)
         response = self.client.post(reset_url, reset_data)
@@ -2259,8 +2258,8 @@ class TestMigrationPasswordResetLockout(TestCase):
             "Another secure question"
         )
 
-        unblock_username(self.temp_user.username)
-        allowed_attempts = settings.DEFENDER_LOGIN_FAILURE_LIMIT
+        rate_limit.LIMITER.reset(username=self.temp_user.username)
+        allowed_attempts = settings.RATE_LIMIT_USERNAME_LIMIT
         attempt = 0
         while attempt < allowed_attempts:
             attempt += 1
@@ -2304,7 +2303,7 @@ class TestMigrationPasswordResetLockout(TestCase):
             )
 
         # Manually unblock the username. This allows the user to try again.
-        unblock_username(self.temp_user.username)
+        rate_limit.LIMITER.reset(username=self.temp_user.username)
 
 
 class HealthCheckTestCase(TestCase):
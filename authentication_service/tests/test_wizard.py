@@ -1,12 +1,12 @@
 import datetime
 
-from defender.utils import unblock_username, reset_failed_attempts
 from django.test import TestCase
 from django.urls import reverse
 from django_otp.oath import totp
 from django_otp.plugins.otp_totp.models import TOTPDevice
 from django_otp.util import random_hex
 
+from authentication_service import rate_limit
 from authentication_service.models import CoreUser as User
 
 
@@ -45,8 +45,7 @@ class BaseTestCase(TestCase):
     def setUp(self):
         # Make sure none of the test users are blocked before running a test.
         for user in [self.standard_user, self.twofa_user, self.super_user]:
-            unblock_username(user.username)
-            reset_failed_attempts(username=user.username)
+            rate_limit.LIMITER.reset(username=user.username)
 
     def get_credential_step(self):
         print("Getting credential step")
@@ -101,7 +101,6 @@ urlpatterns += i18n_patterns(
     ),
 
     url(r"^admin/", admin.site.urls),
-    url(r'^admin/defender/', include('defender.urls')),  # defender admin
     # Override the login URL implicitly defined by Two Factor Auth to redirect
     # to our login view (which is derived from theirs).
     url(r"^two-factor-auth/account/login/",
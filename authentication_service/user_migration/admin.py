@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib import admin
 
+from authentication_service import answer_hashing
 from authentication_service.user_migration.models import (
     TemporaryMigrationUserStore
 )
@@ -42,20 +43,21 @@ class MigrationUserForm(forms.ModelForm):
     # Hash certain cleaned_data values, before instance is created or updated
     def _post_clean(self):
         # List of fields that require hashed values to be saved.
-        # ("<field_name>", <bool_clean_and_lower>)
+        # ("<field_name>", <bool_is_answer>)
         hash_cleaned_data_fields = [
             ("pw_hash", False),
             ("answer_one", True),
             ("answer_two", True)
         ]
 
-        for field, clean in hash_cleaned_data_fields:
+        for field, is_answer in hash_cleaned_data_fields:
             # Check if field value has actually changed
             if field in self.changed_data:
                 value = self.cleaned_data[field]
-                if clean:
-                    value = value.strip().lower()
-                self.cleaned_data[field] = self.instance.get_hash_value(value)
+                if is_answer:
+                    self.cleaned_data[field] = answer_hashing.make_answer(value)
+                else:
+                    self.cleaned_data[field] = self.instance.get_hash_value(value)
 
         # Let super do its work, this will assign the correct values to the
         # instance based on cleaned_data values.
@@ -4,6 +4,8 @@ from django.db import models
 
 from oidc_provider.models import Client
 
+from authentication_service import answer_hashing
+
 
 class TemporaryMigrationUserStore(models.Model):
     username = models.CharField(
@@ -39,10 +41,22 @@ class TemporaryMigrationUserStore(models.Model):
         return check_password(raw_password, self.pw_hash)
 
     def check_answer_one(self, answer):
-        return check_password(answer.strip().lower(), self.answer_one)
+        return answer_hashing.check_answer(
+            answer, self.answer_one, setter=self._answer_setter("answer_one")
+        )
 
     def check_answer_two(self, answer):
-        return check_password(answer.strip().lower(), self.answer_two)
+        return answer_hashing.check_answer(
+            answer, self.answer_two, setter=self._answer_setter("answer_two")
+        )
+
+    def _answer_setter(self, field):
+        def setter(encoded):
+            setattr(self, field, encoded)
+            TemporaryMigrationUserStore.objects.filter(pk=self.pk).update(
+                **{field: encoded}
+            )
+        return setter
 
     def set_password(self, raw_password):
         self.pw_hash = self.get_hash_value(raw_password)
@@ -50,7 +64,7 @@ class TemporaryMigrationUserStore(models.Model):
 
     def set_answers(self, answer_one=None, answer_two=None):
         if answer_one:
-            self.answer_one = self.get_hash_value(answer_one.strip().lower())
+            self.answer_one = answer_hashing.make_answer(answer_one)
         if answer_two:
-            self.answer_two = self.get_hash_value(answer_two.strip().lower())
+            self.answer_two = answer_hashing.make_answer(answer_two)
         self.save()
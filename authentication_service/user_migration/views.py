@@ -1,7 +1,6 @@
 from datetime import date
 from dateutil.relativedelta import relativedelta
 
-from defender.decorators import watch_login
 from formtools.wizard.views import NamedUrlSessionWizardView
 
 from django.conf import settings
@@ -20,7 +19,8 @@ from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext as _
 from django.views.generic.edit import FormView
 
-from authentication_service import forms, models, views, constants, utils
+from authentication_service import forms, models, views, constants, utils, \
+    rate_limit
 from authentication_service.decorators import generic_deprecation
 from authentication_service.user_migration.forms import (
     UserDataForm, SecurityQuestionGateForm, PasswordResetForm
@@ -204,9 +204,9 @@ class QuestionGateView(FormView):
     def get_context_data(self, **kwargs):
         context = super(QuestionGateView, self).get_context_data(**kwargs)
 
-        # Added context for django defender, needs correct template
+        # Added context for the rate limiter, needs correct template
         context["auth_username"] = self.migration_user.username
-        context["defender_field_name"] = settings.DEFENDER_USERNAME_FORM_FIELD
+        context["defender_field_name"] = settings.RATE_LIMIT_USERNAME_FORM_FIELD
         return context
 
     def form_valid(self, form):
@@ -240,9 +240,9 @@ class QuestionGateView(FormView):
         return reverse("login")
 
 
-defender_decorator = watch_login()
-watch_login_method = method_decorator(defender_decorator)
-QuestionGateView.dispatch = watch_login_method(QuestionGateView.dispatch)
+QuestionGateView.dispatch = method_decorator(rate_limit.watch_attempts(
+    "question_gate", get_username=rate_limit.username_from_post
+))(QuestionGateView.dispatch)
 
 
 class PasswordResetView(FormView):
@@ -1,14 +1,22 @@
 import datetime
+import functools
 import json
+import operator
 
 import jsonschema
 from django.conf import settings
+from django.core import signing
 from django.core.exceptions import SuspiciousOperation
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
 from django.forms import HiddenInput
 
 from authentication_service import exceptions
 from authentication_service.constants import EXTRA_SESSION_KEY
 
+CURSOR_SALT = "authentication_service.utils.cursor"
+
 DATE_DATETIME_RANGE_SCHEMA = {
     "type": "object",
     "properties": {
@@ -103,6 +111,153 @@ def check_limit(limit):
     return settings.DEFAULT_LISTING_LIMIT
 
 
+def estimate_count(queryset):
+    """ Returns PostgreSQL's estimate of the number of rows in the queryset,
+    without executing it. Unfiltered querysets use the table statistics in
+    pg_class, all others the row estimate of the query plan.
+    :param queryset: The queryset to estimate the size of.
+    :return: The estimated number of rows
+    """
+    with connections[queryset.db].cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [cursor.db.ops.quote_name(queryset.model._meta.db_table)]
+            )
+            rows = cursor.fetchone()[0]
+        else:
+            sql, params = queryset.order_by().query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            rows = plan[0]["Plan"]["Plan Rows"]
+    # Tables that have never been analysed have a reltuples value of -1.
+    return max(int(rows), 0)
+
+
+def paginate(queryset, offset, limit, count=None):
+    """ Fetches a page of objects and the headers describing the total number
+    of objects in the queryset.
+    :param queryset: An ordered queryset.
+    :param offset: The offset in the queryset to start from.
+    :param limit: Amount of objects to return.
+    :param count: How X-Total-Count is determined. "exact" (the default)
+        counts all matching rows, "estimate" uses the database statistics and
+        "none" leaves the header out.
+    :return: A tuple of (list of objects, headers dict)
+    """
+    count = count or "exact"
+    if count == "exact":
+        objects = list(queryset.annotate(
+            x_total_count=RawSQL("COUNT(*) OVER ()", [])
+        )[offset:offset + limit])
+        return objects, {
+            "X-Total-Count": objects[0].x_total_count if objects else 0
+        }
+
+    objects = list(queryset[offset:offset + limit])
+    if count == "none":
+        return objects, {}
+
+    if len(objects) < limit and (objects or not offset):
+        # This is the last page, so the total is known without counting.
+        total = offset + len(objects)
+    else:
+        total = estimate_count(queryset)
+        if objects:
+            # Statistics can be out of date, but never report fewer objects
+            # than have been seen.
+            total = max(total, offset + len(objects))
+    return objects, {"X-Total-Count": total}
+
+
+def cursor_ordering(order_by, allowed_fields, tie_breaker="id"):
+    """ Validates the fields to order a cursor paginated listing by and makes
+    the ordering unique by appending the tie breaker field if needed.
+    :param order_by: List of field names, optionally prefixed by "-".
+    :param allowed_fields: Fields that may be ordered by. These should all be
+        indexed.
+    :param tie_breaker: A unique field.
+    :return: The ordering, e.g. ["-date_joined", "id"]
+    """
+    ordering = []
+    for item in order_by:
+        name = item[1:] if item.startswith("-") else item
+        if name not in allowed_fields:
+            raise exceptions.BadRequestException(
+                f"Cursor pagination does not support ordering by {name}."
+            )
+        ordering.append(item)
+    if tie_breaker not in [item.lstrip("-") for item in ordering]:
+        ordering.append(tie_breaker)
+    return ordering
+
+
+def encode_cursor(instance, ordering):
+    """ Creates an opaque, signed cursor pointing to the position of instance
+    in a listing ordered by ordering.
+    :param instance: The last object on a page.
+    :param ordering: The ordering as returned by cursor_ordering().
+    :return: The cursor string
+    """
+    values = []
+    for item in ordering:
+        field = instance._meta.get_field(item.lstrip("-"))
+        values.append(
+            None if field.value_from_object(instance) is None
+            else field.value_to_string(instance)
+        )
+    return signing.dumps(
+        {"order_by": ordering, "values": values}, salt=CURSOR_SALT, compress=True
+    )
+
+
+def cursor_filter(model, cursor, ordering):
+    """ Builds the keyset filter selecting the objects that come after the
+    position the cursor points to. For an ordering on (a, b) this is
+    a > va OR (a = va AND b > vb), with ">" replaced by "<" for descending
+    fields. NULL values sort last in ascending order, as PostgreSQL does.
+    :param model: The model class being listed.
+    :param cursor: A cursor as returned by encode_cursor().
+    :param ordering: The ordering as returned by cursor_ordering().
+    :return: A Q object
+    """
+    try:
+        data = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        raise exceptions.BadRequestException("Invalid cursor.")
+
+    if data.get("order_by") != ordering:
+        raise exceptions.BadRequestException(
+            "The cursor does not match the requested ordering."
+        )
+
+    after = Q()
+    equal = Q()
+    for item, value in zip(ordering, data["values"]):
+        descending = item.startswith("-")
+        name = item.lstrip("-")
+        field = model._meta.get_field(name)
+        if value is None:
+            # Only non NULL values come after NULL, and only when descending.
+            if descending:
+                after |= equal & Q(**{f"{name}__isnull": False})
+            equal &= Q(**{f"{name}__isnull": True})
+            continue
+
+        value = field.to_python(value)
+        if descending:
+            after |= equal & Q(**{f"{name}__lt": value})
+        else:
+            greater = Q(**{f"{name}__gt": value})
+            if field.null:
+                greater |= Q(**{f"{name}__isnull": True})
+            after |= equal & greater
+        equal &= Q(**{name: value})
+    return after
+
+
 def strip_empty_optional_fields(object_dict):
     """ We do not need to add fields that contain None to the response,
     so we strip those fields out of the response. To do this, we iterate over
@@ -115,6 +270,40 @@ def strip_empty_optional_fields(object_dict):
     return {k: v for k, v in object_dict.items() if v is not None}
 
 
+def _file_path_accessor(field):
+    def accessor(instance):
+        # Read the stored file name directly, instead of creating a FieldFile
+        # through the field's descriptor.
+        value = instance.__dict__.get(field.attname)
+        name = getattr(value, "name", value)
+        return field.storage.path(name) if name else None
+    return accessor
+
+
+@functools.lru_cache(maxsize=None)
+def _field_accessors(model, custom_fields):
+    """ Compiles the list of (key, accessor) pairs used to convert instances
+    of a model to dictionaries. Foreign keys are read from their id
+    attributes, which does not require fetching the related object.
+    :param model: The model class.
+    :param custom_fields: Tuple of fields to include.
+    :return: Tuple of (key, callable) pairs
+    """
+    accessors = []
+    for field in model._meta.fields:
+        if field.name in custom_fields:
+            if field.name in ("avatar", "logo"):  # CoreUser and Client fields
+                accessors.append((field.name, _file_path_accessor(field)))
+            elif field.name == "country":  # User field, the code is the key
+                accessors.append((field.name, operator.attrgetter("country_id")))
+            elif field.name == "organisation":  # User field
+                accessors.append(
+                    ("organisation_id", operator.attrgetter("organisation_id")))
+            else:
+                accessors.append((field.name, operator.attrgetter(field.name)))
+    return tuple(accessors)
+
+
 def to_dict_with_custom_fields(instance, custom_fields):
     """ Convert an object to a dictionary with only some of the fields that
     exist on the object. Some fields also require some manual handling.
@@ -122,21 +311,10 @@ def to_dict_with_custom_fields(instance, custom_fields):
     :param custom_fields: List of fields to include in dict.
     :return: Dictionary with custom fields.
     """
-    result = {}
-    for field in instance._meta.fields:
-        if field.name in custom_fields:
-            if field.name == "avatar":  # CoreUser field
-                result[field.name] = instance.avatar.path if instance.avatar else None
-            elif field.name == "logo":  # Client field
-                result[field.name] = instance.logo.path if instance.logo else None
-            elif field.name == "country":  # User field
-                result[field.name] = instance.country.code if instance.country else None
-            elif field.name == "organisation":  # User field
-                result["organisation_id"] = \
-                    instance.organisation.id if instance.organisation else None
-            else:
-                result[field.name] = getattr(instance, field.name)
-    return result
+    return {
+        key: accessor(instance)
+        for key, accessor in _field_accessors(type(instance), tuple(custom_fields))
+    }
 
 
 def range_filter_parser(date_range: str):
@@ -197,9 +375,14 @@ def range_filter_parser(date_range: str):
 
 
 def update_session_data(request, key: str, data):
-    if not request.session.get(EXTRA_SESSION_KEY, None):
-        request.session[EXTRA_SESSION_KEY] = {}
-    request.session[EXTRA_SESSION_KEY][key] = data
+    extra_data = request.session.get(EXTRA_SESSION_KEY, None)
+    if not extra_data:
+        extra_data = request.session[EXTRA_SESSION_KEY] = {}
+    elif key in extra_data and extra_data[key] == data:
+        # Only mark the session as modified if something changed, otherwise it
+        # is needlessly written back to the session store.
+        return
+    extra_data[key] = data
     request.session.modified = True
 
 
@@ -208,6 +391,8 @@ def get_session_data(request, key: str):
 
 
 def delete_session_data(request, keys: [str]) -> None:
+    extra_data = request.session.get(EXTRA_SESSION_KEY, {})
     for key in keys:
-        request.session.get(EXTRA_SESSION_KEY, {}).pop(key, None)
-        request.session.modified = True
+        if key in extra_data:
+            del extra_data[key]
+            request.session.modified = True
@@ -7,8 +7,6 @@ import socket
 import urllib
 
 import prometheus_client
-from defender.decorators import watch_login
-from defender.utils import is_user_already_locked, lockout_response
 from formtools.wizard.views import NamedUrlSessionWizardView
 
 from oidc_provider.models import Client
@@ -25,7 +23,7 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.auth.signals import user_logged_out
-from django.contrib.auth import login, authenticate, hashers
+from django.contrib.auth import login, authenticate
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import (
@@ -61,7 +59,7 @@ from django.views.generic import View, TemplateView
 from django.views.decorators.cache import never_cache
 from django.views.generic.edit import UpdateView, FormView
 
-from authentication_service import api_helpers
+from authentication_service import api_helpers, rate_limit
 from authentication_service.forms import LoginForm
 from authentication_service.decorators import generic_deprecation
 from authentication_service import forms, models, tasks, constants, utils
@@ -93,7 +91,7 @@ class LanguageMixin:
 
 class LockoutView(TemplateView):
     """
-    A view used by Defender to inform the user that they have exceeded the
+    A view used by the rate limiter to inform the user that they have exceeded the
     threshold for allowed login failures or password reset attempts.
     """
     template_name = "authentication_service/lockout.html"
@@ -101,8 +99,8 @@ class LockoutView(TemplateView):
     def get_context_data(self, *args, **kwargs):
         ct = super(LockoutView, self).get_context_data(*args, **kwargs)
         ct["referrer"] = self.request.META.get("HTTP_REFERER")
-        ct["failure_limit"] = settings.DEFENDER_LOGIN_FAILURE_LIMIT
-        ct["cooloff_time_minutes"] = int(settings.DEFENDER_COOLOFF_TIME / 60)
+        ct["failure_limit"] = settings.RATE_LIMIT_USERNAME_LIMIT
+        ct["cooloff_time_minutes"] = int(settings.RATE_LIMIT_WINDOW / 60)
         return ct
 
 
@@ -250,13 +248,10 @@ class AuthServiceEndService(LoginRequiredMixin, EndSessionView):
         return AuthServiceLogout.as_view(next_page=next_page)(request)
 
 
-# Protect the login view using Defender. Defender provides a method decorator
-# which we have to tweak to apply to the dispatch method of a view.
-# This is based on their own implementation of their middleware class:
-# https://github.com/kencochrane/django-defender/blob/master/defender/middleware.py#L24-L27
-defender_decorator = watch_login()
-watch_login_method = method_decorator(defender_decorator)
-LoginView.dispatch = watch_login_method(LoginView.dispatch)
+# Protect the login view using the rate limiter, which provides a function
+# decorator that we have to tweak to apply to the dispatch method of a view.
+LoginView.dispatch = method_decorator(rate_limit.watch_attempts(
+    "login", get_username=rate_limit.username_from_post))(LoginView.dispatch)
 
 registration_forms = (
     ("userdata", forms.RegistrationForm),
@@ -721,8 +716,8 @@ class ResetPasswordView(AnonUserRequiredMixin, PasswordResetView):
         # Check reset method
         if user:
             # Check if this user has been locked out
-            if is_user_already_locked(user.username):
-                return lockout_response(self.request)
+            if rate_limit.LIMITER.blocked(username=user.username):
+                return rate_limit.lockout_response(self.request)
 
             # Store the id of the user that we found in our search
             self.request.session["lookup_user_id"] = str(user.id)
@@ -802,10 +797,8 @@ class ResetPasswordSecurityQuestionsView(FormView):
 
     def form_valid(self, form):
         for question in form.questions:
-            if not hashers.check_password(
-                    form.cleaned_data["question_%s" % question.id].strip().lower(),
-                    question.answer
-            ):
+            if not question.check_answer(
+                    form.cleaned_data["question_%s" % question.id]):
                 form.add_error(None, ValidationError(
                     _("One or more answers are incorrect"),
                     code="incorrect"
@@ -824,10 +817,16 @@ class ResetPasswordSecurityQuestionsView(FormView):
         )
 
 
-defender_decorator = watch_login()
-watch_login_method = method_decorator(defender_decorator)
-ResetPasswordSecurityQuestionsView.dispatch = watch_login_method(
-    ResetPasswordSecurityQuestionsView.dispatch)
+# The reset form takes a username or an email address, so reset attempts are
+# only counted per IP address and client. Users locked out by failed logins are
+# refused by ResetPasswordView.form_valid instead.
+ResetPasswordView.dispatch = method_decorator(rate_limit.watch_attempts(
+    "reset_password"))(ResetPasswordView.dispatch)
+ResetPasswordSecurityQuestionsView.dispatch = method_decorator(
+    rate_limit.watch_attempts(
+        "reset_password_security_questions",
+        get_username=rate_limit.username_from_post
+    ))(ResetPasswordSecurityQuestionsView.dispatch)
 
 
 class PasswordResetConfirmView(AnonUserRequiredMixin, PasswordResetConfirmView):
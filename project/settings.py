@@ -11,6 +11,7 @@ from project.settings_base import *
 from authentication_service.constants import LOGIN_VALIDATION_ERRORS
 import access_control
 import user_data_store
+from authentication_service import api_clients
 
 env = Env()
 
@@ -30,6 +31,80 @@ REPORT_EMAILS = env.list("REPORT_EMAILS", [])
 # service. This service can not have a client that is required to create a
 # site entry.
 AUTHENTICATION_SERVICE_HARDCODED_SITE_ID = 0
+
+# authentication_service/api_helpers.py: Client id to site lookups on the
+# Access Control API are cached per process. Clients without a site are cached
+# for a shorter time.
+SITE_CACHE_TTL = env.int("SITE_CACHE_TTL", 300)  # seconds
+SITE_CACHE_NEGATIVE_TTL = env.int("SITE_CACHE_NEGATIVE_TTL", 30)  # seconds
+# The last site found for a client is served while Access Control is
+# unavailable, for at most this long. 0 fails lookups instead.
+SITE_FALLBACK_TTL = env.int("SITE_FALLBACK_TTL", 86400)  # seconds
+SITE_CACHE_SIZE = env.int("SITE_CACHE_SIZE", 1000)
+
+# authentication_service/oidc_provider_settings.py: Userinfo and scope claims
+# are cached per process, user, Client and scopes. Entries are keyed on the
+# time the user was last updated, so profile changes are picked up straight
+# away. Site data and roles, including revoked roles, are only refreshed once
+# the entries expire.
+CLAIMS_CACHE_TTL = env.int("CLAIMS_CACHE_TTL", 60)  # seconds
+CLAIMS_CACHE_SIZE = env.int("CLAIMS_CACHE_SIZE", 10000)
+# The site data and roles of a userinfo request are looked up concurrently.
+# Claims of which the lookup takes longer than the timeout are omitted.
+CLAIMS_CONCURRENCY = env.int("CLAIMS_CONCURRENCY", 16)
+CLAIMS_API_TIMEOUT = env.float("CLAIMS_API_TIMEOUT", 5)  # seconds
+
+# authentication_service/middleware.py: OIDC Clients validated on authorize
+# requests are cached per process. Entries are dropped when a Client changes.
+CLIENT_CACHE_TTL = env.int("CLIENT_CACHE_TTL", 60)  # seconds
+CLIENT_CACHE_SIZE = env.int("CLIENT_CACHE_SIZE", 1000)
+
+# authentication_service/api_clients.py: Connections kept alive per Access
+# Control and User Data Store host, the timeouts of API requests that do not
+# set their own and the number of retries of failed connections and idempotent
+# requests. Retries back off exponentially with random jitter. Read timeouts
+# and requests setting their own timeout are not retried. The user deletion
+# tasks retry read timeouts themselves, their steps being idempotent.
+API_POOL_SIZE = env.int("API_POOL_SIZE", 10)
+API_CONNECT_TIMEOUT = env.float("API_CONNECT_TIMEOUT", 2)  # seconds
+API_READ_TIMEOUT = env.float("API_READ_TIMEOUT", 10)  # seconds
+API_RETRIES = env.int("API_RETRIES", 2)
+API_RETRY_BACKOFF = env.float("API_RETRY_BACKOFF", 0.1)  # seconds
+API_KEEP_ALIVE = env.bool("API_KEEP_ALIVE", True)
+# Every endpoint has a circuit breaker, which fails requests fast after the
+# threshold of consecutive errors and timeouts, until a probe request succeeds.
+# A probe is made once the circuit has been open for the reset timeout. 0
+# disables the breakers. Endpoints can override both, e.g.
+# {"GET /sites": {"failure_threshold": 3, "reset_timeout": 10}}.
+API_BREAKER_THRESHOLD = env.int("API_BREAKER_THRESHOLD", 5)
+API_BREAKER_RESET_TIMEOUT = env.float("API_BREAKER_RESET_TIMEOUT", 30)  # seconds
+API_BREAKER_ENDPOINTS = env.json("API_BREAKER_ENDPOINTS", {})
+
+# authentication_service/event_buffer.py: Login and logout events are queued
+# and published in batches by a background thread. Events are dropped when the
+# queue stays full for longer than the put timeout.
+EVENT_BUFFER_SINK = env.str(
+    "EVENT_BUFFER_SINK", "authentication_service.event_buffer.kinesis_sink"
+)
+EVENT_BUFFER_SIZE = env.int("EVENT_BUFFER_SIZE", 10000)
+EVENT_BUFFER_BATCH_SIZE = env.int("EVENT_BUFFER_BATCH_SIZE", 500)
+EVENT_BUFFER_FLUSH_INTERVAL = env.float("EVENT_BUFFER_FLUSH_INTERVAL", 1)  # seconds
+EVENT_BUFFER_PUT_TIMEOUT = env.float("EVENT_BUFFER_PUT_TIMEOUT", 0)  # seconds
+
+# authentication_service/tasks.py: The remote steps of a user deletion run
+# concurrently. Completed steps are checkpointed in the default cache, so that
+# retries of the task skip them.
+USER_DELETION_CONCURRENCY = env.int("USER_DELETION_CONCURRENCY", 8)
+USER_DELETION_CHECKPOINT_TTL = env.int("USER_DELETION_CHECKPOINT_TTL", 86400)  # seconds
+# The number of users deleted at a time by a bulk deletion job.
+USER_DELETION_BATCH_SIZE = env.int("USER_DELETION_BATCH_SIZE", 100)
+# The number of users a bulk deletion job may select, the maxItems of its
+# user_ids in the API specification.
+USER_DELETION_MAX_USERS = env.int("USER_DELETION_MAX_USERS", 10000)
+
+# authentication_service/instrumentation.py: Requests taking longer are logged
+# with their query, API call and hashing times. 0 disables the logging.
+SLOW_REQUEST_THRESHOLD = env.float("SLOW_REQUEST_THRESHOLD", 0)  # seconds
 #--Project settings end
 
 # Django Settings
@@ -38,6 +113,32 @@ SECRET_KEY = env.str("SECRET_KEY", "_n(_w(3!i4-p((jz8(o0fb*_r5fb5t!qh1g@m9%4vryx
 # 24hrs in seconds
 SESSION_COOKIE_AGE = 86400
 
+# Cache settings. When CACHE_REDIS_URL is set the default cache is backed by
+# Redis, otherwise Django's per-process local memory cache is used.
+CACHE_REDIS_URL = env.str("CACHE_REDIS_URL", "")
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+            "KEY_PREFIX": "authentication_service",
+            "OPTIONS": {
+                "CLIENT_CLASS": "django_redis.client.DefaultClient",
+                "SOCKET_CONNECT_TIMEOUT": env.float("CACHE_REDIS_CONNECT_TIMEOUT", 1),
+                "SOCKET_TIMEOUT": env.float("CACHE_REDIS_TIMEOUT", 1),
+            }
+        }
+    }
+
+# Sessions are read from and written to the cache when it is backed by Redis.
+# "cached_db" still writes sessions through to the database, "cache" does not
+# touch the database at all.
+SESSION_ENGINE = env.str(
+    "SESSION_ENGINE",
+    "django.contrib.sessions.backends.cached_db" if CACHE_REDIS_URL
+    else "django.contrib.sessions.backends.db"
+)
+
 AUTH_USER_MODEL = "authentication_service.CoreUser"
 
 
@@ -168,6 +269,7 @@ ADDITIONAL_APPS = [
     "django_otp.plugins.otp_static",
     "django_otp.plugins.otp_totp",
     "two_factor",
+    # Only stores the audited login attempts, see rate_limit.database_sink.
     "defender",
     "celery",
 
@@ -221,20 +323,36 @@ LAYERS = {
 # https://docs.djangoproject.com/en/1.11/ref/settings/#password-reset-timeout-days
 PASSWORD_RESET_TIMEOUT_DAYS = 3
 
-# Defender options
-DEFENDER_LOGIN_FAILURE_LIMIT = 5  # A maximum of 5 failed attempts to be allowed
-DEFENDER_BEHIND_REVERSE_PROXY = False
-DEFENDER_LOCK_OUT_BY_IP_AND_USERNAME = False
-DEFENDER_DISABLE_IP_LOCKOUT = True
-DEFENDER_DISABLE_USERNAME_LOCKOUT = False
-DEFENDER_COOLOFF_TIME = 600  # seconds that failures will be remembered
-DEFENDER_REVERSE_PROXY_HEADER = "HTTP_X_FORWARDED_FOR"
-DEFENDER_CACHE_PREFIX = "defender"
-DEFENDER_LOCKOUT_URL = "/lockout"
-DEFENDER_REDIS_URL = env.str("REDIS_URI", "redis://localhost:6379/0")
-DEFENDER_STORE_ACCESS_ATTEMPTS = True
-DEFENDER_ACCESS_ATTEMPT_EXPIRATION = 24  # hours
-DEFENDER_USERNAME_FORM_FIELD = "auth-username"
+# authentication_service/rate_limit.py: Failed attempts are counted per
+# username, IP address and client in sliding windows of RATE_LIMIT_WINDOW
+# seconds. A limit of 0 disables limiting for that scope. Without a Redis URL
+# the counters are kept per process. Attempts are audited in batches by a
+# background thread.
+RATE_LIMIT_REDIS_URL = env.str(
+    "RATE_LIMIT_REDIS_URL", env.str("REDIS_URI", "redis://localhost:6379/0")
+)
+RATE_LIMIT_KEY_PREFIX = env.str("RATE_LIMIT_KEY_PREFIX", "rate_limit")
+RATE_LIMIT_WINDOW = env.int("RATE_LIMIT_WINDOW", 600)  # seconds
+RATE_LIMIT_USERNAME_LIMIT = env.int("RATE_LIMIT_USERNAME_LIMIT", 5)
+RATE_LIMIT_IP_LIMIT = env.int("RATE_LIMIT_IP_LIMIT", 0)
+RATE_LIMIT_CLIENT_LIMIT = env.int("RATE_LIMIT_CLIENT_LIMIT", 0)
+RATE_LIMIT_USERNAME_FORM_FIELD = "auth-username"
+# The request header holding the client IP address when behind a proxy, e.g.
+# HTTP_X_FORWARDED_FOR.
+RATE_LIMIT_REVERSE_PROXY_HEADER = env.str("RATE_LIMIT_REVERSE_PROXY_HEADER", "")
+RATE_LIMIT_AUDIT_SINK = env.str(
+    "RATE_LIMIT_AUDIT_SINK", "authentication_service.rate_limit.database_sink"
+)
+RATE_LIMIT_AUDIT_BUFFER_SIZE = env.int("RATE_LIMIT_AUDIT_BUFFER_SIZE", 10000)
+RATE_LIMIT_AUDIT_BATCH_SIZE = env.int("RATE_LIMIT_AUDIT_BATCH_SIZE", 500)
+RATE_LIMIT_AUDIT_FLUSH_INTERVAL = env.float("RATE_LIMIT_AUDIT_FLUSH_INTERVAL", 1)  # seconds
+
+# authentication_service/answer_hashing.py: Security question answers are
+# hashed with one of the PASSWORD_HASHERS algorithms. A non zero iteration
+# count overrides the default work factor of iterated hashers. Answers hashed
+# under another policy are rehashed when they are next checked.
+SECURITY_ANSWER_HASHER = env.str("SECURITY_ANSWER_HASHER", "pbkdf2_sha256")
+SECURITY_ANSWER_ITERATIONS = env.int("SECURITY_ANSWER_ITERATIONS", 0)
 
 ALLOWED_HOSTS = env.list("ALLOWED_HOSTS", "127.0.0.1,localhost")
 
@@ -285,6 +403,10 @@ CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 # API Settings
 STUBS_CLASS = "authentication_service.integration.Implementation"
 SWAGGER_API_VALIDATE_RESPONSES = True
+# Fraction of API responses validated against the specification.
+SWAGGER_API_VALIDATE_RESPONSES_SAMPLE_RATE = env.float(
+    "SWAGGER_API_VALIDATE_RESPONSES_SAMPLE_RATE", 0.01
+)
 DEFAULT_LISTING_LIMIT = 20
 MAX_LISTING_LIMIT = 100
 MIN_LISTING_LIMIT = 1
@@ -366,6 +488,19 @@ EMAIL_USE_TLS = env.bool("EMAIL_USE_TLS", False)
 EMAIL_USE_SSL = env.bool("EMAIL_USE_SSL", False)
 EMAIL_TIMEOUT = env.int("EMAIL_TIMEOUT", None)
 
+# authentication_service/mail_dispatch.py: Emails sent by tasks are gathered
+# for a short window and sent over one connection, which is reused until it
+# has been idle for MAIL_CONNECTION_IDLE_TIMEOUT seconds. Batches are per
+# process, so under the prefork pool only the connection is reused. The keys
+# of sent emails are kept in the cache for MAIL_SENT_KEY_TTL seconds, which
+# must outlast the retries of the email tasks.
+MAIL_BATCH_SIZE = env.int("MAIL_BATCH_SIZE", 50)
+MAIL_BATCH_WINDOW = env.float("MAIL_BATCH_WINDOW", 0.05)  # seconds
+MAIL_SEND_ATTEMPTS = env.int("MAIL_SEND_ATTEMPTS", 3)
+MAIL_CONNECTION_IDLE_TIMEOUT = env.float("MAIL_CONNECTION_IDLE_TIMEOUT", 30)  # seconds
+MAIL_SEND_TIMEOUT = env.float("MAIL_SEND_TIMEOUT", 120)  # seconds
+MAIL_SENT_KEY_TTL = env.int("MAIL_SENT_KEY_TTL", 86400)  # seconds
+
 if not env.bool("BUILDER", False):
     # Celery workers now require the Access Control API.
     # GE API settings and setup
@@ -375,31 +510,41 @@ if not env.bool("BUILDER", False):
     ACCESS_CONTROL_API_URL = env.str("ACCESS_CONTROL_API")
     ACCESS_CONTROL_API_KEY = env.str("ACCESS_CONTROL_API_KEY")
 
-    # Setup API clients
-    config = user_data_store.configuration.Configuration()
-    config.host = USER_DATA_STORE_API_URL
-    USER_DATA_STORE_API = user_data_store.api.UserDataApi(
-        api_client=user_data_store.ApiClient(
-            header_name="X-API-KEY",
-            header_value=USER_DATA_STORE_API_KEY,
-            configuration=config
-        )
+    # Setup API clients. They are built once, on first use, as not every
+    # process calls the APIs. The CRUD and operational APIs of a service share one
+    # client and with it one connection pool.
+    API_CLIENT_OPTIONS = {
+        "pool_size": API_POOL_SIZE,
+        "connect_timeout": API_CONNECT_TIMEOUT,
+        "read_timeout": API_READ_TIMEOUT,
+        "retries": API_RETRIES,
+        "retry_backoff": API_RETRY_BACKOFF,
+        "keep_alive": API_KEEP_ALIVE,
+        "breaker_threshold": API_BREAKER_THRESHOLD,
+        "breaker_reset_timeout": API_BREAKER_RESET_TIMEOUT,
+        "breaker_endpoints": API_BREAKER_ENDPOINTS,
+    }
+    USER_DATA_STORE_API = api_clients.lazy(
+        lambda: user_data_store.api.UserDataApi(api_client=api_clients.build(
+            user_data_store, USER_DATA_STORE_API_URL, USER_DATA_STORE_API_KEY,
+            **API_CLIENT_OPTIONS
+        ))
     )
 
-    config = access_control.configuration.Configuration()
-    config.host = ACCESS_CONTROL_API_URL
-    ACCESS_CONTROL_API = access_control.api.AccessControlApi(
-        api_client=access_control.ApiClient(
-            header_name="X-API-KEY",
-            header_value=ACCESS_CONTROL_API_KEY,
-            configuration=config
+    ACCESS_CONTROL_API_CLIENT = api_clients.lazy(
+        lambda: api_clients.build(
+            access_control, ACCESS_CONTROL_API_URL, ACCESS_CONTROL_API_KEY,
+            **API_CLIENT_OPTIONS
+        )
+    )
+    ACCESS_CONTROL_API = api_clients.lazy(
+        lambda: access_control.api.AccessControlApi(
+            api_client=ACCESS_CONTROL_API_CLIENT
         )
     )
-    AC_OPERATIONAL_API = access_control.api.OperationalApi(
-        api_client=access_control.ApiClient(
-            header_name="X-API-KEY",
-            header_value=ACCESS_CONTROL_API_KEY,
-            configuration=config
+    AC_OPERATIONAL_API = api_clients.lazy(
+        lambda: access_control.api.OperationalApi(
+            api_client=ACCESS_CONTROL_API_CLIENT
         )
     )
 